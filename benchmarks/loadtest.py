@@ -0,0 +1,339 @@
+"""
+Concurrent load against a gunicorn server on localhost, driven by a
+weighted mix of list, detail, create and approval calls made as the admins
+of seeded clients:
+
+    flask core seed --clients 3
+    flask core loadtest [--duration 30] [--concurrency 16] [--workers 2 --threads 5]
+
+Starts `gunicorn 'reachtalent:create_app()'` on the app's database unless
+`--url` points at a running server, and reports throughput, latency
+percentiles and error rates per call.
+"""
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Iterator
+
+import sqlalchemy as sa
+from flask import Flask
+
+from reachtalent.auth import tokens
+from reachtalent.auth.models import Role
+from reachtalent.core.models import (
+    ApprovalState, Assignment, Category, CategoryItem, ClientUser, Department, Location,
+    Position, Requisition, Schedule, States,
+)
+from reachtalent.extensions import db
+from reachtalent.metrics import metrics_dir
+
+SAMPLE_SIZE = 1000  # ids of each kind sampled per tenant
+PAGE_SIZE = 25  # the list endpoints' default
+MAX_PAGE = 5  # list calls spread over the first pages
+
+
+@dataclass
+class Tenant:
+    client_id: int
+    token: str
+    requisition_ids: list[int]
+    position_ids: list[int]
+    department_ids: list[int]
+    location_ids: list[int]
+    schedule_ids: list[int]
+    requisition_type_ids: list[int]
+    pay_scheme_ids: list[int]
+    requisition_pages: int = 1
+    assignment_pages: int = 1
+    # Requisitions awaiting approval, created ones are added as they come
+    pending: deque = field(default_factory=deque)
+
+
+def load_tenants(app: Flask, max_clients: int) -> list[Tenant]:
+    """
+    Clients with an admin and the reference data to create requisitions,
+    with an auth token minted for the admin.
+    """
+    def ids(query) -> list[int]:
+        return db.session.execute(query.limit(SAMPLE_SIZE)).scalars().all()
+
+    def pages(query) -> int:
+        count = db.session.execute(sa.select(sa.func.count()).select_from(query.subquery())).scalar()
+        return max(1, min(MAX_PAGE, math.ceil(count / PAGE_SIZE)))
+
+    def category_items(key: str) -> list[int]:
+        return ids(sa.select(CategoryItem.id).join(Category).filter(Category.key == key))
+
+    requisition_type_ids = category_items('requisition_type')
+    pay_scheme_ids = category_items('pay_scheme')
+
+    admins = db.session.execute(
+        sa.select(ClientUser).join(Role).filter(Role.client_id.is_(None), Role.name == 'Admin')
+        .order_by(ClientUser.client_id)
+    ).scalars().all()
+
+    tenants = []
+    for admin in admins:
+        client_id = admin.client_id
+        tenant = Tenant(
+            client_id=client_id,
+            token=tokens.make_auth_token(app, admin.user, client_id),
+            requisition_ids=ids(sa.select(Requisition.id).filter(
+                Requisition.client_id == client_id, Requisition.state != States.DELETED)),
+            position_ids=ids(sa.select(Position.id).filter_by(client_id=client_id)),
+            department_ids=ids(sa.select(Department.id).filter_by(client_id=client_id)),
+            location_ids=ids(sa.select(Location.id).filter_by(client_id=client_id)),
+            schedule_ids=ids(sa.select(Schedule.id).filter_by(client_id=client_id)),
+            requisition_type_ids=requisition_type_ids,
+            pay_scheme_ids=pay_scheme_ids,
+            requisition_pages=pages(sa.select(Requisition.id).filter(
+                Requisition.client_id == client_id, Requisition.state != States.DELETED)),
+            assignment_pages=pages(sa.select(Assignment.id).join(Requisition).filter(
+                Requisition.client_id == client_id, Requisition.state != States.DELETED)),
+            pending=deque(ids(sa.select(Requisition.id).filter(
+                Requisition.client_id == client_id, Requisition.state != States.DELETED,
+                Requisition.approval_state == ApprovalState.PENDING))),
+        )
+        if all((tenant.requisition_ids, tenant.position_ids, tenant.department_ids, tenant.location_ids,
+                tenant.schedule_ids, tenant.requisition_type_ids, tenant.pay_scheme_ids)):
+            tenants.append(tenant)
+        if len(tenants) == max_clients:
+            break
+    return tenants
+
+
+Request = tuple[str, str, object | None]
+
+
+@dataclass
+class Call:
+    name: str
+    weight: int
+    # (method, path, json body) to send, None when the tenant has nothing to call it on
+    build: Callable[[Tenant, random.Random], Request | None]
+    # Sees the decoded body of successful responses
+    record: Callable[[Tenant, object], None] = lambda tenant, body: None
+
+
+def _create_requisition(tenant: Tenant, rng: random.Random) -> Request:
+    start_date = date.today() + timedelta(days=rng.randrange(7, 60))
+    return 'POST', '/api/requisitions', {
+        'position_id': rng.choice(tenant.position_ids),
+        'department_id': rng.choice(tenant.department_ids),
+        'location_id': rng.choice(tenant.location_ids),
+        'schedule_id': rng.choice(tenant.schedule_ids),
+        'requisition_type_id': rng.choice(tenant.requisition_type_ids),
+        'pay_scheme_id': rng.choice(tenant.pay_scheme_ids),
+        'num_assignments': rng.randrange(1, 4),
+        'pay_rate': f'{rng.randrange(1800, 3500) / 100:.2f}',
+        'start_date': start_date.isoformat(),
+        'estimated_end_date': (start_date + timedelta(days=180)).isoformat(),
+    }
+
+
+def _approve_requisition(tenant: Tenant, rng: random.Random) -> Request | None:
+    try:
+        requisition_id = tenant.pending.popleft()
+    except IndexError:
+        return None
+    return 'POST', f'/api/requisitions/{requisition_id}/approval', {'decision': 'APPROVE'}
+
+
+CALLS = [
+    Call('list_requisitions', 25, lambda t, rng: (
+        'GET', f'/api/requisitions?page={rng.randint(1, t.requisition_pages)}', None)),
+    Call('get_requisition', 20, lambda t, rng: ('GET', f'/api/requisitions/{rng.choice(t.requisition_ids)}', None)),
+    Call('list_assignments', 15, lambda t, rng: (
+        'GET', f'/api/assignments?page={rng.randint(1, t.assignment_pages)}', None)),
+    Call('list_available_workers', 10, lambda t, rng: (
+        'GET', f'/api/available_workers?for_requisition_id={rng.choice(t.requisition_ids)}', None)),
+    Call('list_positions', 10, lambda t, rng: ('GET', '/api/positions', None)),
+    Call('quote_bill_rates', 5, lambda t, rng: ('POST', '/api/bill_rates/quote', [
+        {'position_id': rng.choice(t.position_ids), 'pay_rate': f'{rng.randrange(1800, 3500) / 100:.2f}'}
+        for _ in range(10)
+    ])),
+    Call('create_requisition', 10, _create_requisition,
+         record=lambda tenant, body: tenant.pending.append(body['id'])),
+    Call('approve_requisition', 5, _approve_requisition),
+]
+
+
+@dataclass
+class Sample:
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+
+def _drive(base_url: str, tenants: list[Tenant], calls: list[Call], deadline: float, seed: str,
+           samples: dict[str, Sample]):
+    """One client thread sending requests over a keep-alive connection until `deadline`."""
+    rng = random.Random(seed)
+    url = urllib.parse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    weights = [call.weight for call in calls]
+    while time.monotonic() < deadline:
+        tenant = rng.choice(tenants)
+        call = rng.choices(calls, weights)[0]
+        if (request := call.build(tenant, rng)) is None:
+            continue
+        method, path, body = request
+        headers = {'Cookie': f'AuthToken={tenant.token}', 'X-Client-ID': str(tenant.client_id)}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+
+        sample = samples[call.name]
+        started = time.perf_counter()
+        try:
+            connection.request(method, url.path.rstrip('/') + path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            sample.errors += 1
+            sample.statuses['error'] += 1
+            connection.close()
+            continue
+        sample.latencies.append(time.perf_counter() - started)
+        sample.statuses[response.status] += 1
+        if response.status >= 400:
+            sample.errors += 1
+        else:
+            call.record(tenant, json.loads(payload))
+
+
+def run(base_url: str, tenants: list[Tenant], duration: float, concurrency: int, seed: int = 0,
+        calls: list[Call] = CALLS) -> dict:
+    """
+    Drive `calls` from `concurrency` threads for `duration` seconds and
+    summarize the responses per call.
+    """
+    deadline = time.monotonic() + duration
+    per_thread = [defaultdict(Sample) for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=_drive, args=(base_url, tenants, calls, deadline, f'{seed}:{ix}', samples))
+        for ix, samples in enumerate(per_thread)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = defaultdict(Sample)
+    for samples in per_thread:
+        for name, sample in samples.items():
+            merged[name].latencies += sample.latencies
+            merged[name].statuses.update(sample.statuses)
+            merged[name].errors += sample.errors
+    total = Sample()
+    for sample in merged.values():
+        total.latencies += sample.latencies
+        total.statuses.update(sample.statuses)
+        total.errors += sample.errors
+
+    return {
+        'duration': elapsed,
+        'concurrency': concurrency,
+        'calls': {name: summarize(merged[name], elapsed) for name in sorted(merged)},
+        'total': summarize(total, elapsed),
+    }
+
+
+def summarize(sample: Sample, elapsed: float) -> dict:
+    requests = sum(sample.statuses.values())
+    summary = {
+        'requests': requests,
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'errors': sample.errors,
+        'error_rate': sample.errors / requests if requests else 0.0,
+        'statuses': {str(status): count for status, count in sorted(sample.statuses.items(), key=str)},
+    }
+    latencies = sorted(sample.latencies)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        summary.update(p50=cuts[49], p95=cuts[94], p99=cuts[98])
+    elif latencies:
+        summary.update(p50=latencies[0], p95=latencies[0], p99=latencies[0])
+    return summary
+
+
+def format_report(results: dict) -> str:
+    lines = [
+        f"{results['concurrency']} client(s) for {results['duration']:.1f}s",
+        f"{'call':24} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+    ]
+    for name, summary in [*results['calls'].items(), ('total', results['total'])]:
+        percentiles = ' '.join(
+            f"{summary[key] * 1000:8.1f}" if key in summary else f"{'-':>8}" for key in ('p50', 'p95', 'p99'))
+        lines.append(
+            f"{name:24} {summary['requests']:>9} {summary['throughput']:8.1f} {summary['error_rate']:7.1%} {percentiles}")
+    return '\n'.join(lines)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(app: Flask, workers: int, threads: int, timeout: float = 30.0) -> Iterator[str]:
+    """
+    Serve `reachtalent:create_app()` on a free localhost port with the
+    database, token secret and metrics directory of `app`, yielding its base
+    URL once it answers.
+    """
+    port = _free_port()
+    env = {
+        **os.environ,
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'JWT_SECRET': app.config['JWT_SECRET'],
+        'METRICS_DIR': str(metrics_dir(app)),
+    }
+    # A file rather than a pipe, which would block the workers' logging once
+    # full since it is only read when the server fails to start
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+         '-b', f'127.0.0.1:{port}', 'reachtalent:create_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=log)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        give_up = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"gunicorn exited with {process.returncode}: {log.read().decode()}")
+            try:
+                urllib.request.urlopen(f'{base_url}/api', timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > give_up:
+                    raise RuntimeError(f"gunicorn did not answer on {base_url} within {timeout:.0f}s")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
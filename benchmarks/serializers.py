@@ -0,0 +1,90 @@
+"""
+Compare marshmallow `Schema.dumps` against the compiled serializers on
+1k-row requisition pages built from transient model instances.
+
+    python -m benchmarks.serializers [--rows 1000] [--repeat 5]
+"""
+import argparse
+import timeit
+from datetime import date
+from decimal import Decimal
+
+from reachtalent.auth.models import User
+from reachtalent.core import schema
+from reachtalent.core.models import (
+    ApprovalState, Assignment, AssignmentState, CategoryItem, CostCenter,
+    Department, JobClassification, Location, Position, PurchaseOrder,
+    Requisition, Schedule, Worker, WorkerEnvironment,
+)
+from reachtalent.core.serializers import serializer
+
+
+def make_requisition_page(rows: int) -> dict:
+    department = Department(id=1, client_id=2, number='1000', name='Example')
+    position = Position(
+        id=1, client_id=2, title='Forklift Operator', job_description='Operate forklifts',
+        requirements=['OSHA certified'], pay_rate_min=Decimal('18.5'), pay_rate_max=Decimal('24.125'),
+        is_remote=False, departments=[department],
+        worker_environment=WorkerEnvironment(id=1, client_id=2, name='Warehouse', description='Indoor'),
+        job_classification=JobClassification(id=1, label='Warehouse'))
+    supervisor = User(id=103, name='Hiring Manager', email='hm@example.com')
+    location = Location(
+        id=1, client_id=2, name='HQ', description='Head office', street='1 Main St',
+        city='Springfield', state='IL', zip='62701', country='US')
+    schedule = Schedule(id=1, client_id=2, name='Days', description='9-5')
+    workers = [
+        Worker(id=i, phone_number=f'555-01{i:02}', user=User(id=200 + i, name=f'Worker {i}', email=f'w{i}@example.com'))
+        for i in range(3)
+    ]
+    items = []
+    for i in range(rows):
+        items.append(Requisition(
+            id=i + 1, client_id=2, approval_state=ApprovalState.APPROVED,
+            approvals=[{'approver_uid': 102, 'datetime': '2023-01-02T03:04:05', 'decision': 'APPROVE'}],
+            num_assignments=2, pay_rate=Decimal('21.505'), start_date=date(2023, 1, 1),
+            estimated_end_date=date(2023, 12, 31), additional_information='', employee_info={'a': 1},
+            purchase_order=PurchaseOrder(id=1, client_id=2, ext_ref='PO-1', departments=[department]),
+            position=position, department=department, supervisor=supervisor, timecard_approver=supervisor,
+            location=location, schedule=schedule,
+            requisition_type=CategoryItem(id=1, key='new_hire', label='New Hire'),
+            pay_scheme=CategoryItem(id=2, key='exempt', label='Exempt'),
+            presented_workers=workers,
+            assignments=[
+                Assignment(
+                    id=i * 2 + j, status=AssignmentState.OFFER_MADE, requisition_id=i + 1,
+                    pay_rate=Decimal('21.5'), bill_rate=Decimal('30.1'), department=department,
+                    worker=workers[j], cost_center=CostCenter(id=1, client_id=2, name='Ops'),
+                    tentative_start_date=date(2023, 1, 1), timesheets_worker_editable=False,
+                    timesheets_web_punchable=True)
+                for j in range(2)
+            ],
+        ))
+    return {
+        'pagination': {'page': 1, 'total_pages': 1, 'page_size': rows},
+        'items': items,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_requisition_page(args.rows)
+    compiled = serializer(schema.ListRequisitionResponse)
+    assert compiled.dumps(page) == schema.ListRequisitionResponse().dumps(page), "outputs differ"
+
+    results = {
+        'marshmallow': min(timeit.repeat(
+            lambda: schema.ListRequisitionResponse().dumps(page), number=1, repeat=args.repeat)),
+        'compiled': min(timeit.repeat(
+            lambda: compiled.dumps(page), number=1, repeat=args.repeat)),
+    }
+    for name, seconds in results.items():
+        print(f'{name:12} {seconds * 1000:9.1f} ms / {args.rows} rows')
+    print(f'speedup      {results["marshmallow"] / results["compiled"]:9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
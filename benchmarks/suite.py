@@ -0,0 +1,328 @@
+"""
+Microbenchmarks of the application's hot internals, each timed at several
+data scales against a throwaway SQLite database:
+
+    flask core bench [--scale 10 --scale 100] [--output results.json] [--compare baseline.json]
+
+A benchmark takes the seeded `Dataset` and returns the callable to time,
+which is called once to warm caches and lazy loads before it is measured.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import timeit
+import warnings
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Iterator
+
+import sqlalchemy as sa
+from flask import Flask, g
+
+from reachtalent import create_app
+from reachtalent.auth import tokens
+from reachtalent.auth.commands import _sync_data
+from reachtalent.auth.models import Role, User
+from reachtalent.auth.utils import (
+    _check_permission, _parse_auth_token_state, get_auth_state_cache,
+)
+from reachtalent.config import Config
+from reachtalent.core import schema
+from reachtalent.core.commands.sync_client import values_to_dict_rows
+from reachtalent.core.commands.update_data import _update_category_data
+from reachtalent.core.loading import eager_load
+from reachtalent.core.models import (
+    ApprovalState, Assignment, AssignmentState, Client, ClientUser, Contract,
+    ContractTerm, ContractTermDefinition, Department, JobClassification,
+    Position, Requisition, States, Worker,
+)
+from reachtalent.core.serializers import serializer
+from reachtalent.extensions import db
+
+DEFAULT_SCALES = (10, 100, 1000)
+EFFECTIVE_DATE = date(2023, 6, 1)
+SHEET_COLUMNS = 20
+
+
+@dataclass
+class Dataset:
+    scale: int
+    client_id: int
+    user_id: int
+    position_id: int
+    requisition_id: int
+
+
+BENCHMARKS: dict[str, Callable[[Flask, Dataset], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def populate(scale: int) -> Dataset:
+    """
+    Seed the current database with `scale` requisitions, workers and
+    assignments for one client, plus `scale // 10` contracts on its timeline
+    and as many other clients with a contract of their own.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        _sync_data(dry_run=False)
+        _update_category_data(True, False)
+
+    admin_role = Role.query.filter_by(client_id=sa.null(), name='Admin').one()
+    job_classification = JobClassification.query.filter_by(contract_term_prefix='markup_jobclass_it_').one()
+    definitions = {
+        ctd.ref: ctd
+        for ctd in db.session.execute(sa.select(ContractTermDefinition)).scalars()
+    }
+
+    def add_contract(client: Client, start: date, end: date | None):
+        contract = Contract(client=client, effective_start_date=start, effective_end_date=end)
+        db.session.add(contract)
+        for ref, val in (('markup_jobclass_it_pct', Decimal('0.05')), ('markup_jobclass_engineering_flat', 15)):
+            db.session.add(ContractTerm(contract=contract, contract_term_definition=definitions[ref], val_numeric=val))
+
+    client = Client(name='Bench')
+    department = Department(client=client, number='1000', name='Bench')
+    admin = User(email='admin@bench.example', name='Bench Admin', email_verified=True)
+    db.session.add_all([client, department, admin, ClientUser(client=client, user=admin, role=admin_role)])
+
+    contracts = max(1, scale // 10)
+    start = EFFECTIVE_DATE - timedelta(days=30 * (contracts // 2))
+    for ix in range(contracts):
+        end = start + timedelta(days=30) if ix < contracts - 1 else None
+        add_contract(client, start, end)
+        start += timedelta(days=30)
+    for ix in range(scale // 10):
+        add_contract(Client(name=f'Bench {ix}'), EFFECTIVE_DATE - timedelta(days=365), None)
+
+    position = Position(
+        client=client, title='Support Technician', job_classification=job_classification,
+        pay_rate_min=Decimal('18.50'), pay_rate_max=Decimal('24.00'), requirements=[], is_remote=False)
+    workers = [
+        Worker(user=User(email=f'worker{ix}@bench.example', name=f'Worker {ix}'), phone_number=f'555-{ix:04}')
+        for ix in range(scale)
+    ]
+    requisitions = []
+    for ix, worker in enumerate(workers):
+        requisition = Requisition(
+            client=client, state=States.ACTIVE, approval_state=ApprovalState.APPROVED, position=position,
+            department=department, supervisor=admin, timecard_approver=admin, num_assignments=2,
+            pay_rate=Decimal('21.50'), start_date=EFFECTIVE_DATE, approvals=[], employee_info={},
+            presented_workers=[worker])
+        requisition.assignments = [
+            Assignment(
+                status=AssignmentState.ACTIVE, worker=assigned, department=department,
+                pay_rate=Decimal('21.50'), bill_rate=Decimal('22.58'), tentative_start_date=EFFECTIVE_DATE)
+            for assigned in (worker, workers[ix - 1])
+        ]
+        requisitions.append(requisition)
+    db.session.add_all(workers + requisitions)
+    db.session.commit()
+
+    return Dataset(
+        scale=scale, client_id=client.id, user_id=admin.id,
+        position_id=position.id, requisition_id=requisitions[0].id)
+
+
+@contextlib.contextmanager
+def bench_app(scale: int) -> Iterator[tuple[Flask, Dataset]]:
+    """A fresh app on a temporary SQLite database seeded by `populate`."""
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(Config(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            SERVER_NAME='reachtalent.com',
+            METRICS_DIR=os.path.join(directory, 'metrics'),
+        ))
+        with app.app_context():
+            db.create_all()
+            dataset = populate(scale)
+            yield app, dataset
+            db.session.remove()
+            db.engine.dispose()
+
+
+def _request_context(app: Flask, dataset: Dataset):
+    token = tokens.make_auth_token(app, db.session.get(User, dataset.user_id), dataset.client_id)
+    return app.test_request_context(headers={
+        'Cookie': f'AuthToken={token}',
+        'X-Client-ID': str(dataset.client_id),
+    })
+
+
+@benchmark('parse_auth_token_state')
+def bench_parse_auth_token_state(app: Flask, dataset: Dataset):
+    return _parse_auth_token_state
+
+
+@benchmark('parse_auth_token_state_cold')
+def bench_parse_auth_token_state_cold(app: Flask, dataset: Dataset):
+    def run():
+        get_auth_state_cache(app).clear()
+        tokens.get_verified_token_cache(app).clear()
+        return _parse_auth_token_state()
+
+    return run
+
+
+@benchmark('check_permission')
+def bench_check_permission(app: Flask, dataset: Dataset):
+    role = ClientUser.query.filter_by(client_id=dataset.client_id, user_id=dataset.user_id).one().role
+
+    def run():
+        # the first check of a request, later ones are memoized on `g`
+        g.pop('role_permissions', None)
+        return _check_permission(role, 'Requisition.*.view')
+
+    return run
+
+
+@benchmark('query_contract_terms')
+def bench_query_contract_terms(app: Flask, dataset: Dataset):
+    return lambda: Contract.query_contract_terms(dataset.client_id, EFFECTIVE_DATE, 'markup_jobclass_')
+
+
+@benchmark('calculate_bill_rate')
+def bench_calculate_bill_rate(app: Flask, dataset: Dataset):
+    position = db.session.get(Position, dataset.position_id)
+    return lambda: position.calculate_bill_rate(Decimal('21.50'), EFFECTIVE_DATE)
+
+
+@benchmark('available_workers_query')
+def bench_available_workers_query(app: Flask, dataset: Dataset):
+    query = Worker.available_workers_query(dataset.client_id, for_requisition_id=dataset.requisition_id)
+    return lambda: db.session.execute(query).scalars().all()
+
+
+def _page(query, item_schema) -> dict:
+    items = db.session.execute(eager_load(query, item_schema)).unique().scalars().all()
+    return {'pagination': {'page': 1, 'total_pages': 1, 'page_size': len(items)}, 'items': items}
+
+
+def _requisition_page(dataset: Dataset) -> dict:
+    query = sa.select(Requisition).filter_by(client_id=dataset.client_id).order_by(Requisition.id)
+    return _page(query, schema.Requisition)
+
+
+def _assignment_page(dataset: Dataset) -> dict:
+    query = (sa.select(Assignment).join(Requisition)
+             .filter(Requisition.client_id == dataset.client_id).order_by(Assignment.id))
+    return _page(query, schema.Assignment)
+
+
+@benchmark('dump_list_requisition')
+def bench_dump_list_requisition(app: Flask, dataset: Dataset):
+    page = _requisition_page(dataset)
+    return lambda: schema.ListRequisitionResponse().dumps(page)
+
+
+@benchmark('dump_list_requisition_compiled')
+def bench_dump_list_requisition_compiled(app: Flask, dataset: Dataset):
+    page = _requisition_page(dataset)
+    return lambda: serializer(schema.ListRequisitionResponse).dumps(page)
+
+
+@benchmark('dump_list_assignment')
+def bench_dump_list_assignment(app: Flask, dataset: Dataset):
+    page = _assignment_page(dataset)
+    return lambda: schema.ListAssignmentResponse().dumps(page)
+
+
+@benchmark('dump_list_assignment_compiled')
+def bench_dump_list_assignment_compiled(app: Flask, dataset: Dataset):
+    page = _assignment_page(dataset)
+    return lambda: serializer(schema.ListAssignmentResponse).dumps(page)
+
+
+@benchmark('values_to_dict_rows')
+def bench_values_to_dict_rows(app: Flask, dataset: Dataset):
+    header = [f'Column {ix}' for ix in range(SHEET_COLUMNS)]
+    # every third row is missing trailing cells, as the Sheets API returns them
+    rows = [
+        [f'{row}-{col}' for col in range(SHEET_COLUMNS - (5 if row % 3 == 0 else 0))]
+        for row in range(dataset.scale)
+    ]
+    # values_to_dict_rows pads rows in place, so each call gets fresh copies
+    return lambda: values_to_dict_rows([['Sheet'], header, *map(list, rows)])
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> dict:
+    """
+    Time `func` in batches taking at least `min_time` seconds and report
+    the best and median seconds per call over `repeat` batches.
+    """
+    func()
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    per_call = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    return {'number': number, 'best': min(per_call), 'median': statistics.median(per_call)}
+
+
+def run(names: list[str], scales: list[int], repeat: int = 5, min_time: float = 0.2,
+        progress: Callable[[str], Any] = lambda message: None) -> dict:
+    results = []
+    for scale in scales:
+        with warnings.catch_warnings():
+            # Numeric columns warn about every Decimal on SQLite
+            warnings.filterwarnings('ignore', 'Dialect sqlite.*does \\*not\\* support Decimal', sa.exc.SAWarning)
+            with bench_app(scale) as (app, dataset), _request_context(app, dataset):
+                for name in names:
+                    timing = measure(BENCHMARKS[name](app, dataset), repeat, min_time)
+                    results.append({'benchmark': name, 'scale': scale, **timing})
+                    progress(f"{name:32} {scale:>6} {format_seconds(timing['median']):>10}")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlalchemy': sa.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'min_time': min_time,
+        },
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    Median time per call of every benchmark and scale in both `results` and
+    `baseline`, flagged as a regression when slower by more than `threshold`.
+    """
+    previous = {(row['benchmark'], row['scale']): row for row in baseline['results']}
+    rows = []
+    for row in results['results']:
+        if (old := previous.get((row['benchmark'], row['scale']))) is None:
+            continue
+        ratio = row['median'] / old['median'] if old['median'] else float('inf')
+        rows.append({
+            'benchmark': row['benchmark'],
+            'scale': row['scale'],
+            'baseline': old['median'],
+            'median': row['median'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, factor in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * factor >= 1:
+            return f'{seconds * factor:.2f} {unit}'
+    return f'{seconds * 1e9:.0f} ns'
+
+
+def load(path: str) -> dict:
+    with open(path) as fp:
+        return json.load(fp)
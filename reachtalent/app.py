@@ -1,7 +1,8 @@
+import hmac
 from typing import Optional
 
 import click
-from flask import Flask, Response, json, g, abort
+from flask import Flask, Response, json, g, abort, request
 from marshmallow import ValidationError
 from werkzeug.exceptions import HTTPException
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -14,6 +15,9 @@ from .core.views import blueprint as core_blueprint
 from .extensions import (
     db, bcrypt, migrate, marshmallow, mail
 )
+from .instrumentation import report_query_stats, start_query_stats
+from .metrics import collect, metrics_dir, record_request, render, start_request_timer
+from .profiling import save_profile, start_profiler, stop_profiler
 from .schema import spec
 
 
@@ -30,7 +34,14 @@ def create_app(test_config: Optional[Config] = None) -> Flask:
     register_extensions(app)
     register_blueprints(app)
 
+    app.before_request(start_request_timer)
+    app.before_request(start_query_stats)
     app.before_request(auth_middleware)
+    app.before_request(start_profiler)
+    app.after_request(record_request)
+    app.after_request(report_query_stats)
+    app.after_request(save_profile)
+    app.teardown_request(stop_profiler)
 
     @app.errorhandler(HTTPException)
     def handle_exception(e):
@@ -59,6 +70,17 @@ def create_app(test_config: Optional[Config] = None) -> Flask:
             return f'Welcome, {g.auth_state.user.name}'
         return 'Welcome, Stranger'
 
+    @app.route('/api/metrics')
+    def metrics():
+        if not (token := app.config['METRICS_TOKEN']):
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401, "Metrics token required.")
+        return Response(
+            render(collect(metrics_dir(app))),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
     @app.cli.command('openapi')
     @click.option('--format',
                   'fmt',
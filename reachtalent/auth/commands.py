@@ -1,10 +1,16 @@
+import smtplib
+import time
+
 import click
 import sqlalchemy as sa
 from sqlalchemy.orm.exc import NoResultFound
 
+from . import email
 from . import permissions
 from .models import db, Permission, Role
-from ..core.models import Client
+from .utils import PermissionIndex
+from ..core.models import CacheVersion, Client
+from ..core.response_cache import REFERENCE_DATA_VERSION
 
 
 def _upsert_rti_client(dry_run: bool) -> Client:
@@ -144,6 +150,9 @@ def _sync_data(dry_run=False):
     _upsert_roles(None, permissions_in_db, base_roles, dry_run)
 
     if not dry_run:
+        # Tell every worker to reload its compiled permission index
+        CacheVersion.bump(PermissionIndex.VERSION_NAME)
+        CacheVersion.bump(REFERENCE_DATA_VERSION)
         db.session.commit()
 
 
@@ -152,3 +161,27 @@ def _sync_data(dry_run=False):
               help='Show what changes would be made')
 def sync_data(dry_run):
     return _sync_data(dry_run=dry_run)
+
+
+@click.command()
+@click.option('--batch-size', type=int, default=50, show_default=True,
+              help='Number of emails fetched and sent per batch')
+@click.option('--max-attempts', type=int, default=5, show_default=True,
+              help='Give up on an email after this many failed deliveries')
+@click.option('--poll-interval', type=float, default=5.0, show_default=True,
+              help='Seconds to wait between outbox passes')
+@click.option('--once', is_flag=True, default=False,
+              help='Drain the outbox once and exit')
+def mail_worker(batch_size, max_attempts, poll_interval, once):
+    while True:
+        try:
+            sent, failed = email.deliver_outbox(batch_size=batch_size, max_attempts=max_attempts)
+            if sent or failed:
+                click.echo(f'Sent {sent} email(s), {failed} failed permanently')
+        except (smtplib.SMTPException, OSError) as exc:
+            db.session.rollback()
+            click.echo(f'Mail server unavailable: {exc}', err=True)
+
+        if once:
+            break
+        time.sleep(poll_interval)
@@ -1,10 +1,101 @@
+import smtplib
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
 from flask import Flask, render_template
 from flask_mail import Message
 
 from ..extensions import mail
-from .models import User
+from ..logger import make_logger
+from .models import db, EmailOutbox, User
 from . import tokens
 
+logger = make_logger("reachtalent.auth.email")
+
+
+def enqueue(msg: Message) -> EmailOutbox:
+    """
+    Queue `msg` in the email outbox. Delivery happens out of band in
+    `flask auth mail-worker` so request latency doesn't depend on the relay.
+    """
+    entry = EmailOutbox(
+        subject=msg.subject,
+        sender=msg.sender,
+        recipients=list(msg.recipients),
+        body=msg.body,
+        html=msg.html,
+    )
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def _due_batch(batch_size: int) -> list[EmailOutbox]:
+    return db.session.scalars(
+        sa.select(EmailOutbox)
+        .where(EmailOutbox.state == EmailOutbox.PENDING,
+               EmailOutbox.next_attempt_date <= datetime.utcnow())
+        .order_by(EmailOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+
+def deliver_outbox(
+        batch_size: int = 50,
+        max_attempts: int = 5,
+        retry_delay: timedelta = timedelta(minutes=1)) -> tuple[int, int]:
+    """
+    Deliver due outbox entries in batches over a single SMTP connection.
+
+    Failed deliveries are retried with exponential backoff until
+    `max_attempts` is reached. A dropped connection ends the pass early, the
+    remaining entries are picked up by the next one.
+
+    :return: (sent, failed) counts, where failed only counts entries that
+        exhausted their attempts
+    """
+    sent = failed = 0
+    # Only connect to the relay once there is something to send
+    if not (batch := _due_batch(batch_size)):
+        db.session.commit()
+        return sent, failed
+
+    with mail.connect() as conn:
+        while True:
+            disconnected = False
+            for entry in batch:
+                try:
+                    conn.send(Message(
+                        entry.subject,
+                        sender=entry.sender,
+                        recipients=entry.recipients,
+                        body=entry.body,
+                        html=entry.html,
+                    ))
+                except (smtplib.SMTPException, OSError) as exc:
+                    logger.warning("Failed to deliver email %s: %s", entry, exc)
+                    entry.attempts += 1
+                    entry.last_error = str(exc)
+                    if entry.attempts >= max_attempts:
+                        entry.state = EmailOutbox.FAILED
+                        failed += 1
+                    else:
+                        entry.next_attempt_date = datetime.utcnow() + retry_delay * 2 ** (entry.attempts - 1)
+                    if isinstance(exc, smtplib.SMTPServerDisconnected):
+                        disconnected = True
+                        break
+                else:
+                    entry.state = EmailOutbox.SENT
+                    entry.sent_date = datetime.utcnow()
+                    sent += 1
+            db.session.commit()
+
+            if disconnected or len(batch) < batch_size or not (batch := _due_batch(batch_size)):
+                break
+
+    return sent, failed
+
 
 send_verify_email_tmpl = """
 Dear {user.name},
@@ -47,7 +138,7 @@ def send_verify_email(app: Flask, user: User, link_path: str = 'verify_email'):
         body=send_verify_email_tmpl.format(**tmpl_context),
         html=render_template("send_verify_email.html", **tmpl_context),
     )
-    mail.send(msg)
+    enqueue(msg)
 
 
 notify_existing_user_tmpl = """
@@ -87,7 +178,7 @@ def notify_existing_user(app: Flask, user: User):
         body=notify_existing_user_tmpl.format(**tmpl_context),
         html=render_template("notify_existing_user.html", **tmpl_context)
     )
-    mail.send(msg)
+    enqueue(msg)
 
 
 forgot_password_tmpl = """
@@ -124,4 +215,4 @@ def send_forgot_password(app: Flask, user: User):
         body=forgot_password_tmpl.format(**tmpl_context),
         html=render_template("send_forgot_password.html", **tmpl_context)
     )
-    mail.send(msg)
+    enqueue(msg)
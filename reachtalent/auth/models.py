@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from sqlalchemy import select
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped
@@ -79,6 +81,17 @@ class User(Base):
         """Check password."""
         return bcrypt.check_password_hash(self._password, value)
 
+    def active_client_role(self, *client_ids: int | None) -> "ClientUser | None":
+        """
+        The user's role at the first of `client_ids` they belong to, falling
+        back to their first client role.
+        """
+        client_roles = {cr.client_id: cr for cr in self.client_roles}
+        for client_id in client_ids:
+            if client_id in client_roles:
+                return client_roles[client_id]
+        return next(iter(client_roles.values()), None)
+
     @classmethod
     def select_by_email(cls, email: str):
         return select(cls).where(cls.email == email)
@@ -110,3 +123,33 @@ class UserProfile(Base):
     user: Mapped["User"] = db.relationship("User")
 
     json_data: Mapped[dict] = Column(db.JSON)
+
+
+class EmailOutbox(Base):
+    """
+    Outgoing email queued by request handlers and delivered in batches by
+    `flask auth mail-worker`.
+    """
+    __table_args__ = (
+        db.Index('ix_email_outbox_state_next_attempt_date', 'state', 'next_attempt_date'),
+    )
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    id: Mapped[int] = Column(db.Integer, primary_key=True)
+    subject: Mapped[str] = Column(db.String, nullable=False)
+    sender: Mapped[str] = Column(db.String, nullable=True)
+    recipients: Mapped[list[str]] = Column(db.JSON, nullable=False)
+    body: Mapped[str] = Column(db.Text, nullable=True)
+    html: Mapped[str] = Column(db.Text, nullable=True)
+
+    state: Mapped[str] = Column(db.String, nullable=False, server_default=PENDING)
+    attempts: Mapped[int] = Column(db.Integer, nullable=False, server_default="0")
+    next_attempt_date: Mapped[datetime] = Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error: Mapped[str] = Column(db.String, nullable=True)
+    sent_date: Mapped[datetime] = Column(db.DateTime, nullable=True)
+
+    def __str__(self) -> str:
+        return f'{self.id}:{self.subject} to:{",".join(self.recipients)} state:{self.state}'
@@ -1,5 +1,6 @@
 __ENTITIES__ = set()
 __CATEGORICAL_DATA__ = {}
+__CATALOGUE__ = ()
 
 ACTIONS = {
     'create',
@@ -39,6 +40,17 @@ def generate_permissions():
     ])
 
 
+def permission_catalogue() -> tuple[str, ...]:
+    """
+    Ordered catalogue of every known permission. A permission's position is
+    its bit in the encoded token scope claim.
+    """
+    global __CATALOGUE__
+    if len(__CATALOGUE__) != len(__ENTITIES__) * len(ACTIONS):
+        __CATALOGUE__ = tuple(generate_permissions())
+    return __CATALOGUE__
+
+
 def generate_rti_roles():
     return {
         'RTI Admin': generate_permissions(),
@@ -1,9 +1,22 @@
+import base64
+import functools
+import hashlib
+import time
 from datetime import datetime, timedelta
+from typing import Iterable
 
 import jwt
+import sqlalchemy as sa
 from flask import Flask
 
-from .models import User
+from . import permissions
+from .models import User, Role
+from ..cache import TTLCache
+from ..config import as_bool
+from ..core.models import CacheVersion
+
+PERMISSION_INDEX_VERSION = 'permission_index'
+VERIFIED_TOKEN_CACHE = 'reachtalent.verified_token_cache'
 
 
 def make_token(app: Flask,
@@ -34,6 +47,60 @@ def make_token(app: Flask,
     return jwt.encode(payload, key=app.config['JWT_SECRET'], algorithm='HS256')
 
 
+@functools.lru_cache(maxsize=4)
+def _catalogue_digest(catalogue: tuple[str, ...]) -> str:
+    return hashlib.sha256('\n'.join(catalogue).encode()).hexdigest()[:12]
+
+
+def scope_version(permission_version: int) -> str:
+    """
+    Identifies both the permission catalogue (bit positions) and the role
+    permission assignments a scope claim was encoded against.
+    """
+    return f'{_catalogue_digest(permissions.permission_catalogue())}.{permission_version}'
+
+
+def encode_scope(perms: Iterable[str]) -> str | None:
+    """
+    Encode permission names as a base64url bitmask over the permission
+    catalogue. Returns None if a permission is missing from the catalogue.
+    """
+    catalogue = permissions.permission_catalogue()
+    bits = {perm: ix for ix, perm in enumerate(catalogue)}
+    mask = 0
+    for perm in perms:
+        if perm not in bits:
+            return None
+        mask |= 1 << bits[perm]
+    raw = mask.to_bytes(max(1, (mask.bit_length() + 7) // 8), 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+@functools.lru_cache(maxsize=256)
+def decode_scope(encoded: str) -> frozenset[str]:
+    catalogue = permissions.permission_catalogue()
+    raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+    mask = int.from_bytes(raw, 'big')
+    return frozenset(
+        perm for ix, perm in enumerate(catalogue)
+        if mask >> ix & 1
+    )
+
+
+def make_scope_claim(user: User, client_id: int | None) -> dict | None:
+    # the role `_resolve_identity` will pick for requests without X-Client-ID
+    role = client_role.role if (client_role := user.active_client_role(client_id)) else None
+    if role is None:
+        role = Role.query.filter_by(name='Default', client_id=sa.null()).one_or_none()
+    if role is None or (perms := encode_scope(role.perms)) is None:
+        return None
+    return {
+        'role_id': role.id,
+        'version': scope_version(CacheVersion.current(PERMISSION_INDEX_VERSION)),
+        'perms': perms,
+    }
+
+
 def make_auth_token(app: Flask, user: User, client_id: int | None = None) -> str:
     client_roles = {
         cr.client_id: f'{cr.client.name} ({cr.role.name})'
@@ -53,6 +120,10 @@ def make_auth_token(app: Flask, user: User, client_id: int | None = None) -> str
     if client_id:
         rti_payload['default_client_id'] = client_id
 
+    if as_bool(app.config.get('AUTH_TOKEN_PERMISSION_CLAIMS')):
+        if scope := make_scope_claim(user, client_id):
+            rti_payload['scope'] = scope
+
     return make_token(
         app,
         use='auth',
@@ -72,5 +143,29 @@ def make_email_verify_token(app: Flask, user: User):
     )
 
 
+def get_verified_token_cache(app: Flask) -> TTLCache:
+    """
+    Process local LRU of verified token payloads keyed by the token's sha256
+    digest. Entries expire at the token's own `exp`.
+    """
+    if (cache := app.extensions.get(VERIFIED_TOKEN_CACHE)) is None:
+        cache = app.extensions[VERIFIED_TOKEN_CACHE] = TTLCache(
+            maxsize=int(app.config['VERIFIED_TOKEN_CACHE_SIZE']),
+            ttl=0)
+    return cache
+
+
 def decode(app: Flask, token: str) -> dict:
-    return jwt.decode(token, key=app.config['JWT_SECRET'], algorithms=['HS256'])
+    """
+    Verify and decode `token`. Payloads are shared between requests
+    presenting the same token, so callers must treat them as read-only.
+    """
+    cache = get_verified_token_cache(app)
+    key = hashlib.sha256(token.encode()).digest()
+    if (payload := cache.get(key)) is not None:
+        return payload
+
+    payload = jwt.decode(token, key=app.config['JWT_SECRET'], algorithms=['HS256'])
+    if isinstance(exp := payload.get('exp'), (int, float)):
+        cache.set(key, payload, ttl=exp - time.time())
+    return payload
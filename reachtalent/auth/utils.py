@@ -1,17 +1,32 @@
 import functools
+import threading
+import time
+from collections import defaultdict
 from dataclasses import dataclass
+from itertools import chain
 
 import jwt
 import sqlalchemy as sa
-from flask import request, current_app, abort, g
+from flask import Flask, request, current_app, abort, g, has_app_context
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.local import LocalProxy
 
 from . import tokens
-from .models import db, User, Role
-from ..core.models import Client
+from .models import db, User, Role, Permission, role_permission
+from ..cache import TTLCache
+from ..core.models import CacheVersion, Client, ClientUser
 from ..logger import make_logger
 
 logger = make_logger('reachtalent.auth')
 
+AUTH_STATE_CACHE = 'reachtalent.auth_state_cache'
+AUTH_STATE_VERSION = 'auth_state'
+PERMISSION_INDEX = 'reachtalent.permission_index'
+
+# Rows whose changes alter the identity or permissions resolved from an auth token.
+AUTH_STATE_MODELS = (User, Client, ClientUser, Role, Permission)
+
 
 @dataclass
 class AuthState:
@@ -23,6 +38,159 @@ class AuthState:
     role: Role | None = None
 
 
+@dataclass(frozen=True)
+class CachedIdentity:
+    """
+    Column snapshots of a resolved user/client/role, safe to share across
+    requests and threads (unlike the session bound ORM instances).
+    """
+    user: dict
+    client: dict | None
+    role: dict
+
+
+class AuthStateCache(TTLCache):
+    """
+    Resolved identities keyed by (sub, iat, X-Client-ID). The shared
+    `auth_state` CacheVersion, bumped on commit of any `AUTH_STATE_MODELS`
+    change, is polled at most every `poll_interval` seconds and clears the
+    cache when it moves, so other workers drop identities changed elsewhere.
+    """
+    VERSION_NAME = AUTH_STATE_VERSION
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, poll_interval: float = 5.0):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.poll_interval = poll_interval
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._poll_lock = threading.Lock()
+
+    def poll(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        with self._poll_lock:
+            version = CacheVersion.current(self.VERSION_NAME)
+            if version != self._version:
+                self.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        self.clear()
+        self._version = None
+
+
+def get_auth_state_cache(app: Flask) -> AuthStateCache:
+    if (cache := app.extensions.get(AUTH_STATE_CACHE)) is None:
+        cache = app.extensions.setdefault(AUTH_STATE_CACHE, AuthStateCache(
+            maxsize=int(app.config['AUTH_STATE_CACHE_SIZE']),
+            ttl=float(app.config['AUTH_STATE_CACHE_TTL']),
+            poll_interval=float(app.config['AUTH_STATE_POLL_INTERVAL'])))
+    return cache
+
+
+class PermissionIndex:
+    """
+    Compiled `role_id -> frozenset(permission names)` for every role, loaded
+    with a single query. The shared `permission_index` CacheVersion, bumped on
+    commit of any `AUTH_STATE_MODELS` change and by `auth sync_data`, is polled
+    at most every `poll_interval` seconds so a bump reloads the index in every
+    worker.
+    """
+    VERSION_NAME = tokens.PERMISSION_INDEX_VERSION
+
+    def __init__(self, poll_interval: float = 30.0):
+        self.poll_interval = poll_interval
+        self._roles: dict[int, frozenset[str]] | None = None
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        self._poll()
+        return self._version
+
+    def permissions(self, role_id: int) -> frozenset[str]:
+        self._poll()
+        if (roles := self._roles) is None:
+            with self._lock:
+                if (roles := self._roles) is None:
+                    roles = self._roles = self._load()
+        return roles.get(role_id, frozenset())
+
+    def invalidate(self):
+        self._roles = None
+        self._version = None
+
+    def _poll(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        with self._lock:
+            version = CacheVersion.current(self.VERSION_NAME)
+            if version != self._version:
+                self._roles = None
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _load() -> dict[int, frozenset[str]]:
+        role_perms = defaultdict(set)
+        for role_id, perm_name in db.session.execute(
+                sa.select(role_permission.c.role_id, Permission.name).
+                join(Permission, Permission.id == role_permission.c.permission_id)):
+            role_perms[role_id].add(perm_name)
+        return {
+            role_id: frozenset(perms)
+            for role_id, perms in role_perms.items()
+        }
+
+
+def get_permission_index(app: Flask) -> PermissionIndex:
+    if (index := app.extensions.get(PERMISSION_INDEX)) is None:
+        index = app.extensions.setdefault(PERMISSION_INDEX, PermissionIndex(
+            poll_interval=float(app.config['PERMISSION_INDEX_POLL_INTERVAL'])))
+    return index
+
+
+def _snapshot(obj) -> dict | None:
+    if obj is None:
+        return None
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in sa.inspect(obj).mapper.column_attrs
+    }
+
+
+def _restore(model, values: dict | None):
+    """
+    Attach a snapshot to the current session without emitting any SELECT.
+    """
+    if values is None:
+        return None
+    obj = sa.inspect(model).class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+
+def _resolve_identity(auth_state: AuthState, header_client_id: int | None):
+    auth_state.user = db.session.get(User, auth_state.payload['sub'])
+
+    default_client_id = auth_state.payload.get('rti', {}).get('default_client_id')
+
+    active_client_role = auth_state.user.active_client_role(header_client_id, default_client_id)
+    if active_client_role:
+        auth_state.client = active_client_role.client
+        auth_state.role = active_client_role.role
+
+    if auth_state.role is None:
+        auth_state.role = Role.query.filter_by(
+            name='Default',
+            client_id=sa.null()).one()
+
+
 def _parse_auth_token_state() -> AuthState:
     auth_state = AuthState(token=request.cookies.get('AuthToken'))
 
@@ -40,29 +208,20 @@ def _parse_auth_token_state() -> AuthState:
                 raise Exception("Invalid token use code `%s`", auth_state.payload.get('use'))
             if not auth_state.payload.get('sub'):
                 raise Exception("Missing token sub")
-            auth_state.user = db.session.get(User, auth_state.payload['sub'])
-
-            default_client_id = auth_state.payload.get('rti', {}).get('default_client_id')
-
-            client_roles = {
-                cr.client_id: cr
-                for cr in auth_state.user.client_roles
-            }
 
-            active_client_role = next(iter(client_roles)) if client_roles else None
-            if header_client_id in client_roles:
-                active_client_role = client_roles[header_client_id]
-            elif default_client_id in client_roles:
-                active_client_role = client_roles[default_client_id]
-
-            if active_client_role:
-                auth_state.client = active_client_role.client
-                auth_state.role = active_client_role.role
-
-            if auth_state.role is None:
-                auth_state.role = Role.query.filter_by(
-                    name='Default',
-                    client_id=sa.null()).one()
+            cache = get_auth_state_cache(current_app)
+            cache.poll()
+            cache_key = (auth_state.payload['sub'], auth_state.payload.get('iat'), header_client_id)
+            if identity := cache.get(cache_key):
+                auth_state.user = _restore(User, identity.user)
+                auth_state.client = _restore(Client, identity.client)
+                auth_state.role = _restore(Role, identity.role)
+            else:
+                _resolve_identity(auth_state, header_client_id)
+                cache.set(cache_key, CachedIdentity(
+                    user=_snapshot(auth_state.user),
+                    client=_snapshot(auth_state.client),
+                    role=_snapshot(auth_state.role)))
 
         except jwt.exceptions.ExpiredSignatureError as exc:
             logger.debug("authentication failure due to: %s", exc)
@@ -76,8 +235,58 @@ def _parse_auth_token_state() -> AuthState:
     return auth_state
 
 
+@sa.event.listens_for(Session, 'after_flush')
+def _track_auth_state_changes(session, flush_context):
+    if any(isinstance(obj, AUTH_STATE_MODELS)
+           for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['auth_state_changed'] = True
+
+
+@sa.event.listens_for(Session, 'after_bulk_update')
+@sa.event.listens_for(Session, 'after_bulk_delete')
+def _track_auth_state_bulk_changes(context):
+    if context.mapper is not None and issubclass(context.mapper.class_, AUTH_STATE_MODELS):
+        context.session.info['auth_state_changed'] = True
+
+
+@sa.event.listens_for(Session, 'before_commit')
+def _bump_auth_state_versions(session):
+    # Runs before the final flush of the commit, so look at pending objects too
+    if session.info.get('auth_state_changed') or any(
+            isinstance(obj, AUTH_STATE_MODELS)
+            for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['auth_state_changed'] = True
+        CacheVersion.bump(AUTH_STATE_VERSION)
+        # Reloads the permission index of every worker and retires the scope
+        # claims of tokens already issued
+        CacheVersion.bump(PermissionIndex.VERSION_NAME)
+
+
+@sa.event.listens_for(Session, 'after_commit')
+def _invalidate_auth_state_cache(session):
+    if session.info.pop('auth_state_changed', False) and has_app_context():
+        get_auth_state_cache(current_app).invalidate()
+        get_permission_index(current_app).invalidate()
+
+
+@sa.event.listens_for(Session, 'after_rollback')
+def _discard_auth_state_changes(session):
+    session.info.pop('auth_state_changed', None)
+
+
+def _current_auth_state() -> AuthState:
+    if '_auth_state' not in g:
+        g._auth_state = _parse_auth_token_state()
+    return g._auth_state
+
+
 def auth_middleware():
-    g.auth_state = _parse_auth_token_state()
+    """
+    Install a lazy `g.auth_state`. The token is only decoded and resolved
+    against the database the first time a view, decorator or schema reads it,
+    so public and spec endpoints cost no queries.
+    """
+    g.auth_state = LocalProxy(_current_auth_state)
 
 
 def authenticated(_func):
@@ -91,9 +300,41 @@ def authenticated(_func):
     return wrapped
 
 
+def _token_scope_permissions(role: Role) -> frozenset[str] | None:
+    """
+    Permissions encoded in the auth token's scope claim, if the claim was
+    issued for `role` against the current permission version.
+    """
+    payload = getattr(g.get('auth_state'), 'payload', None) or {}
+    scope = (payload.get('rti') or {}).get('scope')
+    if not scope or scope.get('role_id') != role.id:
+        return None
+    index = get_permission_index(current_app)
+    if scope.get('version') != tokens.scope_version(index.version):
+        return None
+    try:
+        return tokens.decode_scope(scope['perms'])
+    except (KeyError, TypeError, ValueError) as exc:
+        logger.info("Ignoring invalid token scope claim: %s", exc)
+        return None
+
+
+def role_permissions(role: Role) -> frozenset[str]:
+    """
+    Permission names granted to `role`, memoized for the rest of the request.
+    """
+    memo = g.setdefault('role_permissions', {})
+    if (perms := memo.get(role.id)) is None:
+        perms = _token_scope_permissions(role)
+        if perms is None:
+            perms = get_permission_index(current_app).permissions(role.id)
+        memo[role.id] = perms
+    return perms
+
+
 def _check_permission(role: Role, required_permission: str):
     # TODO: Enable field level interpolation
-    return required_permission in role.perms
+    return required_permission in role_permissions(role)
 
 
 def _enforce_permission(role: Role, required_permission: str):
@@ -793,6 +793,7 @@ def google_error(bp, message, response):
 
 # Register blueprint commands
 blueprint.cli.add_command(commands.sync_data, 'sync_data')
+blueprint.cli.add_command(commands.mail_worker, 'mail-worker')
 
 
 def init(app: Flask):
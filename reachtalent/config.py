@@ -57,6 +57,30 @@ class Config:
 
     # ReachTalent Settings
     JWT_SECRET: str = "foobar"
+    AUTH_STATE_CACHE_TTL: int = 30  # seconds, 0 disables caching
+    AUTH_STATE_CACHE_SIZE: int = 4096
+    AUTH_STATE_POLL_INTERVAL: int = 5  # seconds between CacheVersion checks
+    PERMISSION_INDEX_POLL_INTERVAL: int = 30  # seconds between CacheVersion checks
+    VERIFIED_TOKEN_CACHE_SIZE: int = 4096
+    AUTH_TOKEN_PERMISSION_CLAIMS: bool = False  # embed the active role's permissions in auth tokens
+    REFERENCE_DATA_CACHE_SIZE: int = 1024  # cached reference data responses, 0 disables caching
+    REFERENCE_DATA_CACHE_TTL: int = 300  # seconds
+    REFERENCE_DATA_POLL_INTERVAL: int = 30  # seconds between CacheVersion checks
+    CONTRACT_TERMS_POLL_INTERVAL: int = 30  # seconds between CacheVersion checks
+    QUERY_BUDGET: int = 30  # statements per request before it is logged, 0 disables
+    PROFILE_DIR: str = ''  # defaults to <instance path>/profiles
+    PROFILE_KEEP: int = 200  # newest request profiles kept in PROFILE_DIR
+    PROFILE_SAMPLE_RATE: float = 0.0  # fraction of requests profiled without the X-Profile header
+    METRICS_DIR: str = ''  # per-process metric files, defaults to <instance path>/metrics
+    METRICS_TOKEN: str = ''  # bearer token required to scrape /api/metrics, empty disables the endpoint
+    APPROVAL_DEFER_ASSIGNMENTS_ABOVE: int = 0  # leave larger approvals to `flask core assignment-worker`, 0 disables
+
+
+def as_bool(value) -> bool:
+    """Read a flag that may have been overridden from the environment as a string."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
 
 
 def get_config():
@@ -0,0 +1,212 @@
+"""
+Maintenance of the materialized `client_worker` availability table.
+
+A worker is available to a client once presented to or assigned on one of
+its requisitions. Every flush touching those links recomputes just the
+affected (client_id, worker_id) pairs from the source tables. Bulk
+updates/deletes, which do not say which rows they touched, look up the
+clients (or workers) their WHERE clause matches before running and
+recompute those.
+"""
+from itertools import chain, product
+from typing import Callable
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.sql.expression import BindParameter, ColumnElement, Select
+
+from .models import (
+    Assignment, Client, ClientWorker, Requisition, RequisitionPresentWorker, Worker
+)
+
+Predicate = Callable[[ColumnElement, ColumnElement], ColumnElement]
+
+WORKER_LINK_MODELS = (Assignment, RequisitionPresentWorker)
+# Columns whose bulk updates change the pairs, deleting rows of any of these may
+BULK_REFRESH_KEYS = {
+    Assignment: {'requisition_id', 'worker_id'},
+    Client: set(),
+    Requisition: {'client_id'},
+    RequisitionPresentWorker: {'requisition_id', 'worker_id'},
+    Worker: set(),
+}
+
+
+def client_worker_source(where: Predicate | None = None) -> Select:
+    """
+    The (client_id, worker_id) pairs `client_worker` should hold, optionally
+    restricted by `where(client_id, worker_id)` in each branch of the union.
+    """
+    branches = []
+    for link in WORKER_LINK_MODELS:
+        branch = (
+            sa.select(Requisition.client_id, link.worker_id)
+            .join(Requisition, Requisition.id == link.requisition_id)
+            .filter(Requisition.client_id.is_not(None), link.worker_id.is_not(None))
+        )
+        if where is not None:
+            branch = branch.filter(where(Requisition.client_id, link.worker_id))
+        branches.append(branch)
+    return sa.union(*branches)
+
+
+def refresh_client_workers(connection: sa.engine.Connection, where: Predicate | None = None) -> int:
+    """
+    Recompute the `client_worker` rows matching `where(client_id, worker_id)`,
+    or the whole table without it. Only stale rows are deleted and missing
+    ones inserted, ignoring conflicts with concurrent refreshes of the same
+    pairs. Returns the number of rows deleted and inserted.
+    """
+    table = ClientWorker.__table__
+    source = client_worker_source(where).subquery()
+
+    delete = table.delete().where(
+        sa.tuple_(table.c.client_id, table.c.worker_id).not_in(sa.select(source.c.client_id, source.c.worker_id)))
+    if where is not None:
+        delete = delete.where(where(table.c.client_id, table.c.worker_id))
+    deleted = connection.execute(delete).rowcount
+
+    missing = sa.select(source.c.client_id, source.c.worker_id).where(~sa.exists().where(
+        table.c.client_id == source.c.client_id, table.c.worker_id == source.c.worker_id))
+    insert = _insert_ignoring_conflicts(connection, table).from_select(['client_id', 'worker_id'], missing)
+    return deleted + connection.execute(insert).rowcount
+
+
+def _insert_ignoring_conflicts(connection: sa.engine.Connection, table: sa.Table):
+    if connection.dialect.name == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if connection.dialect.name == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
+def check_client_workers(connection: sa.engine.Connection) -> tuple[set, set]:
+    """
+    Compare `client_worker` to the source tables, returns the (client_id,
+    worker_id) pairs it is missing and the ones it holds in excess.
+    """
+    expected = {tuple(row) for row in connection.execute(client_worker_source())}
+    actual = {
+        tuple(row) for row in connection.execute(
+            sa.select(ClientWorker.client_id, ClientWorker.worker_id))
+    }
+    return expected - actual, actual - expected
+
+
+def _values(obj, key: str) -> set:
+    """The current and pre-flush values of the attribute `key` of `obj`."""
+    history = sa.inspect(obj).attrs[key].history
+    return {value for value in chain([getattr(obj, key)], history.deleted or ()) if value is not None}
+
+
+def _changed(obj, *keys: str) -> bool:
+    attrs = sa.inspect(obj).attrs
+    return any(attrs[key].history.has_changes() for key in keys)
+
+
+@sa.event.listens_for(Session, 'after_flush')
+def _refresh_flushed_client_workers(session, flush_context):
+    client_ids = set()
+    client_workers = set()
+    requisition_workers = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, WORKER_LINK_MODELS):
+            if obj in session.deleted or _changed(obj, 'requisition_id', 'worker_id'):
+                requisition_workers.update(
+                    product(_values(obj, 'requisition_id'), _values(obj, 'worker_id')))
+        elif isinstance(obj, Requisition):
+            # Moving or deleting a requisition may affect any of its workers
+            if obj in session.deleted or _changed(obj, 'client_id'):
+                client_ids.update(_values(obj, 'client_id'))
+            # presented_workers goes through the secondary table, not RequisitionPresentWorker
+            presented = sa.inspect(obj).attrs.presented_workers.history
+            if obj.client_id is not None:
+                client_workers.update(
+                    (obj.client_id, worker.id) for worker in chain(presented.added or (), presented.deleted or ()))
+
+    if not (client_ids or client_workers or requisition_workers):
+        return
+
+    connection = session.connection()
+    if requisition_workers:
+        requisition_clients = dict(connection.execute(
+            sa.select(Requisition.id, Requisition.client_id).
+            filter(Requisition.id.in_({requisition_id for requisition_id, _ in requisition_workers}))
+        ).all())
+        client_workers.update(
+            (requisition_clients[requisition_id], worker_id)
+            for requisition_id, worker_id in requisition_workers
+            if requisition_clients.get(requisition_id) is not None
+        )
+
+    def affected(client_id, worker_id):
+        clauses = []
+        if client_workers:
+            clauses.append(sa.tuple_(client_id, worker_id).in_(client_workers))
+        if client_ids:
+            clauses.append(client_id.in_(client_ids))
+        return sa.or_(*clauses)
+
+    refresh_client_workers(connection, affected)
+
+
+def _updated_values(statement) -> dict:
+    if not statement.is_update:
+        return {}
+    values = statement._ordered_values or (statement._values or {}).items()
+    return {getattr(key, 'key', key): value for key, value in values}
+
+
+def _bulk_affected(connection: sa.engine.Connection, model, statement) -> Predicate | None:
+    """
+    The pairs a bulk UPDATE/DELETE of `model` may change, looked up before
+    it runs. None when they can't be narrowed down.
+    """
+    if (where := statement.whereclause) is None:
+        return None
+
+    if model is Worker:
+        worker_ids = set(connection.scalars(sa.select(Worker.id).where(where)))
+        return lambda client_id, worker_id: worker_id.in_(worker_ids)
+
+    if model is Client:
+        query = sa.select(Client.id).where(where)
+    elif model is Requisition:
+        query = sa.select(Requisition.client_id).where(where)
+    else:
+        query = (sa.select(Requisition.client_id).select_from(model)
+                 .join(Requisition, Requisition.id == model.requisition_id).where(where))
+    client_ids = set(connection.scalars(query))
+
+    # Rows moved to another client or requisition affect that one too
+    for key, value in _updated_values(statement).items():
+        if key not in ('client_id', 'requisition_id'):
+            continue
+        if not isinstance(value, BindParameter):
+            return None
+        if key == 'client_id':
+            client_ids.add(value.value)
+        else:
+            client_ids.add(connection.scalar(
+                sa.select(Requisition.client_id).filter(Requisition.id == value.value)))
+
+    return lambda client_id, worker_id: client_id.in_(client_ids - {None})
+
+
+@sa.event.listens_for(Session, 'do_orm_execute')
+def _refresh_bulk_client_workers(state: ORMExecuteState):
+    if not (state.is_update or state.is_delete) or state.bind_mapper is None:
+        return None
+    model = state.bind_mapper.class_
+    if (keys := BULK_REFRESH_KEYS.get(model)) is None:
+        return None
+    if state.is_update and not keys.intersection(_updated_values(state.statement)):
+        return None
+
+    connection = state.session.connection()
+    affected = _bulk_affected(connection, model, state.statement)
+    result = state.invoke_statement()
+    refresh_client_workers(connection, affected)
+    return result
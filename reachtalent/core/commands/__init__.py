@@ -1,9 +1,21 @@
+from .assignment_worker import assignment_worker_cmd
+from .bench import bench_cmd
+from .client_workers import client_workers_cmd
+from .loadtest import loadtest_cmd
 from .odoo_push import odoo_push_cmd
+from .profiles import profiles_cmd
+from .seed import seed_cmd
 from .sync_client import sync_client_cmd, sync_undo_cmd, dump_census_sheet_cmd
 from .update_data import update_data_cmd
 
 __ALL__ = [
+    assignment_worker_cmd,
+    bench_cmd,
+    client_workers_cmd,
+    loadtest_cmd,
     odoo_push_cmd,
+    profiles_cmd,
+    seed_cmd,
     sync_client_cmd,
     sync_undo_cmd,
     dump_census_sheet_cmd,
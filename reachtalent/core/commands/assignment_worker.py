@@ -0,0 +1,53 @@
+import time
+
+import click
+
+from .. import models
+from ...extensions import db
+
+
+def fill_awaiting_assignments(batch_size: int = 10) -> tuple[int, int]:
+    """
+    Create the assignments deferred by `Requisition.approve`, committing
+    after every batch of requisitions.
+
+    :return: (requisitions, assignments) created counts
+    """
+    requisitions = assignments = 0
+    while True:
+        batch = db.session.scalars(
+            models.Requisition.awaiting_assignments_query()
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for requisition in batch:
+            assignments += requisition.create_open_assignments()
+        requisitions += len(batch)
+        db.session.commit()
+
+        if len(batch) < batch_size:
+            break
+
+    return requisitions, assignments
+
+
+@click.command('assignment-worker')
+@click.option('--batch-size', type=click.IntRange(1), default=10, show_default=True,
+              help='Number of requisitions filled per transaction')
+@click.option('--poll-interval', type=float, default=5.0, show_default=True,
+              help='Seconds to wait between passes')
+@click.option('--once', is_flag=True, default=False,
+              help='Fill the awaiting requisitions once and exit')
+def assignment_worker_cmd(batch_size: int, poll_interval: float, once: bool):
+    """
+    Create the assignments of approved requisitions deferred by
+    APPROVAL_DEFER_ASSIGNMENTS_ABOVE.
+    """
+    while True:
+        requisitions, assignments = fill_awaiting_assignments(batch_size=batch_size)
+        if requisitions:
+            click.echo(f'Created {assignments} assignment(s) for {requisitions} requisition(s)')
+
+        if once:
+            break
+        time.sleep(poll_interval)
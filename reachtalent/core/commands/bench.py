@@ -0,0 +1,60 @@
+import json
+
+import click
+
+
+@click.command('bench')
+@click.option('--benchmark', '-b', 'names', multiple=True,
+              help='Only run these benchmarks, see --list')
+@click.option('--scale', '-s', 'scales', type=click.IntRange(1), multiple=True,
+              help='Rows per seeded table, repeatable  [default: 10, 100, 1000]')
+@click.option('--repeat', type=click.IntRange(1), default=5, show_default=True,
+              help='Timed batches per benchmark and scale')
+@click.option('--min-time', type=click.FloatRange(0), default=0.2, show_default=True,
+              help='Seconds each timed batch runs for at least')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Write the results as JSON to this file, - for stdout')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Compare against the JSON results of an earlier run')
+@click.option('--threshold', type=click.FloatRange(0), default=0.2, show_default=True,
+              help='Relative slowdown of the median reported as a regression')
+@click.option('--list', 'list_only', is_flag=True, help='List the benchmarks and exit')
+def bench_cmd(names: tuple[str], scales: tuple[int], repeat: int, min_time: float, output: str | None,
+              baseline_path: str | None, threshold: float, list_only: bool):
+    """
+    Time the hot internals at several data scales on a throwaway SQLite
+    database. Fails when --compare finds a regression.
+    """
+    try:
+        from benchmarks import suite
+    except ImportError as exc:
+        raise click.ClickException(f"The benchmarks package is only available in a source checkout: {exc}")
+
+    if list_only:
+        click.echo('\n'.join(suite.BENCHMARKS))
+        return
+    if unknown := set(names) - set(suite.BENCHMARKS):
+        raise click.BadParameter(f"Unknown benchmark(s): {', '.join(sorted(unknown))}", param_hint='--benchmark')
+
+    baseline = suite.load(baseline_path) if baseline_path else None
+    results = suite.run(
+        list(names or suite.BENCHMARKS), list(scales or suite.DEFAULT_SCALES),
+        repeat=repeat, min_time=min_time, progress=lambda message: click.echo(message, err=True))
+
+    if output == '-':
+        click.echo(json.dumps(results, indent=2))
+    elif output:
+        with open(output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+        click.echo(f"Wrote {len(results['results'])} result(s) to {output}", err=True)
+
+    if baseline is None:
+        return
+    rows = suite.compare(results, baseline, threshold)
+    for row in rows:
+        click.echo(
+            f"{row['benchmark']:32} {row['scale']:>6} {suite.format_seconds(row['baseline']):>10}"
+            f" -> {suite.format_seconds(row['median']):>10} {row['ratio']:6.2f}x"
+            f"{'  REGRESSION' if row['regression'] else ''}", err=True)
+    if regressions := sum(row['regression'] for row in rows):
+        raise click.ClickException(f"{regressions} benchmark(s) regressed by more than {threshold:.0%}")
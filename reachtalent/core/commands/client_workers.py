@@ -0,0 +1,46 @@
+import click
+
+from ...extensions import db
+from ..availability import check_client_workers, refresh_client_workers
+
+
+@click.group('client-workers')
+def client_workers_cmd():
+    """
+    Maintain the materialized client_worker availability table.
+    """
+
+
+@client_workers_cmd.command('rebuild')
+@click.option('--dry-run', '-x', is_flag=True, default=False,
+              help='Show what changes would be made')
+def rebuild_cmd(dry_run: bool):
+    """
+    Recompute every client_worker row from presented and assigned workers.
+    """
+    count = refresh_client_workers(db.session.connection())
+    click.echo(f"Rebuilt client_worker: {count} rows changed")
+
+    if not dry_run:
+        db.session.commit()
+    else:
+        db.session.rollback()
+        click.echo("**DRY RUN CHANGES NOT COMMITTED**")
+
+
+@client_workers_cmd.command('check')
+def check_cmd():
+    """
+    Verify client_worker matches presented and assigned workers, exits
+    non-zero listing the differences otherwise.
+    """
+    missing, extra = check_client_workers(db.session.connection())
+    for client_id, worker_id in sorted(missing):
+        click.echo(f"missing client_id={client_id} worker_id={worker_id}")
+    for client_id, worker_id in sorted(extra):
+        click.echo(f"extra client_id={client_id} worker_id={worker_id}")
+    if missing or extra:
+        raise click.ClickException(
+            f"client_worker is inconsistent: {len(missing)} missing, {len(extra)} extra, "
+            f"run `flask core client-workers rebuild`")
+    click.echo("client_worker is consistent")
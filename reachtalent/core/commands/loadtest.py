@@ -0,0 +1,59 @@
+import json
+
+import click
+from flask import current_app
+
+
+@click.command('loadtest')
+@click.option('--url', default=None,
+              help='Load a running server instead of starting gunicorn, e.g. http://127.0.0.1:8000')
+@click.option('--workers', '-w', type=click.IntRange(1), default=2, show_default=True,
+              help='gunicorn worker processes')
+@click.option('--threads', type=click.IntRange(1), default=5, show_default=True,
+              help='gunicorn threads per worker')
+@click.option('--concurrency', '-c', type=click.IntRange(1), default=16, show_default=True,
+              help='Concurrent client connections')
+@click.option('--duration', '-d', type=click.FloatRange(0, min_open=True), default=30.0, show_default=True,
+              help='Seconds to apply load for')
+@click.option('--clients', type=click.IntRange(1), default=10, show_default=True,
+              help='Seeded clients whose admins make the calls')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed of the request mix')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Write the results as JSON to this file, - for stdout')
+def loadtest_cmd(url: str | None, workers: int, threads: int, concurrency: int, duration: float, clients: int,
+                 seed: int, output: str | None):
+    """
+    Drive a weighted mix of list, detail, create and approval calls against
+    gunicorn on localhost and report throughput, latency percentiles and
+    error rates per call.
+    """
+    try:
+        from benchmarks import loadtest
+    except ImportError as exc:
+        raise click.ClickException(f"The benchmarks package is only available in a source checkout: {exc}")
+
+    tenants = loadtest.load_tenants(current_app, clients)
+    if not tenants:
+        raise click.ClickException("No client to load test with, run `flask core seed` first")
+    click.echo(f"Loading {len(tenants)} client(s) as their admins", err=True)
+
+    def apply_load(base_url: str) -> dict:
+        click.echo(f"Applying load to {base_url} for {duration:g}s", err=True)
+        return loadtest.run(base_url, tenants, duration, concurrency, seed=seed)
+
+    if url:
+        results = apply_load(url)
+    else:
+        try:
+            with loadtest.gunicorn_server(current_app, workers, threads) as base_url:
+                results = apply_load(base_url)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc))
+        results['server'] = {'workers': workers, 'threads': threads}
+
+    click.echo(loadtest.format_report(results), err=output == '-')
+    if output == '-':
+        click.echo(json.dumps(results, indent=2))
+    elif output:
+        with open(output, 'w') as fp:
+            json.dump(results, fp, indent=2)
@@ -0,0 +1,41 @@
+import io
+import pstats
+from collections import Counter
+
+import click
+from flask import current_app
+
+from ...profiling import PROFILE_NAME, list_profiles, profile_dir
+
+
+@click.command('profiles')
+@click.option('--endpoint', '-e', default=None,
+              help='Only summarize profiles of this endpoint, e.g. core.list_requisition')
+@click.option('--sort', 'sort_key', default='cumulative', show_default=True,
+              type=click.Choice(['cumulative', 'tottime', 'ncalls']),
+              help='Order the hottest functions by')
+@click.option('--limit', '-n', type=click.IntRange(1), default=25, show_default=True,
+              help='Number of functions to show')
+def profiles_cmd(endpoint: str | None, sort_key: str, limit: int):
+    """
+    Summarize the hottest functions across the captured request profiles.
+    """
+    directory = profile_dir(current_app)
+    paths = list_profiles(directory, endpoint=endpoint)
+    if not paths:
+        raise click.ClickException(f"No profiles found in {directory}")
+
+    captured = Counter()
+    queries = Counter()
+    for path in paths:
+        match = PROFILE_NAME.match(path.name)
+        captured[match['endpoint']] += 1
+        queries[match['endpoint']] += int(match['queries'])
+
+    click.echo(f"{len(paths)} profile(s) in {directory}")
+    for name, count in captured.most_common():
+        click.echo(f"  {name}: {count} request(s), {queries[name] / count:.1f} queries avg")
+
+    out = io.StringIO()
+    pstats.Stats(*map(str, paths), stream=out).strip_dirs().sort_stats(sort_key).print_stats(limit)
+    click.echo(out.getvalue())
@@ -0,0 +1,336 @@
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+import click
+import sqlalchemy as sa
+
+from ...auth.models import Role, User
+from ...extensions import db
+from ..availability import refresh_client_workers
+from ..models import (
+    ApprovalState, Assignment, AssignmentState, CacheVersion, Category,
+    CategoryItem, Client, ClientUser, Contract, ContractTerm,
+    ContractTermDefinition, CostCenter, Department, JobClassification,
+    Location, Position, PurchaseOrder, Requisition, RequisitionPresentWorker,
+    Schedule, States, Worker, department_location, department_position,
+    purchase_order_department, CONTRACT_TERMS_VERSION,
+)
+from ..response_cache import REFERENCE_DATA_VERSION
+
+# Dates are anchored so the same seed generates the same rows on any day
+SEED_EPOCH = date(2024, 1, 1)
+DEPARTMENTS_PER_CLIENT = 10
+LOCATIONS_PER_CLIENT = 5
+SCHEDULES_PER_CLIENT = 3
+COST_CENTERS_PER_CLIENT = 10
+PURCHASE_ORDERS_PER_CLIENT = 5
+
+REQUISITION_STATES = {
+    (States.ACTIVE, ApprovalState.APPROVED): 70,
+    (States.PENDING, ApprovalState.PENDING): 20,
+    (States.ACTIVE, ApprovalState.REJECTED): 10,
+}
+ASSIGNMENT_STATES = {
+    AssignmentState.ACTIVE: 50,
+    AssignmentState.ENDED: 20,
+    AssignmentState.PENDING_START: 10,
+    AssignmentState.OFFER_MADE: 10,
+    AssignmentState.CANCELED: 5,
+    AssignmentState.ONBOARDING: 5,
+}
+
+
+@dataclass
+class References:
+    admin_role_id: int
+    hiring_manager_role_id: int
+    job_classifications: list[tuple[int, str]]
+    term_definitions: dict[str, int]
+    requisition_types: list[int]
+    pay_schemes: list[int]
+
+
+def _load_references(connection: sa.engine.Connection) -> References:
+    roles = dict(connection.execute(
+        sa.select(Role.name, Role.id).filter(Role.client_id.is_(None), Role.name.in_(['Admin', 'Hiring Manager']))
+    ).all())
+
+    def category_items(key: str) -> list[int]:
+        return connection.execute(
+            sa.select(CategoryItem.id).join(Category).filter(Category.key == key).order_by(CategoryItem.id)
+        ).scalars().all()
+
+    refs = References(
+        admin_role_id=roles.get('Admin'),
+        hiring_manager_role_id=roles.get('Hiring Manager'),
+        job_classifications=connection.execute(
+            sa.select(JobClassification.id, JobClassification.contract_term_prefix).order_by(JobClassification.id)
+        ).all(),
+        term_definitions=dict(connection.execute(sa.select(ContractTermDefinition.ref, ContractTermDefinition.id)).all()),
+        requisition_types=category_items('requisition_type'),
+        pay_schemes=category_items('pay_scheme'),
+    )
+    if not (refs.admin_role_id and refs.hiring_manager_role_id):
+        raise click.ClickException("Roles are missing, run `flask auth sync_data` first")
+    if not (refs.job_classifications and refs.term_definitions and refs.requisition_types and refs.pay_schemes):
+        raise click.ClickException("Categorical data is missing, run `flask core update-data` first")
+    return refs
+
+
+class IdAllocator:
+    """
+    Hands out primary keys above each table's current maximum so generated
+    rows can reference each other before any of them is inserted. Assumes
+    nothing else inserts into the tables while seeding.
+    """
+
+    def __init__(self, connection: sa.engine.Connection):
+        self._connection = connection
+        self._next = {}
+
+    def take(self, model, count: int) -> range:
+        table = model.__table__
+        if table.name not in self._next:
+            self._next[table.name] = (self._connection.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0) + 1
+        start = self._next[table.name]
+        self._next[table.name] += count
+        return range(start, start + count)
+
+    def tables(self) -> list[sa.Table]:
+        return [table for table in db.metadata.sorted_tables if table.name in self._next]
+
+
+def _money(rng: random.Random, low: int, high: int) -> Decimal:
+    return Decimal(rng.randrange(low * 100, high * 100)) / 100
+
+
+def generate_client(rng: random.Random, ids: IdAllocator, refs: References, workers: int, positions: int,
+                    requisitions: int, assignments: int, presented: int) -> dict[sa.Table, list[dict]]:
+    """
+    Rows of one synthetic client keyed by table, in insert order. Every
+    client of a run gets the same number of rows.
+    """
+    client_id = ids.take(Client, 1)[0]
+    admin_id, manager_id = ids.take(User, 2)
+    worker_user_ids = ids.take(User, workers)
+    worker_ids = ids.take(Worker, workers)
+    department_ids = ids.take(Department, DEPARTMENTS_PER_CLIENT)
+    location_ids = ids.take(Location, LOCATIONS_PER_CLIENT)
+    schedule_ids = ids.take(Schedule, SCHEDULES_PER_CLIENT)
+    cost_center_ids = ids.take(CostCenter, COST_CENTERS_PER_CLIENT)
+    purchase_order_ids = ids.take(PurchaseOrder, PURCHASE_ORDERS_PER_CLIENT)
+    position_ids = ids.take(Position, positions)
+    contract_id = ids.take(Contract, 1)[0]
+    requisition_ids = ids.take(Requisition, requisitions)
+
+    rows = {}
+    rows[Client.__table__] = [{'id': client_id, 'name': f'Seed {client_id}'}]
+    users = [(admin_id, 'admin'), (manager_id, 'manager'), *((user_id, 'worker') for user_id in worker_user_ids)]
+    rows[User.__table__] = [
+        {'id': user_id, 'email': f'{kind}-{user_id}@seed.example', 'name': f'Seed {kind.title()} {user_id}',
+         'email_verified': True}
+        for user_id, kind in users
+    ]
+    rows[ClientUser.__table__] = [
+        {'client_id': client_id, 'user_id': admin_id, 'role_id': refs.admin_role_id},
+        {'client_id': client_id, 'user_id': manager_id, 'role_id': refs.hiring_manager_role_id},
+    ]
+    rows[Worker.__table__] = [
+        {'id': worker_id, 'user_id': user_id, 'phone_number': f'+1 555 {rng.randrange(10 ** 7):07}'}
+        for worker_id, user_id in zip(worker_ids, worker_user_ids)
+    ]
+    rows[Department.__table__] = [
+        {'id': department_id, 'client_id': client_id, 'number': str(1000 + ix), 'name': f'Department {ix}'}
+        for ix, department_id in enumerate(department_ids)
+    ]
+    rows[Location.__table__] = [
+        {'id': location_id, 'client_id': client_id, 'name': f'Site {ix}', 'description': '',
+         'street': f'{rng.randrange(1, 9999)} Main St', 'city': 'Springfield', 'state': 'IL',
+         'zip': f'{rng.randrange(60000, 63000)}', 'country': 'US'}
+        for ix, location_id in enumerate(location_ids)
+    ]
+    rows[department_location] = [
+        {'department_id': department_id, 'location_id': location_ids[ix % len(location_ids)]}
+        for ix, department_id in enumerate(department_ids)
+    ]
+    rows[Schedule.__table__] = [
+        {'id': schedule_id, 'client_id': client_id, 'name': f'Shift {ix}', 'description': ''}
+        for ix, schedule_id in enumerate(schedule_ids)
+    ]
+    rows[CostCenter.__table__] = [
+        {'id': cost_center_id, 'client_id': client_id, 'name': f'Cost Center {ix}', 'description': ''}
+        for ix, cost_center_id in enumerate(cost_center_ids)
+    ]
+    rows[PurchaseOrder.__table__] = [
+        {'id': purchase_order_id, 'client_id': client_id, 'ext_ref': f'PO-{purchase_order_id}'}
+        for purchase_order_id in purchase_order_ids
+    ]
+    rows[purchase_order_department] = [
+        {'purchase_order_id': purchase_order_id, 'department_id': department_ids[ix % len(department_ids)]}
+        for ix, purchase_order_id in enumerate(purchase_order_ids)
+    ]
+
+    # One open ended contract marking up every job classification
+    rows[Contract.__table__] = [
+        {'id': contract_id, 'client_id': client_id, 'effective_start_date': SEED_EPOCH - timedelta(days=365),
+         'effective_end_date': None}
+    ]
+    markups = {}
+    for _, prefix in refs.job_classifications:
+        suffix = rng.choice(('pct', 'flat'))
+        if f'{prefix}{suffix}' not in refs.term_definitions:
+            continue
+        value = Decimal(rng.randrange(5, 40)) / 100 if suffix == 'pct' else Decimal(rng.randrange(2, 15))
+        markups[prefix] = {f'{prefix}{suffix}': value}
+    rows[ContractTerm.__table__] = [
+        {'contract_id': contract_id, 'contract_term_definition_id': refs.term_definitions[ref], 'val_numeric': value}
+        for terms in markups.values()
+        for ref, value in terms.items()
+    ]
+
+    position_rows = []
+    for ix, position_id in enumerate(position_ids):
+        job_classification_id, prefix = rng.choice(refs.job_classifications)
+        pay_rate_min = _money(rng, 15, 40)
+        position_rows.append({
+            'id': position_id, 'client_id': client_id, 'title': f'Position {ix}', 'job_description': '',
+            'job_classification_id': job_classification_id, 'requirements': [],
+            'pay_rate_min': pay_rate_min, 'pay_rate_max': pay_rate_min + _money(rng, 0, 15),
+            'is_remote': rng.random() < 0.2,
+        })
+    rows[Position.__table__] = position_rows
+    rows[department_position] = [
+        {'department_id': department_ids[ix % len(department_ids)], 'position_id': position_id}
+        for ix, position_id in enumerate(position_ids)
+    ]
+    prefixes = dict(refs.job_classifications)
+
+    requisition_rows = []
+    for requisition_id in requisition_ids:
+        position = rng.choice(position_rows)
+        state, approval_state = rng.choices(list(REQUISITION_STATES), weights=REQUISITION_STATES.values())[0]
+        start_date = SEED_EPOCH + timedelta(days=rng.randrange(-180, 180))
+        requisition_rows.append({
+            'id': requisition_id, 'client_id': client_id, 'state': state, 'approval_state': approval_state,
+            'approvals': [], 'created_uid': manager_id, 'position_id': position['id'],
+            'purchase_order_id': rng.choice(purchase_order_ids), 'department_id': rng.choice(department_ids),
+            'supervisor_user_id': manager_id, 'timecard_approver_user_id': manager_id,
+            'location_id': rng.choice(location_ids), 'schedule_id': rng.choice(schedule_ids),
+            'requisition_type_id': rng.choice(refs.requisition_types), 'pay_scheme_id': rng.choice(refs.pay_schemes),
+            'pay_rate': (position['pay_rate_min'] + (position['pay_rate_max'] - position['pay_rate_min'])
+                         * rng.randrange(101) / 100).quantize(Decimal('0.01')),
+            'num_assignments': 0, 'start_date': start_date,
+            'estimated_end_date': start_date + timedelta(days=rng.randrange(90, 365)), 'employee_info': {},
+            '_markup': markups.get(prefixes[position['job_classification_id']], {}),
+        })
+    rows[Requisition.__table__] = requisition_rows
+    rows[RequisitionPresentWorker.__table__] = [
+        {'requisition_id': requisition['id'], 'worker_id': worker_id}
+        for requisition in requisition_rows
+        for worker_id in rng.sample(worker_ids, min(presented, workers))
+    ]
+
+    # Assignments go to approved requisitions, one each before doubling up.
+    # A worker is assigned at most once per requisition, the rest stay open.
+    approved = [row for row in requisition_rows if row['approval_state'] == ApprovalState.APPROVED] or requisition_rows
+    assignment_rows = []
+    assigned = set()
+    statuses = list(ASSIGNMENT_STATES)
+    for ix in range(assignments):
+        requisition = approved[ix] if ix < len(approved) else rng.choice(approved)
+        requisition['num_assignments'] += 1
+        status = rng.choices(statuses, weights=ASSIGNMENT_STATES.values())[0]
+        worker_id = None
+        for worker_id in (rng.choice(worker_ids) for _ in range(10 if worker_ids else 0)):
+            if (requisition['id'], worker_id) not in assigned:
+                assigned.add((requisition['id'], worker_id))
+                break
+        else:
+            worker_id, status = None, AssignmentState.OPEN
+        assignment_rows.append({
+            'requisition_id': requisition['id'], 'worker_id': worker_id, 'status': status,
+            'department_id': requisition['department_id'], 'cost_center_id': rng.choice(cost_center_ids),
+            'pay_rate': requisition['pay_rate'],
+            'bill_rate': Position.apply_markup(requisition['pay_rate'], requisition['_markup']),
+            'tentative_start_date': requisition['start_date'],
+        })
+    for requisition in requisition_rows:
+        del requisition['_markup']
+        requisition['num_assignments'] = max(requisition['num_assignments'], 1)
+    rows[Assignment.__table__] = assignment_rows
+    return rows
+
+
+def _sync_sequences(connection: sa.engine.Connection, tables: list[sa.Table]):
+    """Move Postgres id sequences past the explicitly inserted keys."""
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        name = connection.dialect.identifier_preparer.format_table(table)
+        connection.execute(
+            sa.text(f"SELECT setval(pg_get_serial_sequence(:name, 'id'), (SELECT max(id) FROM {name}))"),
+            {'name': name})
+
+
+@click.command('seed')
+@click.option('--clients', type=click.IntRange(1), default=1, show_default=True)
+@click.option('--workers-per-client', type=click.IntRange(0), default=5000, show_default=True)
+@click.option('--positions-per-client', type=click.IntRange(1), default=2000, show_default=True)
+@click.option('--requisitions-per-client', type=click.IntRange(1), default=10000, show_default=True)
+@click.option('--assignments-per-client', type=click.IntRange(0), default=50000, show_default=True)
+@click.option('--presented-per-requisition', type=click.IntRange(0), default=3, show_default=True,
+              help='Workers presented to every requisition')
+@click.option('--seed', type=int, default=0, show_default=True,
+              help='Random seed, the same seed generates the same rows on the same database')
+@click.option('--batch-size', type=click.IntRange(1), default=5000, show_default=True,
+              help='Rows per INSERT round trip')
+def seed_cmd(clients: int, workers_per_client: int, positions_per_client: int, requisitions_per_client: int,
+             assignments_per_client: int, presented_per_requisition: int, seed: int, batch_size: int):
+    """
+    Generate synthetic clients with users, workers, positions, contracts,
+    requisitions, presented workers and assignments for load testing.
+    Requires roles and categorical data to be loaded.
+    """
+    started = time.perf_counter()
+    connection = db.session.connection()
+    refs = _load_references(connection)
+    ids = IdAllocator(connection)
+
+    def generate(ix: int) -> dict[sa.Table, list[dict]]:
+        return generate_client(
+            random.Random(f'{seed}:{ix}'), ids, refs, workers_per_client, positions_per_client,
+            requisitions_per_client, assignments_per_client, presented_per_requisition)
+
+    tables = generate(0)
+    inserted = Counter()
+    with click.progressbar(length=clients * sum(map(len, tables.values())),
+                           label=f'Seeding {clients} client(s)') as bar:
+        for ix in range(clients):
+            if ix:
+                tables = generate(ix)
+            for table, rows in tables.items():
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    connection.execute(table.insert(), batch)
+                    bar.update(len(batch))
+                inserted[table.name] += len(rows)
+
+            client_id = tables[Client.__table__][0]['id']
+            inserted['client_worker'] += refresh_client_workers(
+                connection, lambda row_client_id, worker_id: row_client_id == client_id)
+            db.session.commit()
+            connection = db.session.connection()
+
+    _sync_sequences(connection, ids.tables())
+    # Rows were inserted around the ORM, so running servers are told here
+    CacheVersion.bump(CONTRACT_TERMS_VERSION)
+    CacheVersion.bump(REFERENCE_DATA_VERSION)
+    db.session.commit()
+
+    for name, count in inserted.items():
+        click.echo(f"{name}: {count} rows")
+    click.echo(f"Seeded {clients} client(s) in {time.perf_counter() - started:.1f}s")
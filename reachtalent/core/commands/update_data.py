@@ -7,6 +7,7 @@ import yaml
 
 from ...extensions import db
 from .. import models
+from ..response_cache import REFERENCE_DATA_VERSION
 
 
 LARGE_INT = 1000000
@@ -175,6 +176,8 @@ def _update_category_data(force_update: bool, dry_run: bool):
         click.echo(f"category {params['key']}: {_ins} inserts, {_upd} updates")
 
     if not dry_run:
+        # Tell every worker to drop its cached reference data responses
+        models.CacheVersion.bump(REFERENCE_DATA_VERSION)
         db.session.commit()
 
 
@@ -0,0 +1,53 @@
+import functools
+from typing import Any
+
+import sqlalchemy as sa
+from marshmallow import Schema, fields
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.strategy_options import Load
+
+
+def _nested_schema(field: fields.Field) -> Schema | None:
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def _plan(schema: Schema, model: Any, path: frozenset) -> tuple[Load, ...]:
+    mapper = sa.inspect(model)
+    options = []
+    for name, field in schema.dump_fields.items():
+        rel = mapper.relationships.get(field.attribute or name)
+        if rel is None or rel.lazy in ('dynamic', 'noload', 'raise'):
+            continue
+        # Collections go through selectinload so LIMIT/OFFSET still apply to
+        # the parent rows, scalar relationships are joined in.
+        strategy = selectinload if rel.uselist else joinedload
+        loader = strategy(rel.class_attribute)
+        nested = _nested_schema(field)
+        if nested is not None and rel.mapper.class_ not in path:
+            if children := _plan(nested, rel.mapper.class_, path | {rel.mapper.class_}):
+                loader = loader.options(*children)
+        options.append(loader)
+    return tuple(options)
+
+
+@functools.cache
+def eager_load_options(schema_cls: type[Schema], model: Any) -> tuple[Load, ...]:
+    """
+    Derive loader options for every relationship `schema_cls` dumps from
+    `model`, recursing into `Nested` and `List(Nested)` fields so a page of
+    results costs a fixed number of queries regardless of its size.
+    """
+    return _plan(schema_cls(), model, frozenset([model]))
+
+
+def eager_load(query, schema_cls: type[Schema]):
+    """
+    Apply the eager loading plan for `schema_cls` to a select or query over a
+    single model.
+    """
+    model = query.column_descriptions[0]['entity']
+    return query.options(*eager_load_options(schema_cls, model))
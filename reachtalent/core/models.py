@@ -1,9 +1,16 @@
+import threading
+import time
+from bisect import bisect_right
 from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
 from enum import StrEnum, auto
+from itertools import chain, groupby
 
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import Mapped
+import sqlalchemy as sa
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import select, update, and_, func, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session
 from sqlalchemy.sql.expression import Select
 
 from ..auth.models import User, Role
@@ -15,21 +22,21 @@ purchase_order_department = db.Table(
     "purchase_order_department",
     db.Model.metadata,
     Column("purchase_order_id", db.ForeignKey("purchase_order.id"), primary_key=True),
-    Column("department_id", db.ForeignKey("department.id"), primary_key=True)
+    Column("department_id", db.ForeignKey("department.id"), primary_key=True, index=True)
 )
 
 department_position = db.Table(
     "department_position",
     db.Model.metadata,
     Column("department_id", db.ForeignKey("department.id"), primary_key=True),
-    Column("position_id", db.ForeignKey("position.id"), primary_key=True),
+    Column("position_id", db.ForeignKey("position.id"), primary_key=True, index=True),
 )
 
 department_location = db.Table(
     "department_location",
     db.Model.metadata,
     Column("department_id", db.ForeignKey("department.id"), primary_key=True),
-    Column("location_id", db.ForeignKey("location.id"), primary_key=True),
+    Column("location_id", db.ForeignKey("location.id"), primary_key=True, index=True),
 )
 
 
@@ -109,7 +116,7 @@ class ContractTermDefinition(Base):
 class ContractTerm(Base):
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
-    contract_id: Mapped[int] = Column(db.Integer, db.ForeignKey("contract.id"))
+    contract_id: Mapped[int] = Column(db.Integer, db.ForeignKey("contract.id"), index=True)
     contract: Mapped["Contract"] = db.relationship("Contract")
     contract_term_definition_id: Mapped[int] = Column(db.Integer, db.ForeignKey("contract_term_definition.id"))
     contract_term_definition: Mapped[ContractTermDefinition] = db.relationship(ContractTermDefinition)
@@ -135,10 +142,27 @@ class Contract(Base):
     effective_end_date: Mapped["date"] = Column(db.Date, nullable=True)
 
     @staticmethod
-    def query_contract_terms(client_id: int, effective_date: date = None, term_prefix: str = None) -> dict[str, "Any"]:
+    def query_contract_terms(client_id: int, effective_date: date = None, term_prefix: str = None,
+                             fresh: bool = False) -> dict[str, "Any"]:
+        """
+        The terms of `client_id`'s contracts in effect on `effective_date`
+        (default today), optionally limited to refs starting with
+        `term_prefix`. Resolved from the process local ContractTermIndex,
+        unless the session holds contract changes not committed yet. With
+        `fresh` the index checks the shared version first, so changes
+        committed by other workers are seen right away.
+        """
         if not effective_date:
             effective_date = datetime.utcnow()
+        if isinstance(effective_date, datetime):
+            effective_date = effective_date.date()
+
+        if _contract_terms_changed(db.session):
+            return Contract._select_contract_terms(client_id, effective_date, term_prefix)
+        return get_contract_term_index(current_app).resolve(client_id, effective_date, term_prefix, fresh=fresh)
 
+    @staticmethod
+    def _select_contract_terms(client_id: int, effective_date: date, term_prefix: str = None) -> dict[str, "Any"]:
         query = (
             select(ContractTerm)
             .join(Contract)
@@ -194,7 +218,7 @@ class ClientUser(Base):
     client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"))
     client: Mapped["Client"] = db.relationship("Client", back_populates="client_users")
 
-    user_id: Mapped[int] = Column(db.Integer, db.ForeignKey("user.id"))
+    user_id: Mapped[int] = Column(db.Integer, db.ForeignKey("user.id"), index=True)
     user: Mapped["User"] = db.relationship("User", foreign_keys=[user_id], back_populates="client_roles")
 
     role_id: Mapped[int] = Column(db.Integer, db.ForeignKey("role.id"), nullable=True)
@@ -218,7 +242,7 @@ class CostCenter(Base):
         db.UniqueConstraint("name", "client_id"),
     )
     id: Mapped[int] = Column(db.Integer, primary_key=True)
-    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"))
+    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"), index=True)
     client: Mapped["Client"] = db.relationship("Client")
 
     name: Mapped[str] = Column(db.String)
@@ -303,7 +327,7 @@ class Schedule(Base):
 class PurchaseOrder(Base):
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
-    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"))
+    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"), index=True)
     client: Mapped["Client"] = db.relationship("Client", back_populates="purchase_orders")
 
     departments: Mapped[list["Department"]] = db.relationship(
@@ -314,7 +338,7 @@ class PurchaseOrder(Base):
 class Position(Base):
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
-    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"))
+    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"), index=True)
     client: Mapped["Client"] = db.relationship("Client", back_populates="positions")
 
     departments: Mapped[list["Department"]] = db.relationship("Department", secondary=department_position, back_populates="positions")
@@ -338,19 +362,28 @@ class Position(Base):
     def calculate_bill_rate(self, pay_rate: Decimal, effective_date: datetime = None) -> Decimal:
         """
         calculate_bill_rate calculates the bill rate for a Position
-        based on the Client's configured jobclass markup.
+        based on the Client's configured jobclass markup. Bill rates are
+        persisted on assignments, so the terms are resolved `fresh`.
         """
 
         _terms = Contract.query_contract_terms(
             self.client_id,
             term_prefix=self.job_classification.contract_term_prefix,
             effective_date=effective_date,
+            fresh=True,
         )
+        return Position.apply_markup(pay_rate, _terms)
 
+    @staticmethod
+    def apply_markup(pay_rate: Decimal, terms: dict[str, "Any"]) -> Decimal:
+        """
+        apply_markup prices `pay_rate` with the jobclass markup `terms`
+        resolved for a Position, see `calculate_bill_rate`.
+        """
         percent_markup = Decimal('0.00')
         flat_markup = Decimal('0.00')
 
-        for term_ref, term_val in _terms.items():
+        for term_ref, term_val in terms.items():
             if term_ref.endswith('_pct'):
                 percent_markup = Decimal(term_val)
             elif term_ref.endswith('_flat'):
@@ -394,6 +427,13 @@ class Approval:
 
 @register_entity
 class Requisition(Base, StateMixin):
+    __table_args__ = (
+        # Client requisition lists never include deleted requisitions
+        db.Index('ix_requisition_client_id_active', 'client_id', 'id',
+                 sqlite_where=sa.text("state != 'deleted'"),
+                 postgresql_where=sa.text("state != 'deleted'")),
+    )
+
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
     approval_state: Mapped[ApprovalState] = Column(db.Enum(ApprovalState), server_default='PENDING')
@@ -404,7 +444,7 @@ class Requisition(Base, StateMixin):
     requestor: Mapped["User"] = db.relationship(
         "User", foreign_keys=created_uid)
 
-    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"))
+    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id"), index=True)
     client: Mapped["Client"] = db.relationship("Client", back_populates="requisitions")
 
     purchase_order_id: Mapped[int] = Column(
@@ -470,23 +510,63 @@ class Requisition(Base, StateMixin):
 
     assignments: Mapped[list["Assignment"]] = db.relationship("Assignment", back_populates='requisition')
 
-    def approve(self):
+    def approve(self, defer_above: int = 0):
         """
-        Do post-approval work.
+        Do post-approval work. When set, more than `defer_above` assignments
+        to create are left to `flask core assignment-worker`.
         """
-        assignments_to_create = self.num_assignments - len(self.assignments)
-        if assignments_to_create > 0:
-            for _ in range(assignments_to_create):
-                self.assignments.append(
-                    Assignment(
-                        status=AssignmentState.OPEN,
-                        pay_rate=self.pay_rate,
-                        bill_rate=self.position.calculate_bill_rate(self.pay_rate),
-                        department_id=self.department_id,
-                        tentative_start_date=self.start_date,
-                        tentative_end_date=self.estimated_end_date,
-                    )
-                )
+        if 0 < defer_above < self.open_assignments():
+            return
+        self.create_open_assignments()
+
+    def open_assignments(self) -> int:
+        """
+        Number of assignments still to be created for `num_assignments`.
+        """
+        return (self.num_assignments or 0) - db.session.scalar(
+            select(func.count(Assignment.id)).filter(Assignment.requisition_id == self.id))
+
+    def create_open_assignments(self) -> int:
+        """
+        Create the missing OPEN assignments with a single multi-row INSERT,
+        the bill rate is the same for all of them so it is calculated once.
+        Returns the number of assignments created.
+        """
+        count = self.open_assignments()
+        if count <= 0:
+            return 0
+
+        assignment = {
+            'requisition_id': self.id,
+            'status': AssignmentState.OPEN,
+            'pay_rate': self.pay_rate,
+            'bill_rate': self.position.calculate_bill_rate(self.pay_rate),
+            'department_id': self.department_id,
+            'tentative_start_date': self.start_date,
+            'tentative_end_date': self.estimated_end_date,
+        }
+        db.session.execute(insert(Assignment).values([assignment] * count))
+        db.session.expire(self, ['assignments'])
+        return count
+
+    @staticmethod
+    def awaiting_assignments_query() -> Select:
+        """
+        Approved requisitions with fewer assignments than `num_assignments`,
+        i.e. whose assignments were deferred by `approve`.
+        """
+        created = (
+            select(func.count(Assignment.id))
+            .filter(Assignment.requisition_id == Requisition.id)
+            .scalar_subquery()
+        )
+        return (
+            select(Requisition)
+            .filter(Requisition.approval_state == ApprovalState.APPROVED,
+                    Requisition.state != States.DELETED,
+                    Requisition.num_assignments > created)
+            .order_by(Requisition.id)
+        )
 
 
 @register_entity
@@ -532,7 +612,7 @@ class Supplier(Base):
 class Worker(Base):
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
-    user_id: Mapped[int] = Column(db.Integer, db.ForeignKey("user.id"))
+    user_id: Mapped[int] = Column(db.Integer, db.ForeignKey("user.id"), index=True)
     user: Mapped["User"] = db.relationship("User", uselist=False, back_populates="worker")
 
     supplier_id: Mapped[int] = Column(db.Integer, db.ForeignKey("supplier.id"))
@@ -542,48 +622,39 @@ class Worker(Base):
 
     @staticmethod
     def available_workers_query(client_id: int, for_requisition_id: int | None = None) -> Select:
-        client_presented_workers_ids = (
-            select(Worker.id)
-            .join(RequisitionPresentWorker, RequisitionPresentWorker.worker_id == Worker.id)
-            .join(Requisition, and_(
-                Requisition.id == RequisitionPresentWorker.requisition_id,
-                Requisition.client_id == client_id
-            ))
-        )
-
-        client_assigned_worker_ids = (
-            select(Worker.id)
-            .join(Assignment, Assignment.worker_id == Worker.id)
-            .join(Requisition, and_(
-                Requisition.id == Assignment.requisition_id,
-                Requisition.client_id == client_id,
-            ))
-        )
-
-        available_worker_ids = (
-            client_presented_workers_ids.
-            union(client_assigned_worker_ids).
-            cte('available_worker_ids')
-        )
+        """
+        Workers presented to or assigned on any requisition of the client,
+        looked up in the materialized `client_worker` table.
+        """
+        query = select(Worker).join(ClientWorker, and_(
+            ClientWorker.worker_id == Worker.id,
+            ClientWorker.client_id == client_id,
+        ))
 
         # Exclude workers already assigned to the requested requisition
         if for_requisition_id:
-            requisition_assigned_workers = (
-                select(Worker.id)
-                .join(Assignment, and_(
-                      Assignment.worker_id == Worker.id,
-                      Assignment.requisition_id == for_requisition_id))
-            ).cte()
+            query = query.filter(~select(Assignment.id).filter(
+                Assignment.worker_id == Worker.id,
+                Assignment.requisition_id == for_requisition_id,
+            ).exists())
+
+        return query
+
 
-            available_worker_ids = (
-                select(available_worker_ids.c.id)
-                .outerjoin(
-                    requisition_assigned_workers,
-                    available_worker_ids.c.id == requisition_assigned_workers.c.id)
-                .filter(requisition_assigned_workers.c.id.is_(None))
-            ).cte()
+class ClientWorker(Base):
+    """
+    ClientWorker materializes which workers are available to a client, i.e.
+    were presented to or assigned on one of its requisitions. Rows are kept
+    up to date on flush by `core.availability`, which can also rebuild and
+    check the table.
+    """
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "worker_id"),
+    )
 
-        return select(Worker).join(available_worker_ids, available_worker_ids.c.id == Worker.id)
+    id: Mapped[int] = Column(db.Integer, primary_key=True)
+    client_id: Mapped[int] = Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    worker_id: Mapped[int] = Column(db.Integer, db.ForeignKey("worker.id", ondelete="CASCADE"), nullable=False)
 
 
 class RequisitionPresentWorker(Base):
@@ -598,7 +669,7 @@ class RequisitionPresentWorker(Base):
     id: Mapped[int] = Column(db.Integer, primary_key=True)
 
     requisition_id: Mapped[int] = Column(db.Integer, db.ForeignKey("requisition.id"))
-    worker_id: Mapped[int] = Column(db.Integer, db.ForeignKey("worker.id"))
+    worker_id: Mapped[int] = Column(db.Integer, db.ForeignKey("worker.id"), index=True)
 
 
 class AssignmentState(StrEnum):
@@ -620,6 +691,7 @@ class Assignment(Base):
     to a requisition for employment.
     """
     __table_args__ = (
+        # Leads with requisition_id, so its index also serves requisition_id lookups
         db.UniqueConstraint("requisition_id", "worker_id"),
     )
 
@@ -638,7 +710,7 @@ class Assignment(Base):
     requisition_id: Mapped[int] = Column(db.Integer, db.ForeignKey("requisition.id"))
     requisition: Mapped["Requisition"] = db.relationship("Requisition")
 
-    worker_id: Mapped[int] = Column(db.Integer, db.ForeignKey("worker.id"))
+    worker_id: Mapped[int] = Column(db.Integer, db.ForeignKey("worker.id"), index=True)
     worker: Mapped["Worker"] = db.relationship("Worker")
 
     cost_center_id: Mapped[int] = Column(db.Integer, db.ForeignKey("cost_center.id"))
@@ -739,6 +811,173 @@ class ImportLog(Base):
     summary: Mapped[str] = Column(db.String)
 
 
+class CacheVersion(Base):
+    """
+    CacheVersion holds monotonically increasing version stamps. Bumping a
+    stamp tells every worker process to drop the process local cache of the
+    same name.
+    """
+    id: Mapped[int] = Column(db.Integer, primary_key=True)
+    name: Mapped[str] = Column(db.String, unique=True, nullable=False)
+    version: Mapped[int] = Column(db.Integer, nullable=False, server_default="0")
+
+    @staticmethod
+    def current(name: str) -> int:
+        return db.session.execute(
+            select(CacheVersion.version).filter_by(name=name)
+        ).scalar_one_or_none() or 0
+
+    @staticmethod
+    def bump(name: str):
+        """
+        Increment the named version stamp, committed with the caller's transaction.
+        The first bump of a name inserts its row, as an upsert so concurrent
+        first bumps don't collide on the unique name.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert_version = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(CacheVersion)
+            db.session.execute(
+                insert_version.values(name=name, version=1).on_conflict_do_update(
+                    index_elements=[CacheVersion.name],
+                    set_={'version': CacheVersion.version + 1}))
+            return
+
+        result = db.session.execute(
+            update(CacheVersion).
+            where(CacheVersion.name == name).
+            values(version=CacheVersion.version + 1)
+        )
+        if not result.rowcount:
+            db.session.add(CacheVersion(name=name, version=1))
+            db.session.flush()
+
+
+CONTRACT_TERM_INDEX = 'reachtalent.contract_term_index'
+CONTRACT_TERMS_VERSION = 'contract_terms'
+
+# Rows whose changes alter the terms resolved for a client.
+CONTRACT_TERM_MODELS = (Contract, ContractTerm, ContractTermDefinition)
+
+
+class ContractTermIndex:
+    """
+    Effective-dated contract term timelines per client. A client's timeline
+    is loaded with a single query the first time it is resolved and holds
+    its contracts ordered by effective start date along with their
+    `(ref, value)` terms, so resolving `(client, date, prefix)` is a bisect
+    and a scan in memory. The shared `contract_terms` CacheVersion, bumped
+    on commit of any contract change, is polled at most every
+    `poll_interval` seconds, or on every `fresh` resolve.
+    """
+    VERSION_NAME = CONTRACT_TERMS_VERSION
+
+    def __init__(self, poll_interval: float = 30.0):
+        self.poll_interval = poll_interval
+        self._timelines: dict[int, tuple[list[date], list[tuple]]] = {}
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def resolve(self, client_id: int, effective_date: date, term_prefix: str = None,
+                fresh: bool = False) -> dict[str, "Any"]:
+        self._poll(force=fresh)
+        if (timeline := self._timelines.get(client_id)) is None:
+            with self._lock:
+                if (timeline := self._timelines.get(client_id)) is None:
+                    timeline = self._timelines[client_id] = self._load(client_id)
+        starts, contracts = timeline
+
+        effective_terms = {}
+        # Later contracts override the terms of earlier overlapping ones
+        for end_date, terms in contracts[:bisect_right(starts, effective_date)]:
+            if end_date is not None and end_date <= effective_date:
+                continue
+            for ref, val in terms:
+                if not term_prefix or ref.startswith(term_prefix):
+                    effective_terms[ref] = val
+        return effective_terms
+
+    def invalidate(self):
+        self._timelines = {}
+        self._version = None
+
+    def _poll(self, force: bool = False):
+        if not force and self._version is not None and time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        with self._lock:
+            version = CacheVersion.current(self.VERSION_NAME)
+            if version != self._version:
+                self._timelines = {}
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _load(client_id: int) -> tuple[list[date], list[tuple]]:
+        rows = db.session.execute(
+            select(Contract.effective_start_date, Contract.effective_end_date,
+                   ContractTermDefinition.ref, ContractTerm)
+            .select_from(ContractTerm)
+            .join(Contract)
+            .join(ContractTermDefinition)
+            .filter(Contract.client_id == client_id)
+            .order_by(Contract.effective_start_date, ContractTermDefinition.id)
+        ).all()
+
+        starts, contracts = [], []
+        for (start_date, end_date), terms in groupby(rows, key=lambda row: row[:2]):
+            starts.append(start_date)
+            contracts.append((end_date, tuple((ref, term.val()) for _, _, ref, term in terms)))
+        return starts, contracts
+
+
+def get_contract_term_index(app: Flask) -> ContractTermIndex:
+    if (index := app.extensions.get(CONTRACT_TERM_INDEX)) is None:
+        index = app.extensions.setdefault(CONTRACT_TERM_INDEX, ContractTermIndex(
+            poll_interval=float(app.config['CONTRACT_TERMS_POLL_INTERVAL'])))
+    return index
+
+
+def _contract_terms_changed(session: Session) -> bool:
+    """Whether `session` holds contract changes the index does not reflect."""
+    return session.info.get('contract_terms_changed', False) or any(
+        isinstance(obj, CONTRACT_TERM_MODELS)
+        for obj in chain(session.new, session.dirty, session.deleted))
+
+
+@sa.event.listens_for(Session, 'after_flush')
+def _track_contract_term_changes(session, flush_context):
+    if any(isinstance(obj, CONTRACT_TERM_MODELS)
+           for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['contract_terms_changed'] = True
+
+
+@sa.event.listens_for(Session, 'after_bulk_update')
+@sa.event.listens_for(Session, 'after_bulk_delete')
+def _track_contract_term_bulk_changes(context):
+    if context.mapper is not None and issubclass(context.mapper.class_, CONTRACT_TERM_MODELS):
+        context.session.info['contract_terms_changed'] = True
+
+
+@sa.event.listens_for(Session, 'before_commit')
+def _bump_contract_terms_version(session):
+    # Runs before the final flush of the commit, so look at pending objects too
+    if _contract_terms_changed(session):
+        session.info['contract_terms_changed'] = True
+        CacheVersion.bump(CONTRACT_TERMS_VERSION)
+
+
+@sa.event.listens_for(Session, 'after_commit')
+def _invalidate_contract_term_index(session):
+    if session.info.pop('contract_terms_changed', False) and has_app_context():
+        get_contract_term_index(current_app).invalidate()
+
+
+@sa.event.listens_for(Session, 'after_rollback')
+def _discard_contract_term_changes(session):
+    session.info.pop('contract_terms_changed', None)
+
+
 MONEY_DIFF_TOLERANCE = Decimal('0.005')
 
 
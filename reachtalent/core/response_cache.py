@@ -0,0 +1,113 @@
+import functools
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask, Response, after_this_request, current_app, g, request
+
+from .models import CacheVersion
+from ..cache import TTLCache
+
+REFERENCE_DATA_CACHE = 'reachtalent.reference_data_cache'
+REFERENCE_DATA_VERSION = 'reference_data'
+
+
+class ReferenceDataCache:
+    """
+    Serialized responses of the reference data list endpoints keyed by
+    (endpoint, query params, client_id). Entries are valid for as long as the
+    shared `reference_data` CacheVersion is unchanged, which is polled at most
+    every `poll_interval` seconds. `ttl` bounds how stale an entry may get if
+    reference data is changed without bumping it.
+    """
+    VERSION_NAME = REFERENCE_DATA_VERSION
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, poll_interval: float = 30.0):
+        self.poll_interval = poll_interval
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self._entries.hits
+
+    @property
+    def misses(self) -> int:
+        return self._entries.misses
+
+    def get(self, key) -> tuple[bytes, str | None] | None:
+        self._poll()
+        return self._entries.get(key)
+
+    def set(self, key, body: bytes, etag: str | None):
+        self._entries.set(key, (body, etag))
+
+    def invalidate(self):
+        self._entries.clear()
+        self._version = None
+
+    def _poll(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        with self._lock:
+            version = CacheVersion.current(self.VERSION_NAME)
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+
+def get_reference_data_cache(app: Flask) -> ReferenceDataCache:
+    if (cache := app.extensions.get(REFERENCE_DATA_CACHE)) is None:
+        cache = app.extensions.setdefault(REFERENCE_DATA_CACHE, ReferenceDataCache(
+            maxsize=int(app.config['REFERENCE_DATA_CACHE_SIZE']),
+            ttl=float(app.config['REFERENCE_DATA_CACHE_TTL']),
+            poll_interval=float(app.config['REFERENCE_DATA_POLL_INTERVAL'])))
+    return cache
+
+
+def cached_reference_data(view=None, *, client_versions: tuple[str, ...] = ()):
+    """
+    Serve a `(user, params)` list view from the reference data cache. Goes
+    below `authenticated`, `requires` and `use_args` so permissions are still
+    checked on every request. The ETag of the response is replayed on hits,
+    a matching `If-None-Match` gets a `304`.
+
+    `client_versions` names the CacheVersions a response filtered by
+    `client_id` also depends on, e.g. contract terms. They are read on every
+    such request and, with today's date, made part of the key.
+    """
+    if view is None:
+        return functools.partial(cached_reference_data, client_versions=client_versions)
+
+    @functools.wraps(view)
+    def wrapper(user, params: dict):
+        cache = get_reference_data_cache(current_app)
+        client = g.auth_state.client
+        key = (request.endpoint, tuple(sorted(params.items())), client and client.id)
+        if client_versions and params.get('client_id') is not None:
+            key += (datetime.utcnow().date(), *(CacheVersion.current(name) for name in client_versions))
+
+        if (entry := cache.get(key)) is not None:
+            body, etag = entry
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = Response(body, content_type='application/json')
+            if etag is not None:
+                response.set_etag(etag, weak=True)
+            return response
+
+        response = view(user, params)
+
+        # Registered after the view's own hooks so the ETag is already set
+        @after_this_request
+        def store(response: Response) -> Response:
+            if response.status_code == 200:
+                cache.set(key, response.get_data(), response.get_etag()[0])
+            return response
+
+        return response
+    return wrapper
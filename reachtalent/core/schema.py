@@ -1,3 +1,5 @@
+import base64
+import binascii
 from dataclasses import dataclass
 from datetime import datetime
 from enum import StrEnum, auto
@@ -7,8 +9,9 @@ import simplejson
 from flask import g
 from marshmallow import (
     fields, validate, validates, validates_schema, ValidationError,
-    pre_load, pre_dump
+    pre_load, pre_dump, post_load
 )
+import sqlalchemy as sa
 from sqlalchemy import select
 from sqlalchemy.orm.exc import NoResultFound
 
@@ -41,10 +44,38 @@ def validate_client_id(value):
     return value
 
 
+class Cursor(fields.Field):
+    """Opaque keyset pagination cursor wrapping the last seen id."""
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            return None
+        return base64.urlsafe_b64encode(str(value).encode()).rstrip(b'=').decode()
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            return int(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        except (binascii.Error, TypeError, ValueError) as exc:
+            raise ValidationError("Invalid cursor.") from exc
+
+
 class Pagination(ma.Schema):
     page = fields.Integer(load_default=1)
     total_pages = fields.Integer()
     page_size = fields.Integer(load_default=25)
+    # Keyset pagination, `cursor` takes precedence over `after_id`
+    cursor = Cursor(load_only=True)
+    after_id = fields.Integer(load_only=True)
+    next_cursor = Cursor(dump_only=True)
+    # Defaults to counting pages in page mode only
+    include_total = fields.Boolean(load_only=True)
+
+    @post_load
+    def resolve_cursor(self, data, **kwargs):
+        if (after_id := data.pop('cursor', None)) is not None:
+            data['after_id'] = after_id
+        data.setdefault('include_total', data.get('after_id') is None)
+        return data
 
 
 class ClientFilter(ma.Schema):
@@ -124,22 +155,25 @@ class Department(ma.Schema):
     # accounting_approver = fields.Nested(ClientUser(), dump_only=True)
 
     @validates_schema
-    def validate_schema(self, data, **kwargs):
+    def validate_schema(self, data, many: bool = False, **kwargs):
+        if many:
+            # bulk_create checks the whole batch at once
+            return data
+
         client_id = data.get('client_id')
         number = data.get('number')
         name = data.get('name')
 
-        dept_names = set()
-        dept_numbers = set()
-        client_departments = select(models.Department).filter_by(client_id=client_id)
-        for dept in db.session.execute(client_departments).scalars():
-            dept_names.add(dept.name)
-            if dept.number:
-                dept_numbers.add(dept.number)
+        # Probes covered by the (client_id, name) and (number, client_id) unique indexes
+        client_departments = select(models.Department.id).filter_by(client_id=client_id)
+        name_taken, number_taken = db.session.execute(select(
+            client_departments.filter_by(name=name).exists(),
+            client_departments.filter_by(number=number).exists() if number else sa.false(),
+        )).one()
         errors = {}
-        if name in dept_names:
+        if name_taken:
             errors['name'] = ['Department name must be unique.']
-        if number and number in dept_numbers:
+        if number_taken:
             errors['number'] = ['Department number must be unique.']
         if errors:
             raise ValidationError(errors)
@@ -151,6 +185,10 @@ class ListDepartmentResponse(ma.Schema):
     items = fields.List(fields.Nested(Department()))
 
 
+class BulkDepartmentResponse(ma.Schema):
+    items = fields.List(fields.Nested(Department()))
+
+
 class CostCenter(ma.Schema):
     id = fields.Integer(dump_only=True)
     client_id = fields.Integer(
@@ -165,6 +203,10 @@ class ListCostCenterResponse(ma.Schema):
     items = fields.List(fields.Nested(CostCenter()))
 
 
+class BulkCostCenterResponse(ma.Schema):
+    items = fields.List(fields.Nested(CostCenter()))
+
+
 class Role(ma.Schema):
     name = fields.String()
 
@@ -197,8 +239,11 @@ class ListStaffResponse(ma.Schema):
 def _validate_department_ids(client_id: int, department_ids: list[int]) -> list["models.Department"]:
     departments_by_id = {
         d.id: d
-        for d in models.Department.query.filter_by(client_id=client_id).all()
-    }
+        for d in models.Department.query.filter(
+            models.Department.client_id == client_id,
+            models.Department.id.in_(set(department_ids)),
+        )
+    } if department_ids else {}
     invalid_departments = []
     departments = []
     for d_id in department_ids:
@@ -333,6 +378,23 @@ class ListPositionResponse(ma.Schema):
     items = fields.List(fields.Nested(Position()))
 
 
+class BillRateQuote(ma.Schema):
+    class Meta:
+        render_module = simplejson
+
+    position_id = fields.Integer(required=True)
+    pay_rate = fields.Decimal(required=True)
+    effective_date = fields.Date(load_default=_today)
+    bill_rate = fields.Decimal(dump_only=True)
+
+
+class BillRateQuoteResponse(ma.Schema):
+    class Meta:
+        render_module = simplejson
+
+    items = fields.List(fields.Nested(BillRateQuote()))
+
+
 class RequisitionType(ma.Schema):
     id = fields.Integer()
     key = fields.String(data_key='name')
@@ -360,6 +422,10 @@ class ListScheduleResponse(ma.Schema):
     items = fields.List(fields.Nested(Schedule()))
 
 
+class BulkScheduleResponse(ma.Schema):
+    items = fields.List(fields.Nested(Schedule()))
+
+
 class Worker(ma.Schema):
     id = fields.Integer(dump_only=True)
     phone_number = fields.String()
@@ -376,6 +442,10 @@ class ListWorkerEnvironmentResponse(ma.Schema):
     items = fields.List(fields.Nested(WorkerEnvironment()))
 
 
+class BulkWorkerEnvironmentResponse(ma.Schema):
+    items = fields.List(fields.Nested(WorkerEnvironment()))
+
+
 class Location(ma.Schema):
     id = fields.Integer(dump_only=True)
 
@@ -397,6 +467,10 @@ class ListLocationResponse(ma.Schema):
     items = fields.List(fields.Nested(Location()))
 
 
+class BulkLocationResponse(ma.Schema):
+    items = fields.List(fields.Nested(Location()))
+
+
 class PayScheme(ma.Schema):
     id = fields.Integer(dump_only=True)
     key = fields.String(data_key='name')
@@ -424,6 +498,57 @@ class Rel:
     category: str | None = None
 
 
+def _rel_exists(rel: Rel, client_id: int | None):
+    if rel.category:
+        query = select(models.CategoryItem.id).join(models.Category).filter(
+            models.Category.key == rel.category,
+            models.CategoryItem.id == rel.value,
+        )
+    else:
+        query = select(rel.model).filter_by(**{rel.column: rel.value})
+        if not rel.universal:
+            query = query.filter_by(client_id=client_id)
+    return query.exists()
+
+
+def validate_rels(data: dict, relationships: dict[str, Rel], client_id: int | None = None,
+                  **probes) -> dict[str, list[str]]:
+    """
+    Validate the ids `data` holds for `relationships`, scoped to `client_id`
+    unless universal. Missing required values raise right away, otherwise
+    every supplied id is looked up with a single `SELECT EXISTS(...), ...`
+    round trip and the `Invalid <key>.` errors are returned. Extra `probes`
+    are named selects that must return a row and are checked in the same
+    statement.
+    """
+    errors = {}
+
+    for key, rel in relationships.items():
+        if val := data.get(key):
+            rel.value = val
+        elif rel.required:
+            errors[key] = ['Missing data for required field.']
+    if errors:
+        raise ValidationError(errors)
+
+    # Skip lookup if value is not supplied and relationship is not required
+    checks = {
+        key: _rel_exists(rel, client_id)
+        for key, rel in relationships.items()
+        if rel.value is not None
+    }
+    checks.update((key, query.exists()) for key, query in probes.items())
+    if not checks:
+        return errors
+
+    found = db.session.execute(select(*(check.label(key) for key, check in checks.items()))).one()
+    return {
+        key: [f'Invalid {key}.']
+        for key, exists in zip(checks, found)
+        if not exists
+    }
+
+
 class Approval(ma.Schema):
     approver_uid = fields.Integer(dump_only=True, load_default=_current_user_id)
     datetime = fields.DateTime(dump_only=True, load_default=lambda x: datetime.utcnow())
@@ -495,53 +620,21 @@ class Assignment(ma.Schema):
             'department_id': Rel(model=models.Department, required=False),
             'end_reason_id': Rel(model=models.CategoryItem, universal=True, category='assignment_end_reason', required=False),
         }
-
+        probes = {}
         errors = {}
 
-        for key, rel in relationships.items():
-            if val := data.get(key):
-                rel.value = val
-            elif rel.required:
-                errors[key] = ['Missing data for required field.']
-        if errors:
-            raise ValidationError(errors)
-
-        for key, rel in relationships.items():
-            # Skip lookup if value is not supplied and relationship is not required
-            if rel.value is None and not rel.required:
-                continue
-
-            try:
-                params = {rel.column: rel.value}
-                if not rel.universal:
-                    params['client_id'] = self.instance.requisition.client_id
-                if rel.category:
-                    item = db.session.execute(select(models.CategoryItem).join(models.Category).filter(
-                        models.Category.key == rel.category,
-                        models.CategoryItem.id == rel.value
-                    )).scalar_one_or_none()
-                    if item is None:
-                        errors[key] = [f'Invalid {key}.']
-                else:
-                    _ = rel.model.query.filter_by(**params).one()
-            except NoResultFound:
-                errors[key] = [f'Invalid {key}.']
-
         # Manual validate worker_id
         worker_id = data.get('worker_id')
         if self.instance.worker_id == worker_id:
             pass  # either both None or both same id
         elif self.instance.worker_id and worker_id:
-            errors.setdefault('worker_id', []).append('Assignment worker_id may not be changed once set.')
+            errors['worker_id'] = ['Assignment worker_id may not be changed once set.']
         else:
-            try:
-                db.session.execute(
-                    models.Worker.available_workers_query(
-                        self.instance.requisition.client_id,
-                        for_requisition_id=self.instance.requisition_id).
-                    filter(models.Worker.id == worker_id)).one()
-            except NoResultFound:
-                errors.setdefault('worker_id', []).append('Invalid worker_id.')
+            probes['worker_id'] = models.Worker.available_workers_query(
+                self.instance.requisition.client_id,
+                for_requisition_id=self.instance.requisition_id).filter(models.Worker.id == worker_id)
+
+        errors.update(validate_rels(data, relationships, self.instance.requisition.client_id, **probes))
 
         if errors:
             raise ValidationError(errors)
@@ -619,36 +712,7 @@ class Requisition(ma.Schema):
             'schedule_id': Rel(model=models.Schedule),
         }
 
-        errors = {}
-
-        for key, rel in relationships.items():
-            if val := data.get(key):
-                rel.value = val
-            elif rel.required:
-                errors[key] = ['Missing data for required field.']
-        if errors:
-            raise ValidationError(errors)
-
-        for key, rel in relationships.items():
-            # Skip lookup if value is not supplied and relationship is not required
-            if rel.value is None and not rel.required:
-                continue
-
-            try:
-                params = {rel.column: rel.value}
-                if not rel.universal:
-                    params['client_id'] = relationships['client_id'].value
-                if rel.category:
-                    item = db.session.execute(select(models.CategoryItem).join(models.Category).filter(
-                        models.Category.key == rel.category,
-                        models.CategoryItem.id == rel.value
-                    )).scalar_one_or_none()
-                    if item is None:
-                        errors[key] = [f'Invalid {key}.']
-                else:
-                    _ = rel.model.query.filter_by(**params).one()
-            except NoResultFound as exc:
-                errors[key] = [f'Invalid {key}.']
+        errors = validate_rels(data, relationships, data.get('client_id'))
 
         # Manually Validate present_worker_ids
         present_worker_ids = data.pop('present_worker_ids', [])
@@ -737,49 +801,16 @@ class ReplaceAssignmentRequest(ma.Schema):
             'department_id': Rel(model=models.Department, required=False),
         }
 
-        errors = {}
-
-        for key, rel in relationships.items():
-            if val := data.get(key):
-                rel.value = val
-            elif rel.required:
-                errors[key] = ['Missing data for required field.']
-        if errors:
-            raise ValidationError(errors)
-
         client_id = self.replaced_assignment.requisition.client_id
-        for key, rel in relationships.items():
-            # Skip lookup if value is not supplied and relationship is not required
-            if rel.value is None and not rel.required:
-                continue
-
-            try:
-                params = {rel.column: rel.value}
-                if not rel.universal:
-                    params['client_id'] = client_id
-
-                if rel.category:
-                    item = db.session.execute(select(models.CategoryItem).join(models.Category).filter(
-                        models.Category.key == rel.category,
-                        models.CategoryItem.id == rel.value
-                    )).scalar_one_or_none()
-                    if item is None:
-                        errors[key] = [f'Invalid {key}.']
-                else:
-                    _ = rel.model.query.filter_by(**params).one()
-            except NoResultFound:
-                errors[key] = [f'Invalid {key}.']
+        probes = {}
 
         # Manual validate worker_id
         if worker_id := data.get('worker_id'):
-            try:
-                db.session.execute(
-                    models.Worker.available_workers_query(
-                        client_id,
-                        for_requisition_id=self.replaced_assignment.requisition_id).
-                    filter(models.Worker.id == worker_id)).one()
-            except NoResultFound:
-                errors.setdefault('worker_id', []).append('Invalid worker_id.')
+            probes['worker_id'] = models.Worker.available_workers_query(
+                client_id,
+                for_requisition_id=self.replaced_assignment.requisition_id).filter(models.Worker.id == worker_id)
+
+        errors = validate_rels(data, relationships, client_id, **probes)
 
         if errors:
             raise ValidationError(errors)
@@ -0,0 +1,163 @@
+"""
+Compile marshmallow schemas into specialized dump functions.
+
+`Schema.dump` dispatches through `Field.serialize`, `get_value` and
+`_serialize` for every field of every row, which dominates CPU time on large
+list responses. `serializer(SchemaCls)` walks the schema's dump fields once
+and generates a plain python function per (nested) schema with the common
+field types inlined. Anything it does not specialize falls back to the
+field's (or schema's) own serialization, so the output is identical to
+`SchemaCls().dumps(obj)`.
+"""
+import functools
+from typing import Any, Callable
+
+from marshmallow import Schema, fields, missing, utils
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+
+_EMPTY = {}
+
+
+def _get_item(obj, key, default):
+    try:
+        return obj[key]
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return getattr(obj, key, default)
+
+
+def _get_dotted(obj, key, default):
+    return utils.get_value(obj, key, default)
+
+
+class _Compiler:
+    def __init__(self):
+        self.namespace = {
+            '_missing': missing,
+            '_EMPTY': _EMPTY,
+            '_get_item': _get_item,
+            '_get_dotted': _get_dotted,
+            '_text': utils.ensure_text_type,
+        }
+        self.schemas: dict[int, str] = {}
+
+    def ref(self, value: Any, prefix: str) -> str:
+        name = f'_{prefix}{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def value_expr(self, field: fields.Field, v: str, depth: int = 0) -> str:
+        """Expression serializing the variable `v` like `field._serialize`."""
+        ftype = type(field)
+        if ftype is fields.Integer and not field.as_string:
+            expr = f'int({v})'
+        elif ftype is fields.String:
+            expr = f'({v} if type({v}) is str else _text({v}))'
+        elif ftype is fields.Boolean:
+            expr = f'({v} if type({v}) is bool else {self.ref(field, "f")}._serialize({v}, None, None))'
+        elif ftype is fields.Decimal:
+            fmt = self.ref(field._format_num, 'dec')
+            expr = f'{self.ref(field._to_string, "str")}({fmt}({v}))' if field.as_string else f'{fmt}({v})'
+        elif ftype in (fields.Date, fields.DateTime, fields.Time) and \
+                (format_func := field.SERIALIZATION_FUNCS.get(field.format or field.DEFAULT_FORMAT)):
+            expr = f'{self.ref(format_func, "fmt")}({v})'
+        elif ftype is fields.Enum:
+            member = f'{v}.value' if field.by_value else f'{v}.name'
+            expr = self.value_expr(field.field, member, depth + 1)
+        elif ftype is fields.Nested:
+            schema = field.schema
+            dump = self.schema(schema)
+            many = schema.many or field.many
+            if dump is None:
+                expr = f'{self.ref(schema.dump, "dump")}({v}, many={many!r})'
+            elif many:
+                item = f'_i{depth}'
+                expr = f'[{dump}({item}) for {item} in {v}]'
+            else:
+                expr = f'{dump}({v})'
+        elif ftype is fields.List:
+            item = f'_e{depth}'
+            expr = f'[{self.value_expr(field.inner, item, depth + 1)} for {item} in {v}]'
+        elif ftype is fields.Dict and field.key_field is None and field.value_field is None:
+            expr = f'{self.ref(field.mapping_type, "map")}({v})'
+        else:
+            return f'{self.ref(field, "f")}._serialize({v}, None, obj)'
+        return f'(None if {v} is None else {expr})'
+
+    def schema(self, schema: Schema) -> str | None:
+        """
+        Compile `schema` into a dump function and return its name in the
+        namespace, or None if the schema must be dumped by marshmallow.
+        """
+        if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP) or \
+                type(schema).get_attribute is not Schema.get_attribute:
+            return None
+        if (name := self.schemas.get(id(schema))) is not None:
+            return name
+        name = self.schemas[id(schema)] = f'_dump_{type(schema).__name__}_{len(self.schemas)}'
+
+        lines = [
+            f'def {name}(obj):',
+            '    get = _get_item if hasattr(obj, "__getitem__") else getattr',
+            # Loaded ORM attributes live in the instance dict, reading them
+            # directly skips the instrumented descriptor.
+            '    loaded = getattr(obj, "__dict__", _EMPTY)',
+            '    if "_sa_instance_state" not in loaded:',
+            '        loaded = _EMPTY',
+            '    ret = {}',
+        ]
+        for attr_name, field in schema.dump_fields.items():
+            key = field.data_key if field.data_key is not None else attr_name
+            if not field._CHECK_ATTRIBUTE:
+                f = self.ref(field, 'f')
+                lines += [
+                    f'    v = {f}.serialize({attr_name!r}, obj, accessor={self.ref(schema.get_attribute, "acc")})',
+                    f'    if v is not _missing:',
+                    f'        ret[{key!r}] = v',
+                ]
+                continue
+
+            attr = field.attribute if field.attribute is not None else attr_name
+            if '.' in attr:
+                lines.append(f'    v = _get_dotted(obj, {attr!r}, _missing)')
+            else:
+                lines.append(f'    v = loaded[{attr!r}] if {attr!r} in loaded else get(obj, {attr!r}, _missing)')
+            if field.dump_default is not missing:
+                default = self.ref(field.dump_default, 'default')
+                call = '()' if callable(field.dump_default) else ''
+                lines += [
+                    f'    if v is _missing:',
+                    f'        v = {default}{call}',
+                ]
+            lines += [
+                f'    if v is not _missing:',
+                f'        ret[{key!r}] = {self.value_expr(field, "v")}',
+            ]
+        lines.append('    return ret')
+        exec('\n'.join(lines), self.namespace)
+        return name
+
+
+class Serializer:
+    def __init__(self, schema_cls: type[Schema]):
+        self.schema = schema_cls()
+        compiler = _Compiler()
+        name = compiler.schema(self.schema)
+        self._dump: Callable[[Any], Any] | None = None if name is None else compiler.namespace[name]
+        self._render = self.schema.opts.render_module.dumps
+
+    def dump(self, obj: Any) -> Any:
+        if self._dump is None:
+            return self.schema.dump(obj)
+        if self.schema.many and obj is not None:
+            return [self._dump(item) for item in obj]
+        return self._dump(obj)
+
+    def dumps(self, obj: Any) -> str:
+        return self._render(self.dump(obj))
+
+
+@functools.cache
+def serializer(schema_cls: type[Schema]) -> Serializer:
+    """The compiled serializer for `schema_cls`, built once per process."""
+    return Serializer(schema_cls)
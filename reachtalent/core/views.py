@@ -1,24 +1,31 @@
 from datetime import datetime
+import hashlib
+import math
 import typing
 
-from flask import Blueprint, Response, abort, g, request
+from flask import Blueprint, Response, abort, after_this_request, current_app, g, request
 from marshmallow import ValidationError
 import simplejson
-from sqlalchemy import select
+from sqlalchemy import UniqueConstraint, func, insert, select, tuple_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.expression import Select
 from webargs.flaskparser import parser, use_args
 
 from . import commands
 from . import schema
+from .loading import eager_load
+from .response_cache import cached_reference_data
+from .serializers import serializer
 from .models import (
-    Assignment, AssignmentState, ApprovalDecision, ApprovalState, Category,
-    CategoryItem, ClientUser, Contract, CostCenter, Department,
+    CONTRACT_TERMS_VERSION, Assignment, AssignmentState, ApprovalDecision,
+    ApprovalState, Category, CategoryItem, Client, ClientUser, Contract, CostCenter, Department,
     JobClassification, Position, PurchaseOrder, Requisition, Schedule, States,
     Worker, WorkerEnvironment, Location
 )
 from ..auth.models import User
 from ..auth.utils import authenticated, requires, has_permission
 from ..extensions import db
+from ..extensions import marshmallow as ma
 from ..database import Base
 from ..logger import make_logger
 
@@ -27,6 +34,13 @@ blueprint = Blueprint("core", __name__)
 logger = make_logger('reachtalent.core')
 
 RESOURCE_NOT_FOUND = "Resource not found."
+MAX_PAGE_SIZE = 100  # upper bound of page_size in both pagination modes
+MAX_BULK_SIZE = 500
+
+# Compile the hottest response serializers at import instead of on first request
+for _schema_cls in (schema.ListRequisitionResponse, schema.ListAssignmentResponse,
+                    schema.Requisition, schema.Assignment):
+    serializer(_schema_cls)
 
 
 @parser.error_handler
@@ -39,21 +53,28 @@ def handle_request_parsing_error(err, req, schema, *, error_status_code, error_h
     abort(400, err)
 
 
-def validate_inject_client_id(data: dict, entity: str):
+def check_client_id(data: dict, entity: str):
     # TODO: Move this into marshmallow schema
     client_id = data.get('client_id')
 
     # enforce client_id permissions
     if has_permission(f'{entity}.*.manage'):
         if client_id is None:
-            abort(400, ValidationError("Missing data for required field.", "client_id"))
+            raise ValidationError("Missing data for required field.", "client_id")
     else:
         if client_id is not None and client_id != g.auth_state.client.id:
-            abort(400, ValidationError("Invalid client.", "client_id"))
+            raise ValidationError("Invalid client.", "client_id")
 
     data.setdefault('client_id', g.auth_state.client.id)
 
 
+def validate_inject_client_id(data: dict, entity: str):
+    try:
+        check_client_id(data, entity)
+    except ValidationError as err:
+        abort(400, err)
+
+
 def add_audit_fields(data: dict, user: User):
     # TODO: Find more elegant way to do this.
     data['created_uid'] = user.id
@@ -66,7 +87,187 @@ def prepare_for_save(model: type, data: dict, user: User):
     return model(**data)
 
 
-def get_obj(model: typing.Type[Base], id: int):
+def _unique_keys(model: type) -> list[tuple[str, ...]]:
+    return sorted(
+        tuple(column.name for column in constraint.columns)
+        for constraint in model.__table__.constraints
+        if isinstance(constraint, UniqueConstraint)
+    )
+
+
+def _unique_errors(model: type, items: list[dict], label: str, existing: bool) -> dict:
+    """
+    Index errors for `items` clashing on one of `model`'s unique constraints,
+    either with an earlier item of the batch or, when `existing`, with rows
+    already in the table (one query per constraint).
+    """
+    errors = {}
+    for columns in _unique_keys(model):
+        field = next(column for column in columns if column != 'client_id')
+        values = {}
+        for index, data in enumerate(items):
+            value = tuple(data.get(column) for column in columns)
+            if None not in value:
+                values.setdefault(value, []).append(index)
+
+        taken = set()
+        if existing and values:
+            taken = {
+                tuple(row) for row in db.session.execute(
+                    select(*(getattr(model, column) for column in columns)).
+                    where(tuple_(*(getattr(model, column) for column in columns)).in_(list(values))))
+            }
+
+        for value, indexes in values.items():
+            for index in (indexes if value in taken else indexes[1:]):
+                errors.setdefault(index, {})[field] = [f"{label} {field} must be unique."]
+    return errors
+
+
+def bulk_create(model: type, items: list[dict], user: User, label: str) -> list:
+    """
+    Save the items of a bulk create request with a single multi-row INSERT
+    in one transaction, all or nothing. Problems are reported per item
+    index, like marshmallow reports validation errors of the batch: the
+    `client_id` checks of `prepare_for_save` and unique constraint
+    violations, whether within the batch or against existing rows.
+
+    The client ids and unique constraints are checked once for the whole
+    batch (a query each), so request schemas skip their per-item database
+    validation when loading `many`.
+
+    Returns the created objects in request order.
+    """
+    if not 0 < len(items) <= MAX_BULK_SIZE:
+        abort(400, ValidationError(f"Expected between 1 and {MAX_BULK_SIZE} items."))
+
+    errors = {}
+    for index, data in enumerate(items):
+        try:
+            check_client_id(data, model.__name__)
+        except ValidationError as err:
+            errors[index] = err.normalized_messages()
+        add_audit_fields(data, user)
+
+    if has_permission(f'{model.__name__}.*.manage'):
+        client_ids = {data['client_id'] for data in items if data.get('client_id') is not None}
+        known = set(db.session.scalars(select(Client.id).where(Client.id.in_(client_ids))))
+        for index, data in enumerate(items):
+            if index not in errors and data['client_id'] not in known:
+                errors[index] = {'client_id': ['Invalid client.']}
+
+    for index, item_errors in _unique_errors(model, items, label, existing=True).items():
+        errors.setdefault(index, {}).update(item_errors)
+    if errors:
+        abort(400, ValidationError(errors))
+
+    # A multi-row VALUES takes its columns from the first row only
+    columns = {key for data in items for key in data}
+    try:
+        db.session.execute(
+            insert(model).values([{key: data.get(key) for key in columns} for data in items]))
+        db.session.commit()
+    except IntegrityError as exc:
+        db.session.rollback()
+        logger.warning("Integrity error bulk inserting %s: %s", model.__tablename__, exc)
+        abort(400, ValidationError(
+            _unique_errors(model, items, label, existing=True) or f"{label} must be unique."))
+
+    # Read the new rows back by their first unique key to restore request order
+    key_columns = _unique_keys(model)[0]
+    keys = [tuple(data[column] for column in key_columns) for data in items]
+    created = {
+        tuple(getattr(obj, column) for column in key_columns): obj
+        for obj in db.session.scalars(
+            select(model).where(tuple_(*(getattr(model, column) for column in key_columns)).in_(keys)))
+    }
+    return [created[key] for key in keys]
+
+
+def bulk_docs(view):
+    """Fill in MAX_BULK_SIZE for `{max_bulk_size}` in a bulk endpoint's API docs."""
+    view.__doc__ = view.__doc__.replace('{max_bulk_size}', str(MAX_BULK_SIZE))
+    return view
+
+
+def check_etag():
+    """
+    Conditional GET support. Tag the `200` response with a weak ETag of its
+    body and turn it into a `304 Not Modified` when the client's
+    `If-None-Match` already has it. Hashing what is actually sent catches
+    every change, including nested relationships and rows modified within
+    the same second, which aggregates of `modified_date` miss.
+    """
+    @after_this_request
+    def set_etag(response: Response) -> Response:
+        if response.status_code == 200:
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest(), weak=True)
+            response.make_conditional(request)
+        return response
+
+
+def paginate(query: Select, params: dict, key, item_schema: type[ma.Schema]) -> dict:
+    """
+    Paginate `query` into a list response payload of `pagination` and `items`.
+    Relationships dumped by `item_schema` are eager loaded.
+
+    Passing `cursor` or `after_id` switches from page/offset pagination to
+    keyset pagination on `key` (`WHERE key > :after_id ORDER BY key`), so
+    deep pages cost the same as the first one. `include_total=false`, the
+    default in keyset mode, skips the COUNT(*). `page_size` is capped at
+    MAX_PAGE_SIZE in either mode.
+
+    Responses are tagged with an ETag of their body, see `check_etag`.
+    """
+    include_total = params.get('include_total', params.get('after_id') is None)
+    check_etag()
+
+    total = None
+    if include_total:
+        total = db.session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar_one()
+
+    if (after_id := params.get('after_id')) is None:
+        paginated = db.paginate(
+            eager_load(query, item_schema),
+            page=params['page'],
+            per_page=params['page_size'],
+            max_per_page=MAX_PAGE_SIZE,
+            count=False,
+        )
+        pagination = {
+            'page': paginated.page,
+            'page_size': paginated.per_page,
+        }
+        if include_total:
+            paginated.total = total
+            pagination['total_pages'] = paginated.pages
+        return {'pagination': pagination, 'items': paginated.items}
+
+    page_size = min(params['page_size'], MAX_PAGE_SIZE)
+    if page_size < 1:
+        abort(404)
+
+    items = db.session.execute(
+        eager_load(query, item_schema).
+        where(key > after_id).order_by(None).order_by(key).limit(page_size + 1)
+    ).unique().scalars().all()
+
+    pagination = {'page_size': page_size}
+    if len(items) > page_size:
+        items = items[:page_size]
+        pagination['next_cursor'] = getattr(items[-1], key.key)
+    if include_total:
+        pagination['total_pages'] = math.ceil(total / page_size)
+    return {'pagination': pagination, 'items': items}
+
+
+def get_obj(model: typing.Type[Base], id: int, item_schema: type[ma.Schema] | None = None,
+            conditional: bool = False):
+    """
+    Load the `model` row `id` visible to the current client or 404. With
+    `conditional` the response is tagged with an ETag and answered with a
+    `304` when the request's `If-None-Match` has it, see `check_etag`.
+    """
     query = model.query.filter_by(id=id)
 
     if hasattr(model, 'state'):
@@ -75,6 +276,12 @@ def get_obj(model: typing.Type[Base], id: int):
     if not has_permission('Client.*.manage'):
         query = model.filter_by_client(query, g.auth_state.client.id)
 
+    if conditional:
+        check_etag()
+
+    if item_schema is not None:
+        query = eager_load(query, item_schema)
+
     return query.one_or_404(RESOURCE_NOT_FOUND)
 
 
@@ -82,6 +289,7 @@ def get_obj(model: typing.Type[Base], id: int):
 @authenticated
 @requires("Category.*.view")
 @use_args(schema.Pagination(), location='querystring')
+@cached_reference_data
 def list_categories(user: User, params: dict):
     """ List Categories
     ---
@@ -109,12 +317,34 @@ def list_categories(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
       responses:
         200:
           description: Success
           content:
             application/json:
               schema: ListCategoryResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -123,21 +353,13 @@ def list_categories(user: User, params: dict):
     """
     # Replace RequisitionType with Category
     query = select(Category).order_by(Category.id)
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListCategoryResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListCategoryResponse).dumps(paginate(
+            query,
+            params,
+            key=Category.id,
+            item_schema=schema.Category,
+        )),
         content_type='application/json')
 
 
@@ -145,6 +367,7 @@ def list_categories(user: User, params: dict):
 @authenticated
 @requires("CategoryItem.*.view")
 @use_args(schema.CategoryItemPaginatedFilter(), location='querystring')
+@cached_reference_data
 def list_category_items(user: User, params: dict):
     """ List CategoryItems
     ---
@@ -172,6 +395,26 @@ def list_category_items(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: category_id
           required: false
@@ -188,6 +431,8 @@ def list_category_items(user: User, params: dict):
           content:
             application/json:
               schema: ListCategoryItemResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -204,21 +449,13 @@ def list_category_items(user: User, params: dict):
         query = query.filter(Category.key == params.get('category_key'))
 
     query = query.order_by(CategoryItem.id)
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListCategoryItemResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListCategoryItemResponse).dumps(paginate(
+            query,
+            params,
+            key=CategoryItem.id,
+            item_schema=schema.CategoryItem,
+        )),
         content_type='application/json')
 
 
@@ -264,7 +501,7 @@ def create_department(user: User, data: dict):
     try:
         db.session.add(department)
         db.session.commit()
-        resp_json = schema.Department().dumps(department)
+        resp_json = serializer(schema.Department).dumps(department)
     except IntegrityError as exc:
         logger.warning("Integrity error inserting department: %s %s", data, exc)
         abort(400, ValidationError("Department name must be unique.", "name"))
@@ -272,6 +509,52 @@ def create_department(user: User, data: dict):
     return Response(resp_json, content_type='application/json')
 
 
+@blueprint.post('/departments/bulk')
+@authenticated
+@requires("Department.*.create")
+@use_args(schema.Department(many=True), location='json')
+@bulk_docs
+def bulk_create_departments(user: User, data: list[dict]):
+    """Create Departments in bulk
+    ---
+    post:
+      operationId: bulkCreateDepartments
+      tags:
+        - department
+      summary: Create Departments in bulk
+      description: Create up to {max_bulk_size} Departments in one transaction, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: Department
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BulkDepartmentResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    return Response(
+        serializer(schema.BulkDepartmentResponse).dumps({
+            'items': bulk_create(Department, data, user, label="Department"),
+        }),
+        content_type='application/json')
+
+
 @blueprint.get('/departments')
 @authenticated
 @requires("Department.*.view")
@@ -303,6 +586,26 @@ def list_departments(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -314,6 +617,8 @@ def list_departments(user: User, params: dict):
           content:
             application/json:
               schema: ListDepartmentResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -323,21 +628,13 @@ def list_departments(user: User, params: dict):
     query = select(Department).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListDepartmentResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListDepartmentResponse).dumps(paginate(
+            query,
+            params,
+            key=Department.id,
+            item_schema=schema.Department,
+        )),
         content_type='application/json')
 
 
@@ -383,7 +680,7 @@ def create_cost_center(user: User, data: dict):
     try:
         db.session.add(cost_center)
         db.session.commit()
-        resp_json = schema.CostCenter().dumps(cost_center)
+        resp_json = serializer(schema.CostCenter).dumps(cost_center)
     except IntegrityError as exc:
         logger.warning("Integrity error inserting cost_center: %s %s", data, exc)
         abort(400, ValidationError("CostCenter name must be unique.", "name"))
@@ -391,6 +688,52 @@ def create_cost_center(user: User, data: dict):
     return Response(resp_json, content_type='application/json')
 
 
+@blueprint.post('/cost_centers/bulk')
+@authenticated
+@requires("CostCenter.*.create")
+@use_args(schema.CostCenter(many=True), location='json')
+@bulk_docs
+def bulk_create_cost_centers(user: User, data: list[dict]):
+    """Create Cost Centers in bulk
+    ---
+    post:
+      operationId: bulkCreateCostCenters
+      tags:
+        - cost_center
+      summary: Create Cost Centers in bulk
+      description: Create up to {max_bulk_size} Cost Centers in one transaction, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: CostCenter
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BulkCostCenterResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    return Response(
+        serializer(schema.BulkCostCenterResponse).dumps({
+            'items': bulk_create(CostCenter, data, user, label="CostCenter"),
+        }),
+        content_type='application/json')
+
+
 @blueprint.get('/cost_centers')
 @authenticated
 @requires("CostCenter.*.view")
@@ -422,6 +765,26 @@ def list_cost_centers(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -433,6 +796,8 @@ def list_cost_centers(user: User, params: dict):
           content:
             application/json:
               schema: ListCostCenterResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -442,21 +807,13 @@ def list_cost_centers(user: User, params: dict):
     query = select(CostCenter).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListCostCenterResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListCostCenterResponse).dumps(paginate(
+            query,
+            params,
+            key=CostCenter.id,
+            item_schema=schema.CostCenter,
+        )),
         content_type='application/json')
 
 
@@ -491,6 +848,26 @@ def list_client_user(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -502,30 +879,25 @@ def list_client_user(user: User, params: dict):
           content:
             application/json:
               schema: ListStaffResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
             application/json:
               schema: ErrorResponse
     """
-    query = select(ClientUser).order_by('user_id')
+    # keyset pagination orders by id, pages must list staff in the same order
+    query = select(ClientUser).order_by(ClientUser.id)
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListStaffResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListStaffResponse).dumps(paginate(
+            query,
+            params,
+            key=ClientUser.id,
+            item_schema=schema.Staff,
+        )),
         content_type='application/json')
 
 
@@ -569,7 +941,7 @@ def create_purchase_order(user: User, data: dict):
     try:
         db.session.add(purchase_order)
         db.session.commit()
-        resp_json = schema.PurchaseOrder().dumps(purchase_order),
+        resp_json = serializer(schema.PurchaseOrder).dumps(purchase_order),
     except Exception as exc:
         logger.warning("Unexpected error: %s %s", data, exc)
         raise
@@ -610,6 +982,26 @@ def list_purchase_orders(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -621,6 +1013,8 @@ def list_purchase_orders(user: User, params: dict):
           content:
             application/json:
               schema: ListPurchaseOrderResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -630,20 +1024,13 @@ def list_purchase_orders(user: User, params: dict):
     query = select(PurchaseOrder).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListPurchaseOrderResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListPurchaseOrderResponse).dumps(paginate(
+            query,
+            params,
+            key=PurchaseOrder.id,
+            item_schema=schema.PurchaseOrder,
+        )),
         content_type='application/json')
 
 
@@ -712,6 +1099,7 @@ def query_contract_terms(user: User, params: dict):
 @authenticated
 @requires("JobClassification.*.view")
 @use_args(schema.PaginationClientFilter(), location='querystring')
+@cached_reference_data(client_versions=(CONTRACT_TERMS_VERSION,))
 def list_job_classifications(user: User, params: dict):
     """List Job Classifications
     ---
@@ -739,6 +1127,26 @@ def list_job_classifications(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -750,6 +1158,8 @@ def list_job_classifications(user: User, params: dict):
           content:
             application/json:
               schema: ListJobClassificationResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -761,21 +1171,13 @@ def list_job_classifications(user: User, params: dict):
     if params['client_id'] is not None:
         query = JobClassification.contracted_job_class_query(params['client_id'])
 
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListJobClassificationResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListJobClassificationResponse).dumps(paginate(
+            query,
+            params,
+            key=JobClassification.id,
+            item_schema=schema.JobClassification,
+        )),
         content_type='application/json')
 
 
@@ -845,7 +1247,7 @@ def update_purchase_order(user: User, data: dict, id: int):
     db.session.commit()
 
     return Response(
-        schema.PurchaseOrder().dumps(obj),
+        serializer(schema.PurchaseOrder).dumps(obj),
         content_type="application/json",
     )
 
@@ -890,7 +1292,7 @@ def create_position(user: User, data: dict):
     try:
         db.session.add(obj)
         db.session.commit()
-        resp_json = schema.Position().dumps(obj),
+        resp_json = serializer(schema.Position).dumps(obj),
     except Exception as exc:
         logger.warning("Unexpected error: %s %s", data, exc)
         raise
@@ -931,6 +1333,26 @@ def list_positions(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -942,6 +1364,8 @@ def list_positions(user: User, params: dict):
           content:
             application/json:
               schema: ListPositionResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -951,21 +1375,87 @@ def list_positions(user: User, params: dict):
     query = select(Position).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
+    return Response(
+        serializer(schema.ListPositionResponse).dumps(paginate(
+            query,
+            params,
+            key=Position.id,
+            item_schema=schema.Position,
+        )),
+        content_type='application/json')
+
+
+@blueprint.post('/bill_rates/quote')
+@authenticated
+@requires("Position.*.view")
+@use_args(schema.BillRateQuote(many=True), location='json')
+@bulk_docs
+def quote_bill_rates(user: User, data: list[dict]):
+    """Quote Bill Rates
+    ---
+    post:
+      operationId: quoteBillRates
+      tags:
+        - position
+      summary: Quote Bill Rates
+      description: >-
+        Price up to {max_bulk_size} (position_id, pay_rate, effective_date) combinations with the Position's
+        jobclass markup in one batch. Quotes are returned in request order, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: BillRateQuote
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BillRateQuoteResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    if not 0 < len(data) <= MAX_BULK_SIZE:
+        abort(400, ValidationError(f"Expected between 1 and {MAX_BULK_SIZE} items."))
+
+    query = (
+        select(Position.id, Position.client_id, JobClassification.contract_term_prefix)
+        .join(JobClassification)
+        .filter(Position.id.in_({item['position_id'] for item in data}))
     )
+    if not has_permission('Client.*.manage'):
+        query = Position.filter_by_client(query, g.auth_state.client.id)
+    positions = {position_id: (client_id, prefix) for position_id, client_id, prefix in db.session.execute(query)}
+
+    if errors := {
+        index: {'position_id': ['Invalid position.']}
+        for index, item in enumerate(data)
+        if item['position_id'] not in positions
+    }:
+        abort(400, ValidationError(errors))
+
+    # Quotes of the same client, date and job classification share their terms
+    terms = {}
+    for item in data:
+        client_id, prefix = positions[item['position_id']]
+        key = (client_id, item['effective_date'], prefix)
+        if (item_terms := terms.get(key)) is None:
+            item_terms = terms[key] = Contract.query_contract_terms(*key)
+        item['bill_rate'] = Position.apply_markup(item['pay_rate'], item_terms)
 
     return Response(
-        schema.ListPositionResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.BillRateQuoteResponse).dumps({'items': data}),
         content_type='application/json')
 
 
@@ -973,6 +1463,7 @@ def list_positions(user: User, params: dict):
 @authenticated
 @requires("RequisitionType.*.view")
 @use_args(schema.Pagination(), location='querystring')
+@cached_reference_data
 def list_requisition_types(user: User, params: dict):
     """ List RequisitionTypes
     ---
@@ -1000,12 +1491,34 @@ def list_requisition_types(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
       responses:
         200:
           description: Success
           content:
             application/json:
               schema: ListRequisitionTypeResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1015,21 +1528,13 @@ def list_requisition_types(user: User, params: dict):
     # Replace RequisitionType with Category
     query = select(CategoryItem).join(Category).\
         filter(Category.key == 'requisition_type').order_by(CategoryItem.id)
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListRequisitionTypeResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListRequisitionTypeResponse).dumps(paginate(
+            query,
+            params,
+            key=CategoryItem.id,
+            item_schema=schema.RequisitionType,
+        )),
         content_type='application/json')
 
 
@@ -1037,6 +1542,7 @@ def list_requisition_types(user: User, params: dict):
 @authenticated
 @requires("PayScheme.*.view")
 @use_args(schema.Pagination(), location='querystring')
+@cached_reference_data
 def list_pay_schemes(user: User, params: dict):
     """ List PaySchemes
     ---
@@ -1064,12 +1570,34 @@ def list_pay_schemes(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
       responses:
         200:
           description: Success
           content:
             application/json:
               schema: ListPaySchemeResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1078,21 +1606,13 @@ def list_pay_schemes(user: User, params: dict):
     """
     query = select(CategoryItem).join(Category). \
         filter(Category.key == 'pay_scheme').order_by(CategoryItem.id)
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListPaySchemeResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListPaySchemeResponse).dumps(paginate(
+            query,
+            params,
+            key=CategoryItem.id,
+            item_schema=schema.PayScheme,
+        )),
         content_type='application/json')
 
 
@@ -1136,7 +1656,7 @@ def create_schedule(user: User, data: dict):
     try:
         db.session.add(obj)
         db.session.commit()
-        resp_json = schema.Schedule().dumps(obj),
+        resp_json = serializer(schema.Schedule).dumps(obj),
     except Exception as exc:
         logger.warning("Unexpected error: %s %s", data, exc)
         raise
@@ -1146,6 +1666,52 @@ def create_schedule(user: User, data: dict):
     )
 
 
+@blueprint.post('/schedules/bulk')
+@authenticated
+@requires("Schedule.*.create")
+@use_args(schema.Schedule(many=True), location='json')
+@bulk_docs
+def bulk_create_schedules(user: User, data: list[dict]):
+    """Create Schedules in bulk
+    ---
+    post:
+      operationId: bulkCreateSchedules
+      tags:
+        - schedule
+      summary: Create Schedules in bulk
+      description: Create up to {max_bulk_size} Schedules in one transaction, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: Schedule
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BulkScheduleResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    return Response(
+        serializer(schema.BulkScheduleResponse).dumps({
+            'items': bulk_create(Schedule, data, user, label="Schedule"),
+        }),
+        content_type='application/json')
+
+
 @blueprint.get('/schedules')
 @authenticated
 @requires("Schedule.*.view")
@@ -1177,6 +1743,26 @@ def list_schedules(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1188,6 +1774,8 @@ def list_schedules(user: User, params: dict):
           content:
             application/json:
               schema: ListScheduleResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1197,21 +1785,13 @@ def list_schedules(user: User, params: dict):
     query = select(Schedule).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListScheduleResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListScheduleResponse).dumps(paginate(
+            query,
+            params,
+            key=Schedule.id,
+            item_schema=schema.Schedule,
+        )),
         content_type='application/json')
 
 
@@ -1246,6 +1826,26 @@ def list_available_workers(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1263,6 +1863,8 @@ def list_available_workers(user: User, params: dict):
           content:
             application/json:
               schema: ListWorkerResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1270,23 +1872,15 @@ def list_available_workers(user: User, params: dict):
               schema: ErrorResponse
     """
 
-    paginated = db.paginate(
-        Worker.available_workers_query(
-            params['client_id'],
-            for_requisition_id=params.get('for_requisition_id')),
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListWorkerResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListWorkerResponse).dumps(paginate(
+            Worker.available_workers_query(
+                params['client_id'],
+                for_requisition_id=params.get('for_requisition_id')),
+            params,
+            key=Worker.id,
+            item_schema=schema.Worker,
+        )),
         content_type='application/json')
 
 
@@ -1326,7 +1920,7 @@ def get_worker(user: User, id: int):
               schema: ErrorResponse
     """
 
-    query = Worker.query.filter_by(id=id)
+    query = eager_load(Worker.query.filter_by(id=id), schema.Worker)
 
     if not has_permission('Client.*.manage'):
         query = query.join(Assignment, Assignment.worker_id == Worker.id)
@@ -1336,7 +1930,7 @@ def get_worker(user: User, id: int):
     obj = query.one_or_404(RESOURCE_NOT_FOUND)
 
     return Response(
-        schema.Worker().dumps(obj),
+        serializer(schema.Worker).dumps(obj),
         content_type='application/json')
 
 
@@ -1380,7 +1974,7 @@ def create_worker_environment(user: User, data: dict):
     try:
         db.session.add(obj)
         db.session.commit()
-        resp_json = schema.WorkerEnvironment().dumps(obj),
+        resp_json = serializer(schema.WorkerEnvironment).dumps(obj),
     except IntegrityError as exc:
         logger.warning("Integrity error inserting worker_environment: %s %s", data, exc)
         abort(400, ValidationError("Worker Environment name must be unique.", "name"))
@@ -1394,6 +1988,52 @@ def create_worker_environment(user: User, data: dict):
     )
 
 
+@blueprint.post('/worker_environments/bulk')
+@authenticated
+@requires("WorkerEnvironment.*.create")
+@use_args(schema.WorkerEnvironment(many=True), location='json')
+@bulk_docs
+def bulk_create_worker_environments(user: User, data: list[dict]):
+    """Create Worker Environments in bulk
+    ---
+    post:
+      operationId: bulkCreateWorkerEnvironments
+      tags:
+        - worker_environment
+      summary: Create Worker Environments in bulk
+      description: Create up to {max_bulk_size} Worker Environments in one transaction, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: WorkerEnvironment
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BulkWorkerEnvironmentResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    return Response(
+        serializer(schema.BulkWorkerEnvironmentResponse).dumps({
+            'items': bulk_create(WorkerEnvironment, data, user, label="Worker Environment"),
+        }),
+        content_type='application/json')
+
+
 @blueprint.get('/worker_environments')
 @authenticated
 @requires("WorkerEnvironment.*.view")
@@ -1425,6 +2065,26 @@ def list_worker_environments(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1436,6 +2096,8 @@ def list_worker_environments(user: User, params: dict):
           content:
             application/json:
               schema: ListWorkerEnvironmentResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1445,21 +2107,13 @@ def list_worker_environments(user: User, params: dict):
     query = select(WorkerEnvironment).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListWorkerEnvironmentResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListWorkerEnvironmentResponse).dumps(paginate(
+            query,
+            params,
+            key=WorkerEnvironment.id,
+            item_schema=schema.WorkerEnvironment,
+        )),
         content_type='application/json')
 
 
@@ -1503,7 +2157,7 @@ def create_location(user: User, data: dict):
     try:
         db.session.add(obj)
         db.session.commit()
-        resp_json = schema.Location().dumps(obj),
+        resp_json = serializer(schema.Location).dumps(obj),
     except IntegrityError as exc:
         logger.warning("Integrity error inserting location: %s %s", data, exc)
         abort(400, ValidationError("Location name must be unique.", "name"))
@@ -1517,6 +2171,52 @@ def create_location(user: User, data: dict):
     )
 
 
+@blueprint.post('/locations/bulk')
+@authenticated
+@requires("Location.*.create")
+@use_args(schema.Location(many=True), location='json')
+@bulk_docs
+def bulk_create_locations(user: User, data: list[dict]):
+    """Create Locations in bulk
+    ---
+    post:
+      operationId: bulkCreateLocations
+      tags:
+        - location
+      summary: Create Locations in bulk
+      description: Create up to {max_bulk_size} Locations in one transaction, errors are keyed by item index.
+      parameters:
+        - in: header
+          name: X-Client-ID
+          required: false
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: array
+              items: Location
+      responses:
+        200:
+          description: Success
+          content:
+            application/json:
+              schema: BulkLocationResponse
+        default:
+          description: Error
+          content:
+            application/json:
+              schema: ErrorResponse
+    """
+    return Response(
+        serializer(schema.BulkLocationResponse).dumps({
+            'items': bulk_create(Location, data, user, label="Location"),
+        }),
+        content_type='application/json')
+
+
 @blueprint.get('/locations')
 @authenticated
 @requires("Location.*.view")
@@ -1548,6 +2248,26 @@ def list_location(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1559,6 +2279,8 @@ def list_location(user: User, params: dict):
           content:
             application/json:
               schema: ListLocationResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -1568,21 +2290,13 @@ def list_location(user: User, params: dict):
     query = select(Location).order_by('id')
     if params['client_id'] is not None:
         query = query.filter_by(client_id=params['client_id'])
-    paginated = db.paginate(
-        query,
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListLocationResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListLocationResponse).dumps(paginate(
+            query,
+            params,
+            key=Location.id,
+            item_schema=schema.Location,
+        )),
         content_type='application/json')
 
 
@@ -1627,7 +2341,7 @@ def create_requisition(user: User, data: dict):
     try:
         db.session.add(obj)
         db.session.commit()
-        resp_json = schema.Requisition().dumps(obj),
+        resp_json = serializer(schema.Requisition).dumps(obj),
     except Exception as exc:
         logger.warning("Unexpected error: %s %s", data, exc)
         raise
@@ -1668,6 +2382,26 @@ def list_requisition(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1679,30 +2413,24 @@ def list_requisition(user: User, params: dict):
           content:
             application/json:
               schema: ListRequisitionResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
             application/json:
               schema: ErrorResponse
     """
-    paginated = db.paginate(
-        select(Requisition).
-        filter_by(client_id=params['client_id']).
-        filter(Requisition.state != States.DELETED).
-        order_by('id'),
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListRequisitionResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListRequisitionResponse).dumps(paginate(
+            select(Requisition).
+            filter_by(client_id=params['client_id']).
+            filter(Requisition.state != States.DELETED).
+            order_by('id'),
+            params,
+            key=Requisition.id,
+            item_schema=schema.Requisition,
+        )),
         content_type='application/json')
 
 
@@ -1735,16 +2463,18 @@ def get_requisition(user: User, id: int):
           content:
             application/json:
               schema: Requisition
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
             application/json:
               schema: ErrorResponse
     """
-    obj = get_obj(Requisition, id)
+    obj = get_obj(Requisition, id, item_schema=schema.Requisition, conditional=True)
 
     return Response(
-        schema.Requisition().dumps(obj),
+        serializer(schema.Requisition).dumps(obj),
         content_type='application/json')
 
 
@@ -1817,7 +2547,7 @@ def update_requisition(user: User, data: dict, id: int):
     db.session.commit()
 
     return Response(
-        schema.Requisition().dumps(obj),
+        serializer(schema.Requisition).dumps(obj),
         content_type="application/json",
     )
 
@@ -1922,18 +2652,18 @@ def create_requisition_approval(user: User, data: dict, id: int):
     try:
         if data.get('decision') == ApprovalDecision.APPROVE:
             obj.approval_state = ApprovalState.APPROVED
-            obj.approve()
+            obj.approve(defer_above=int(current_app.config['APPROVAL_DEFER_ASSIGNMENTS_ABOVE']))
         else:
             obj.approval_state = ApprovalState.REJECTED
         obj.modified_uid = user.id
-        obj.approvals = [simplejson.loads(schema.Approval().dumps(data))]
+        obj.approvals = [simplejson.loads(serializer(schema.Approval).dumps(data))]
         db.session.add(obj)
         db.session.commit()
     except Exception as exc:
         logger.warning(f'Requisition approval exception: {id} {data} {exc}')
         raise
     return Response(
-        schema.Approval().dumps(data),
+        serializer(schema.Approval).dumps(data),
         content_type='application/json',
     )
 
@@ -1969,6 +2699,26 @@ def list_assignment(user: User, params: dict):
           schema:
             type: integer
             default: 25
+        - in: query
+          name: cursor
+          description: Opaque `next_cursor` from a previous page, switches to keyset pagination.
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: after_id
+          description: Keyset pagination, return items with an id greater than this value.
+          required: false
+          schema:
+            type: integer
+        - in: query
+          name: include_total
+          description: >-
+            Set to false to skip counting `total_pages`. Defaults to true,
+            or false with `cursor` or `after_id`.
+          required: false
+          schema:
+            type: boolean
         - in: query
           name: client_id
           required: false
@@ -1990,6 +2740,8 @@ def list_assignment(user: User, params: dict):
           content:
             application/json:
               schema: ListAssignmentResponse
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
@@ -2009,21 +2761,13 @@ def list_assignment(user: User, params: dict):
     if params.get('worker_id'):
         query = query.filter(Assignment.worker_id == params['worker_id'])
 
-    paginated = db.paginate(
-        query.order_by('id'),
-        page=params['page'],
-        per_page=params['page_size'],
-    )
-
     return Response(
-        schema.ListAssignmentResponse().dumps({
-            'pagination': {
-                'page': paginated.page,
-                'total_pages': paginated.pages,
-                'page_size': paginated.per_page,
-            },
-            'items': paginated.items,
-        }),
+        serializer(schema.ListAssignmentResponse).dumps(paginate(
+            query.order_by('id'),
+            params,
+            key=Assignment.id,
+            item_schema=schema.Assignment,
+        )),
         content_type='application/json')
 
 
@@ -2057,16 +2801,18 @@ def get_assignment_detail(user: User, id: int):
           content:
             application/json:
               schema: Assignment
+        304:
+          description: Not Modified, the `If-None-Match` ETag is current.
         default:
           description: Error
           content:
             application/json:
               schema: ErrorResponse
     """
-    obj = get_obj(Assignment, id)
+    obj = get_obj(Assignment, id, item_schema=schema.Assignment, conditional=True)
 
     return Response(
-        schema.Assignment().dumps(obj),
+        serializer(schema.Assignment).dumps(obj),
         content_type='application/json')
 
 
@@ -2130,7 +2876,7 @@ def update_assignment(user: User, id: int):
     db.session.commit()
 
     return Response(
-        schema.Assignment().dumps(obj),
+        serializer(schema.Assignment).dumps(obj),
         content_type="application/json",
     )
 
@@ -2185,7 +2931,7 @@ def create_assignment(user: User, data: dict):
     db.session.commit()
 
     return Response(
-        schema.Assignment().dumps(obj),
+        serializer(schema.Assignment).dumps(obj),
         content_type='application/json')
 
 
@@ -2263,3 +3009,9 @@ blueprint.cli.add_command(commands.update_data_cmd)
 blueprint.cli.add_command(commands.sync_client_cmd)
 blueprint.cli.add_command(commands.sync_undo_cmd)
 blueprint.cli.add_command(commands.dump_census_sheet_cmd)
+blueprint.cli.add_command(commands.client_workers_cmd)
+blueprint.cli.add_command(commands.assignment_worker_cmd)
+blueprint.cli.add_command(commands.profiles_cmd)
+blueprint.cli.add_command(commands.bench_cmd)
+blueprint.cli.add_command(commands.seed_cmd)
+blueprint.cli.add_command(commands.loadtest_cmd)
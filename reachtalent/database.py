@@ -12,7 +12,7 @@ Column = db.Column
 
 class Base(db.Model):
     __abstract__ = True
-    import_id: Mapped[int] = Column(db.Integer, nullable=True)
+    import_id: Mapped[int] = Column(db.Integer, nullable=True, index=True)
     ext_ref: Mapped[str] = Column(db.String, server_default="")
     created_uid: Mapped[int] = Column(db.Integer, server_default="1")
     created_date: Mapped[datetime] = Column(db.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'))
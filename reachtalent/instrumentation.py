@@ -0,0 +1,66 @@
+"""
+Per-request SQL instrumentation. Every statement executed while handling a
+request is counted and timed, the totals are reported in a `Server-Timing`
+header and requests running more statements than `QUERY_BUDGET` are logged.
+"""
+import time
+from dataclasses import dataclass
+
+import sqlalchemy as sa
+from flask import Response, current_app, g, has_app_context, request
+from sqlalchemy.engine import Engine
+
+from .logger import make_logger
+
+logger = make_logger('reachtalent.instrumentation')
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0  # seconds
+
+
+def current_query_stats() -> QueryStats | None:
+    """The statistics of the current request, None outside of requests."""
+    if not has_app_context():
+        return None
+    return g.get('_query_stats')
+
+
+@sa.event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+@sa.event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info['query_started_at'].pop()
+    if (stats := current_query_stats()) is not None:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started_at
+
+
+@sa.event.listens_for(Engine, 'handle_error')
+def _discard_query_timer(exception_context):
+    if (connection := exception_context.connection) is not None and connection.info.get('query_started_at'):
+        connection.info['query_started_at'].pop()
+
+
+def start_query_stats():
+    g._query_stats = QueryStats()
+
+
+def report_query_stats(response: Response) -> Response:
+    if (stats := current_query_stats()) is None:
+        return response
+
+    duration_ms = stats.duration * 1000
+    response.headers.add('Server-Timing', f'db;dur={duration_ms:.1f};desc="{stats.count} queries"')
+
+    budget = int(current_app.config['QUERY_BUDGET'])
+    if 0 < budget < stats.count:
+        logger.warning(
+            f'Query budget exceeded: {request.method} {request.endpoint} ran {stats.count} '
+            f'queries (budget {budget}) in {duration_ms:.1f}ms')
+    return response
@@ -0,0 +1,289 @@
+"""
+Prometheus metrics shared by every worker process.
+
+Each process keeps its values in its own memory mapped file under
+`METRICS_DIR` (`<pid>.db`), so recording a request costs a few in-place
+writes. A scrape of `/api/metrics` by any worker reads all files and adds
+them up: counters and histograms across every file, gauges across the files
+of live processes only. The counters of exited processes (i.e. workers
+recycled by gunicorn) are folded into `merged.db` and their files removed.
+Point `METRICS_DIR` at shared memory (`/dev/shm`) and empty it before
+starting the server.
+"""
+import fcntl
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterator
+
+from flask import Flask, Response, current_app, g, request
+
+from .auth.tokens import get_verified_token_cache
+from .auth.utils import get_auth_state_cache
+from .core.response_cache import get_reference_data_cache
+from .extensions import db
+
+# Open value files by path, shared by every app in the process so that two
+# apps never append to the same file through separate maps
+_values: dict[Path, tuple[int, 'MmapedValues']] = {}
+_values_lock = threading.Lock()
+
+COUNTER, GAUGE, HISTOGRAM = 'counter', 'gauge', 'histogram'
+
+METRICS = {
+    'reachtalent_request_duration_seconds': (HISTOGRAM, 'Request latency by endpoint.'),
+    'reachtalent_requests_total': (COUNTER, 'Responses by endpoint and status code.'),
+    'reachtalent_db_pool_checked_out': (GAUGE, 'Connections checked out of the database pool.'),
+    'reachtalent_db_pool_overflow': (GAUGE, 'Connections opened beyond the database pool size.'),
+    'reachtalent_cache_hits_total': (COUNTER, 'Process cache lookups answered from the cache.'),
+    'reachtalent_cache_misses_total': (COUNTER, 'Process cache lookups missing the cache.'),
+    'reachtalent_cache_hit_ratio': (GAUGE, 'Share of process cache lookups answered from the cache.'),
+}
+
+MERGED_FILE = 'merged.db'
+LOCK_FILE = 'collect.lock'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+_ENTRY_HEADER = struct.Struct('<i')
+_VALUE = struct.Struct('<d')
+
+
+class MmapedValues:
+    """
+    Float values keyed by string in a memory mapped file. The file starts
+    with the number of bytes in use, followed by entries made of the key's
+    length, the key padded to a multiple of 8 bytes and the value as a
+    double. Entries are only ever appended, so a reader only needs the used
+    size to parse a consistent prefix.
+    """
+    INITIAL_SIZE = 1 << 16
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'a+b')
+        if (capacity := os.fstat(self._file.fileno()).st_size) == 0:
+            capacity = self.INITIAL_SIZE
+            self._file.truncate(capacity)
+        self._capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+        self._lock = threading.Lock()
+        self._used = _ENTRY_HEADER.unpack_from(self._map, 0)[0] or 8
+        self._positions = {key: position for key, _, position in _entries(self._map, self._used)}
+
+    def inc(self, key: str, amount: float = 1.0):
+        with self._lock:
+            position = self._position(key)
+            _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def set(self, key: str, value: float):
+        with self._lock:
+            _VALUE.pack_into(self._map, self._position(key), value)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _position(self, key: str) -> int:
+        if (position := self._positions.get(key)) is not None:
+            return position
+
+        encoded = key.encode()
+        padded = encoded + b' ' * (-(len(encoded) + _ENTRY_HEADER.size) % 8)
+        entry = _ENTRY_HEADER.pack(len(encoded)) + padded + _VALUE.pack(0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._map[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        _ENTRY_HEADER.pack_into(self._map, 0, self._used)
+        position = self._positions[key] = self._used - _VALUE.size
+        return position
+
+    @staticmethod
+    def read(path: Path) -> Iterator[tuple[str, float]]:
+        data = path.read_bytes()
+        if len(data) < 8:
+            return
+        for key, value, _ in _entries(data, _ENTRY_HEADER.unpack_from(data, 0)[0]):
+            yield key, value
+
+
+def _entries(data, used: int) -> Iterator[tuple[str, float, int]]:
+    position = 8
+    while position < used:
+        length = _ENTRY_HEADER.unpack_from(data, position)[0]
+        key_start = position + _ENTRY_HEADER.size
+        value_position = key_start + length + (-(length + _ENTRY_HEADER.size) % 8)
+        yield (bytes(data[key_start:key_start + length]).decode(),
+               _VALUE.unpack_from(data, value_position)[0],
+               value_position)
+        position = value_position + _VALUE.size
+
+
+def metrics_dir(app: Flask) -> Path:
+    return Path(app.config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics'))
+
+
+def get_metrics_values(app: Flask) -> MmapedValues:
+    """This process' value file, reopened after a fork."""
+    pid = os.getpid()
+    directory = metrics_dir(app)
+    with _values_lock:
+        values = _values.get(directory)
+        if values is None or values[0] != pid:
+            directory.mkdir(parents=True, exist_ok=True)
+            values = _values[directory] = (pid, MmapedValues(directory / f'{pid}.db'))
+    return values[1]
+
+
+def _key(name: str, **labels) -> str:
+    return json.dumps([name, sorted(labels.items())])
+
+
+def start_request_timer():
+    g._request_started_at = time.perf_counter()
+
+
+def record_request(response: Response) -> Response:
+    if (started_at := g.pop('_request_started_at', None)) is None:
+        return response
+    duration = time.perf_counter() - started_at
+    endpoint = request.endpoint or 'none'
+    values = get_metrics_values(current_app)
+
+    bucket = next(le for le in LATENCY_BUCKETS if duration <= le)
+    name = 'reachtalent_request_duration_seconds'
+    values.inc(_key(f'{name}_bucket', endpoint=endpoint, method=request.method, le=bucket))
+    values.inc(_key(f'{name}_sum', endpoint=endpoint, method=request.method), duration)
+    values.inc(_key(f'{name}_count', endpoint=endpoint, method=request.method))
+    values.inc(_key('reachtalent_requests_total', endpoint=endpoint, method=request.method,
+                    status=response.status_code))
+
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        values.set(_key('reachtalent_db_pool_checked_out'), pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        values.set(_key('reachtalent_db_pool_overflow'), max(pool.overflow(), 0))
+
+    # Process caches count their lookups since start, which is what the
+    # counters of this process' file hold
+    for cache_name, cache in _caches(current_app):
+        values.set(_key('reachtalent_cache_hits_total', cache=cache_name), cache.hits)
+        values.set(_key('reachtalent_cache_misses_total', cache=cache_name), cache.misses)
+    return response
+
+
+def _caches(app: Flask) -> list[tuple[str, object]]:
+    return [
+        ('auth_state', get_auth_state_cache(app)),
+        ('verified_token', get_verified_token_cache(app)),
+        ('reference_data', get_reference_data_cache(app)),
+    ]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_gauge(name: str) -> bool:
+    family = name.removesuffix('_bucket').removesuffix('_sum').removesuffix('_count')
+    return METRICS.get(family, METRICS.get(name, (None,)))[0] == GAUGE
+
+
+def _merge_exited(directory: Path):
+    """Fold the counters of exited processes into `merged.db` and remove their files."""
+    exited = [
+        path for path in directory.glob('*.db')
+        if path.stem.isdigit() and not _pid_alive(int(path.stem))
+    ]
+    if not exited:
+        return
+    merged = MmapedValues(directory / MERGED_FILE)
+    try:
+        for path in exited:
+            for key, value in MmapedValues.read(path):
+                if not _is_gauge(json.loads(key)[0]):
+                    merged.inc(key, value)
+            path.unlink()
+    finally:
+        merged.close()
+
+
+def collect(directory: Path) -> dict[str, dict[tuple, float]]:
+    """Values of every process in `directory` added up per metric name and labels."""
+    samples = defaultdict(lambda: defaultdict(float))
+    directory.mkdir(parents=True, exist_ok=True)
+    # Scrapes by different workers take turns, so exited files are merged once
+    with open(directory / LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _merge_exited(directory)
+        for path in sorted(directory.glob('*.db')):
+            alive = path.stem.isdigit() and _pid_alive(int(path.stem))
+            for key, value in MmapedValues.read(path):
+                name, labels = json.loads(key)
+                if _is_gauge(name) and not alive:
+                    continue
+                samples[name][tuple(map(tuple, labels))] += value
+    return samples
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for label, value in labels:
+        if label == 'le':
+            value = '+Inf' if value == math.inf else repr(float(value))
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{label}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render(samples: dict[str, dict[tuple, float]]) -> str:
+    """Prometheus text exposition of `collect`ed samples."""
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == HISTOGRAM:
+            buckets = defaultdict(dict)
+            for labels, value in samples.get(f'{name}_bucket', {}).items():
+                series = tuple(label for label in labels if label[0] != 'le')
+                buckets[series][dict(labels)['le']] = value
+            for series in sorted(buckets):
+                cumulative = 0.0
+                for le in LATENCY_BUCKETS:
+                    cumulative += buckets[series].get(le, 0.0)
+                    bucket_labels = tuple(sorted(series + (('le', le),)))
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}')
+                for suffix in ('_sum', '_count'):
+                    value = samples.get(f'{name}{suffix}', {}).get(series, 0.0)
+                    lines.append(f'{name}{suffix}{_format_labels(series)} {_format_value(value)}')
+        elif name == 'reachtalent_cache_hit_ratio':
+            hits = samples.get('reachtalent_cache_hits_total', {})
+            misses = samples.get('reachtalent_cache_misses_total', {})
+            for labels in sorted(hits.keys() | misses.keys()):
+                if total := hits.get(labels, 0.0) + misses.get(labels, 0.0):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(hits.get(labels, 0.0) / total)}')
+        else:
+            for labels, value in sorted(samples.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,95 @@
+"""
+Opt-in cProfile capture of single requests, for diagnosing slow endpoints
+in place. A request is profiled when a user holding `Client.*.manage` sends
+an `X-Profile: 1` header, or when it is picked by `PROFILE_SAMPLE_RATE`.
+Other requests only pay for the header lookup.
+
+Every capture is dumped to `PROFILE_DIR` as
+`<time_ns>-<endpoint>-c<client_id>-q<queries>.prof`, keeping the newest
+`PROFILE_KEEP` files. `flask core profiles` summarizes them.
+"""
+import cProfile
+import os
+import random
+import re
+import time
+from pathlib import Path
+
+from flask import Flask, Response, current_app, g, request
+
+from .auth.utils import has_permission
+from .instrumentation import current_query_stats
+from .logger import make_logger
+
+logger = make_logger('reachtalent.profiling')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_NAME = re.compile(r'^(?P<time>\d+)-(?P<endpoint>.+)-c(?P<client_id>\w+)-q(?P<queries>\d+)\.prof$')
+
+
+def profile_dir(app: Flask) -> Path:
+    return Path(app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles'))
+
+
+def _wants_profile() -> bool:
+    if request.headers.get(PROFILE_HEADER) == '1':
+        return g.auth_state.role is not None and has_permission('Client.*.manage')
+    rate = float(current_app.config['PROFILE_SAMPLE_RATE'])
+    return rate > 0 and random.random() < rate
+
+
+def start_profiler():
+    if not _wants_profile():
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        return
+    g._profiler = profiler
+
+
+def save_profile(response: Response) -> Response:
+    if (profiler := g.pop('_profiler', None)) is None:
+        return response
+    profiler.disable()
+
+    client = g.auth_state.client
+    stats = current_query_stats()
+    name = (f'{time.time_ns()}-{request.endpoint or "none"}-c{client.id if client else "none"}'
+            f'-q{stats.count if stats else 0}.prof')
+    directory = profile_dir(current_app)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / name)
+        _rotate(directory, int(current_app.config['PROFILE_KEEP']))
+    except OSError as exc:
+        logger.warning(f'Failed to save profile {name}: {exc}')
+    else:
+        response.headers[PROFILE_HEADER] = name
+    return response
+
+
+def stop_profiler(exc: BaseException | None = None):
+    # The view raised before `save_profile` could run
+    if (profiler := g.pop('_profiler', None)) is not None:
+        profiler.disable()
+
+
+def _rotate(directory: Path, keep: int):
+    profiles = list_profiles(directory)
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles(directory: Path, endpoint: str | None = None) -> list[Path]:
+    """Captured profiles in `directory`, oldest first."""
+    if not directory.is_dir():
+        return []
+    profiles = [
+        (int(match['time']), path)
+        for path in directory.iterdir()
+        if (match := PROFILE_NAME.match(path.name)) and (endpoint is None or match['endpoint'] == endpoint)
+    ]
+    return [path for _, path in sorted(profiles)]
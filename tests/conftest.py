@@ -1,7 +1,12 @@
 import os
+import shutil
+import socketserver
 import tempfile
+import threading
+from contextlib import contextmanager
 from dataclasses import fields, astuple
 from datetime import datetime, timedelta, date
+from unittest.mock import patch
 
 import jwt
 import pytest
@@ -10,7 +15,7 @@ from flask import Response
 from werkzeug.http import parse_cookie
 
 from reachtalent import create_app
-from reachtalent.auth import tokens
+from reachtalent.auth import email, tokens
 from reachtalent.auth.commands import _sync_data
 from reachtalent.auth.models import (
     User, AuthProvider, Role,
@@ -28,6 +33,7 @@ from reachtalent.extensions import db
 @pytest.fixture(scope='session')
 def app():
     db_fd, db_path = tempfile.mkstemp()
+    metrics_dir = tempfile.mkdtemp()
 
     test_app = create_app(Config(
         TESTING=True,
@@ -38,6 +44,7 @@ def app():
         LINKEDIN_OAUTH_CLIENT_ID='_linkedin_client_id',
         FACEBOOK_OAUTH_CLIENT_ID='_facebook_client_id',
         APPLE_OAUTH_CLIENT_ID='_apple_client_id',
+        METRICS_DIR=metrics_dir,
     ))
 
     with test_app.app_context():
@@ -257,6 +264,7 @@ def app():
 
     os.close(db_fd)
     os.unlink(db_path)
+    shutil.rmtree(metrics_dir)
 
 
 @pytest.fixture(scope='module')
@@ -282,6 +290,27 @@ def cli_app():
     os.unlink(db_path)
 
 
+@pytest.fixture
+def reference_app(tmp_path):
+    """An app on an otherwise empty database holding just roles and categorical data."""
+    _app = create_app(Config(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'reference.db'}",
+        SERVER_NAME='reachtalent.com',
+        METRICS_DIR=str(tmp_path / 'metrics'),
+    ))
+
+    with _app.app_context():
+        db.create_all()
+        _sync_data(dry_run=False)
+        _update_category_data(True, False)
+        db.session.commit()
+    yield _app
+
+    with _app.app_context():
+        db.engine.dispose()
+
+
 @pytest.fixture
 def client(app):
     return app.test_client()
@@ -382,6 +411,105 @@ def set_auth_token(app, test_client, token_payload):
     return user
 
 
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server that accepts every message, except recipients
+    containing `bounce` which are refused.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost SMTP sink')
+        data = None
+        for raw in self.rfile:
+            line = raw.decode().rstrip('\r\n')
+            if data is not None:
+                if line == '.':
+                    self.server.messages.append('\n'.join(data))
+                    data = None
+                    self.reply('250 OK')
+                else:
+                    data.append(line)
+                continue
+
+            cmd = line.upper()
+            if cmd.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif cmd.startswith('RCPT') and 'BOUNCE' in cmd:
+                self.reply('550 No such user')
+            elif cmd == 'DATA':
+                data = []
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif cmd == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_sink(app):
+    sink = SMTPSink()
+    thread = threading.Thread(target=sink.serve_forever, daemon=True)
+    thread.start()
+    state = app.extensions['mail']
+    host, port = sink.server_address
+    with patch.multiple(state, suppress=False, server=host, port=port):
+        yield sink
+    sink.shutdown()
+    sink.server_close()
+
+
+def deliver_emails(app):
+    """Drain the email outbox the way `flask auth mail-worker` would."""
+    with app.app_context():
+        return email.deliver_outbox()
+
+
+@pytest.fixture
+def assert_max_queries(app):
+    """
+    Fail when the block runs more than `n` SQL statements, yields the
+    `(statement, parameters)` pairs run so far. Without `n` the statements
+    are only captured:
+
+        with assert_max_queries(3):
+            client.get('/api/requisitions')
+    """
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def check(n: int | None = None):
+        statements = []
+
+        def count(conn, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+
+        sa.event.listen(engine, 'before_cursor_execute', count)
+        try:
+            yield statements
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', count)
+        assert n is None or len(statements) <= n, \
+            f'{len(statements)} queries, expected at most {n}:\n' + \
+            '\n\n'.join(statement for statement, _ in statements)
+
+    return check
+
+
 @pytest.fixture
 def db_transaction(app):
     with app.app_context():
@@ -1,20 +1,30 @@
+import threading
 import uuid
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timedelta
 from time import sleep
+from unittest.mock import patch
 
 import jwt
 import pytest
+import sqlalchemy as sa
+from flask import g
+from flask_mail import Message
 from sqlalchemy import select
 
-from reachtalent.auth import tokens
+from reachtalent.auth import email, tokens
 from reachtalent.auth.commands import _sync_data
-from reachtalent.auth.models import User
+from reachtalent.auth.models import EmailOutbox, User, Role
 from reachtalent.auth.permissions import generate_base_roles, generate_rti_roles
+from reachtalent.auth.utils import (
+    AUTH_STATE_VERSION, AuthState, PermissionIndex, _parse_auth_token_state, get_auth_state_cache, get_permission_index,
+    has_permission, role_permissions,
+)
+from reachtalent.core.models import CacheVersion, ClientUser
 from reachtalent.database import db
 from reachtalent.extensions import mail
 from reachtalent.schema import ErrorResponse
-from .conftest import assert_login_as, params, set_auth_token
+from .conftest import assert_login_as, deliver_emails, params, set_auth_token
 
 
 def assert_error_resp(response, expected_code, expected_description, expected_errors):
@@ -121,6 +131,7 @@ class TestSignup:
                                    },
                                    headers={'Content-Type': 'application/json'})
             assert response.status_code == 202
+            deliver_emails(app)
             assert len(outbox) == 1
             assert outbox[0].subject == "Attempted Sign-up to Reach Talent"
             assert outbox[0].recipients == ['mario@example.com']
@@ -146,6 +157,8 @@ class TestSignup:
                                        'name': 'John Smith',
                                    },
                                    headers={'Content-Type': 'application/json'})
+            assert len(outbox) == 0, "emails should only be queued on the request path"
+            deliver_emails(app)
             assert len(outbox) == 1
             assert outbox[0].subject == "Welcome to Reach Talent"
             assert outbox[0].recipients == ['jsmith@example.com']
@@ -290,6 +303,7 @@ def test_send_forgot_password(client, app, email, expect_email_send, expected_er
         response = client.post('/api/auth/forgot_password/send',
                                json=payload,
                                headers={'Content-Type': 'application/json'})
+        deliver_emails(app)
         if expect_email_send:
             assert len(outbox) == 1
             assert outbox[0].subject == "Password Reset for Reach Talent System"
@@ -547,6 +561,225 @@ def test_auth_permissions(client, app, token_payload, headers, exp_status, exp_r
     assert response.status_code == exp_status
 
 
+def test_auth_state_cache_invalidation(client, app):
+    set_auth_token(app, client, {'sub': 103})
+    cache = get_auth_state_cache(app)
+
+    response = client.get('/api/auth/permissions')
+    assert response.json['role'] == 'Hiring Manager'
+    assert len(cache) >= 1
+
+    # Served from the cache
+    response = client.get('/api/auth/permissions')
+    assert response.json['role'] == 'Hiring Manager'
+
+    with app.app_context():
+        client_user = db.session.execute(select(ClientUser).filter_by(user_id=103)).scalar_one()
+        original_role_id = client_user.role_id
+        client_user.role = db.session.execute(
+            select(Role).filter_by(name='Worker', client_id=None)).scalar_one()
+        db.session.commit()
+    assert len(cache) == 0, "ClientUser change should invalidate cached auth states"
+
+    try:
+        response = client.get('/api/auth/permissions')
+        assert response.json['role'] == 'Worker'
+    finally:
+        with app.app_context():
+            client_user = db.session.execute(select(ClientUser).filter_by(user_id=103)).scalar_one()
+            client_user.role_id = original_role_id
+            db.session.commit()
+
+
+def test_auth_state_sees_other_workers_changes(client, app, monkeypatch):
+    set_auth_token(app, client, {'sub': 103})
+    cache = get_auth_state_cache(app)
+    monkeypatch.setattr(cache, 'poll_interval', 0)
+    with app.app_context():
+        client_user_id, original_role_id = db.session.execute(
+            select(ClientUser.id, ClientUser.role_id).filter_by(user_id=103)).one()
+        worker_role_id = db.session.execute(
+            select(Role.id).filter_by(name='Worker', client_id=None)).scalar_one()
+
+    def commit_elsewhere(role_id: int):
+        # bypasses this process' session listeners, as another worker would
+        with app.app_context(), db.engine.begin() as connection:
+            connection.execute(sa.update(ClientUser).filter_by(id=client_user_id).values(role_id=role_id))
+            connection.execute(sa.update(CacheVersion).filter_by(name=AUTH_STATE_VERSION)
+                               .values(version=CacheVersion.version + 1))
+
+    assert client.get('/api/auth/permissions').json['role'] == 'Hiring Manager'
+    commit_elsewhere(worker_role_id)
+    try:
+        assert client.get('/api/auth/permissions').json['role'] == 'Worker'
+    finally:
+        commit_elsewhere(original_role_id)
+    assert client.get('/api/auth/permissions').json['role'] == 'Hiring Manager'
+
+
+def test_auth_state_is_lazy(client, app, assert_max_queries):
+    set_auth_token(app, client, {'sub': 103})
+    with patch.object(tokens, 'decode', wraps=tokens.decode) as decode:
+        # public endpoints should not resolve auth state
+        with assert_max_queries(0):
+            resp = client.get('/api/openapi.json')
+        assert resp.status_code == 200
+        decode.assert_not_called()
+
+        resp = client.get('/api/auth/permissions')
+        assert resp.status_code == 200
+        decode.assert_called_once()
+
+
+def test_verified_token_cache(app):
+    cache = tokens.get_verified_token_cache(app)
+    token = tokens.make_token(app, 'auth', sub=103, rti_payload={'name': 'cache'})
+    hits, misses = cache.hits, cache.misses
+
+    with patch.object(jwt, 'decode', wraps=jwt.decode) as jwt_decode:
+        payload = tokens.decode(app, token)
+        assert tokens.decode(app, token) is payload
+        jwt_decode.assert_called_once()
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+    expired = tokens.make_token(app, 'auth', sub=103, expires_in=timedelta(seconds=-1))
+    for _ in range(2):
+        with pytest.raises(jwt.exceptions.ExpiredSignatureError):
+            tokens.decode(app, expired)
+
+
+def test_verified_token_cache_size_from_env(app, monkeypatch):
+    # values overridden from the environment are strings
+    monkeypatch.setitem(app.config, 'VERIFIED_TOKEN_CACHE_SIZE', '2')
+    monkeypatch.delitem(app.extensions, tokens.VERIFIED_TOKEN_CACHE, raising=False)
+    cache = tokens.get_verified_token_cache(app)
+    assert cache.maxsize == 2
+
+    for sub in (101, 102, 103):
+        tokens.decode(app, tokens.make_token(app, 'auth', sub=sub))
+    assert len(cache) == 2
+
+
+def test_permission_index(app):
+    index = get_permission_index(app)
+    with app.app_context():
+        roles = {
+            role.name: role
+            for role in Role.query.filter_by(client_id=None)
+        }
+        for name, perms in generate_base_roles().items():
+            assert index.permissions(roles[name].id) == frozenset(perms)
+
+        version = CacheVersion.current(PermissionIndex.VERSION_NAME)
+        _sync_data()
+        assert CacheVersion.current(PermissionIndex.VERSION_NAME) == version + 1, \
+            "sync_data should bump the permission index version"
+
+    with app.test_request_context():
+        g.auth_state = AuthState(role=db.session.merge(roles['Worker']))
+        assert has_permission('Requisition.*.view')
+        assert not has_permission('Requisition.*.create')
+
+
+def test_permission_index_concurrent_invalidate(monkeypatch):
+    index = PermissionIndex(poll_interval=3600)
+    monkeypatch.setattr(CacheVersion, 'current', lambda name: 1)
+    monkeypatch.setattr(index, '_load', lambda: {1: frozenset({'Requisition.*.view'})})
+
+    class InvalidatedOnRelease:
+        """Another thread invalidates the index as soon as the lock is released."""
+        lock = threading.Lock()
+
+        def __enter__(self):
+            self.lock.acquire()
+
+        def __exit__(self, *exc_info):
+            self.lock.release()
+            index.invalidate()
+
+    index._lock = InvalidatedOnRelease()
+    assert index.permissions(1) == frozenset({'Requisition.*.view'})
+
+
+def test_token_scope_claim(app):
+    index = get_permission_index(app)
+    index.invalidate()
+    app.config['AUTH_TOKEN_PERMISSION_CLAIMS'] = True
+    try:
+        with app.app_context():
+            user = db.session.get(User, 103)
+            role = next(cr.role for cr in user.client_roles if cr.client_id == 2)
+            payload = tokens.decode(app, tokens.make_auth_token(app, user, client_id=2))
+    finally:
+        app.config['AUTH_TOKEN_PERMISSION_CLAIMS'] = False
+
+    scope = payload['rti']['scope']
+    assert scope['role_id'] == role.id
+    assert tokens.decode_scope(scope['perms']) == frozenset(role.perms)
+
+    with app.test_request_context():
+        g.auth_state = AuthState(role=db.session.merge(role), payload=payload)
+        assert role_permissions(g.auth_state.role) == frozenset(role.perms)
+        assert 'role_permissions' in g
+
+    with app.test_request_context(), \
+            patch.object(index, 'permissions', wraps=index.permissions) as permissions:
+        g.auth_state = AuthState(role=db.session.merge(role), payload=payload)
+        role_permissions(g.auth_state.role)
+        permissions.assert_not_called()
+
+        g.pop('role_permissions')
+        stale_scope = {**scope, 'version': tokens.scope_version(-1)}
+        g.auth_state.payload = {**payload, 'rti': {**payload['rti'], 'scope': stale_scope}}
+        assert role_permissions(g.auth_state.role) == frozenset(role.perms)
+        permissions.assert_called_once_with(role.id), \
+            "stale scope claims should fall back to the permission index"
+
+
+def test_token_scope_claim_retired_by_permission_changes(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUTH_TOKEN_PERMISSION_CLAIMS', True)
+    with app.app_context():
+        user = db.session.get(User, 103)
+        role = next(cr.role for cr in user.client_roles if cr.client_id == 2)
+        payload = tokens.decode(app, tokens.make_auth_token(app, user, client_id=2))
+        version = CacheVersion.current(PermissionIndex.VERSION_NAME)
+
+        role_id = role.id
+        removed = next(perm for perm in role.permissions if perm.name == 'Requisition.*.view')
+        role.permissions.remove(removed)
+        db.session.commit()
+    try:
+        with app.test_request_context():
+            assert CacheVersion.current(PermissionIndex.VERSION_NAME) == version + 1, \
+                "permission changes should bump the permission index version"
+            g.auth_state = AuthState(role=db.session.get(Role, role_id), payload=payload)
+            assert 'Requisition.*.view' not in role_permissions(g.auth_state.role), \
+                "scope claims issued before the change should no longer be trusted"
+    finally:
+        with app.app_context():
+            role = db.session.get(Role, role_id)
+            role.permissions.append(db.session.merge(removed))
+            db.session.commit()
+
+
+@pytest.mark.parametrize('client_id', [None, 2, 999])
+def test_token_scope_claim_matches_resolved_role(app, monkeypatch, client_id):
+    # as set from the environment
+    monkeypatch.setitem(app.config, 'AUTH_TOKEN_PERMISSION_CLAIMS', 'true')
+    with app.app_context():
+        token = tokens.make_auth_token(app, db.session.get(User, 103), client_id=client_id)
+    payload = tokens.decode(app, token)
+
+    with app.test_request_context(headers={'Cookie': f'AuthToken={token}'}):
+        auth_state = _parse_auth_token_state()
+        assert payload['rti']['scope']['role_id'] == auth_state.role.id
+
+    monkeypatch.setitem(app.config, 'AUTH_TOKEN_PERMISSION_CLAIMS', 'false')
+    with app.app_context():
+        token = tokens.make_auth_token(app, db.session.get(User, 103), client_id=client_id)
+    assert 'scope' not in tokens.decode(app, token)['rti']
+
+
 @dataclass
 class SendInviteTC:
     exp_resp: dict
@@ -616,6 +849,7 @@ def test_send_invite(client, app, token_payload, payload, exp_status, exp_resp,
     with mail.record_messages() as outbox:
         response = client.post('/api/auth/invite', json=payload)
         assert (response.status_code, response.json) == (exp_status, exp_resp)
+        deliver_emails(app)
         email_sent = False
         msg = None
         if len(outbox):
@@ -631,6 +865,41 @@ def test_send_invite(client, app, token_payload, payload, exp_status, exp_resp,
             assert (exp_link in msg.html)
 
 
+def test_mail_worker(app, runner, smtp_sink):
+    with app.app_context():
+        user = db.session.get(User, 103)
+        for _ in range(3):
+            email.send_forgot_password(app, user)
+        bounced = email.enqueue(Message(
+            "Bounce", recipients=['bounce@example.com'], body="Bounce"))
+
+        result = runner.invoke(args=['auth', 'mail-worker', '--once', '--batch-size', '2', '--max-attempts', '2'])
+        assert (result.exit_code, result.stdout) == (0, 'Sent 3 email(s), 0 failed permanently\n')
+        assert smtp_sink.connections == 1, "all batches should share a single connection"
+        assert len(smtp_sink.messages) == 3
+        assert all('Subject: Password Reset for Reach Talent System' in msg
+                   for msg in smtp_sink.messages)
+
+        bounced = db.session.get(EmailOutbox, bounced.id)
+        assert (bounced.state, bounced.attempts) == (EmailOutbox.PENDING, 1)
+        assert '550' in bounced.last_error
+
+        bounced.next_attempt_date = datetime.utcnow()
+        db.session.commit()
+        result = runner.invoke(args=['auth', 'mail-worker', '--once', '--max-attempts', '2'])
+        assert result.stdout == 'Sent 0 email(s), 1 failed permanently\n'
+        bounced = db.session.get(EmailOutbox, bounced.id)
+        assert (bounced.state, bounced.attempts) == (EmailOutbox.FAILED, 2)
+
+
+def test_mail_worker_idle(app, runner, smtp_sink):
+    with app.app_context():
+        assert email.deliver_outbox() == (0, 0)
+        result = runner.invoke(args=['auth', 'mail-worker', '--once'])
+    assert (result.exit_code, result.output) == (0, '')
+    assert smtp_sink.connections == 0, "an empty outbox should not connect to the relay"
+
+
 @dataclass
 class AssertLoginParams:
     email: str
@@ -1,16 +1,25 @@
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import json
+import re
+from unittest.mock import patch
 
 import pytest
+import sqlalchemy as sa
 from sqlalchemy import select
 from sqlalchemy.sql import func
 
+from reachtalent import instrumentation, metrics
 from reachtalent.core import schema
+from reachtalent.core.loading import eager_load_options
+from reachtalent.core.serializers import serializer
 from reachtalent.core.models import (
-    Department, Position, PurchaseOrder,
-    Requisition, Schedule, WorkerEnvironment, Location, States
+    Assignment, AssignmentState, CacheVersion, CategoryItem, ClientUser, Contract, ContractTerm,
+    ContractTermDefinition, CostCenter, Department, JobClassification, Position, PurchaseOrder,
+    Requisition, Schedule, WorkerEnvironment, Location, States, CONTRACT_TERMS_VERSION
 )
+from reachtalent.core.response_cache import REFERENCE_DATA_VERSION, get_reference_data_cache
 from reachtalent.extensions import db
 from .conftest import params, set_auth_token
 
@@ -477,6 +486,22 @@ def test_department_create(
         assert (last_id, last_created_date) == (new_last_id, new_last_created_date)
 
 
+def test_department_uniqueness_probes(app, client, assert_max_queries):
+    set_auth_token(app, client, {'sub': 102})
+    client.get('/api/departments')  # warm the auth state cache
+    with assert_max_queries() as statements:
+        response = client.post('/api/departments', json={'number': '1000', 'name': 'Example'})
+
+    assert response.json['errors'] == {
+        'name': ['Department name must be unique.'],
+        'number': ['Department number must be unique.'],
+    }
+    # both checks are a single lookup of the submitted values
+    [(statement, parameters)] = statements
+    assert statement.count('EXISTS') == 2
+    assert 'Example' in parameters and '1000' in parameters
+
+
 @pytest.mark.parametrize(*params({
     'RTI Admin can list departments': ListTC(
         token_payload={'sub': 101},
@@ -994,6 +1019,68 @@ def test_staff_list(
     assert (response.status_code, response.json) == (exp_status, exp_resp)
 
 
+def test_staff_keyset_pages_match_page_order(app, client):
+    with app.app_context():
+        # the newest staff member is the user with the lowest id
+        staff = ClientUser(client_id=2, user_id=1, role_id=db.session.get(ClientUser, 5).role_id)
+        db.session.add(staff)
+        db.session.commit()
+        staff_id = staff.id
+
+    try:
+        set_auth_token(app, client, {'sub': 102})
+        items = client.get('/api/staff', query_string={'page_size': 100}).json['items']
+        assert items[-1]['id'] == staff_id
+
+        keyset_items, query_string = [], {'after_id': 0, 'page_size': 2}
+        while True:
+            page = client.get('/api/staff', query_string=query_string).json
+            keyset_items += page['items']
+            if 'next_cursor' not in page['pagination']:
+                break
+            query_string = {'cursor': page['pagination']['next_cursor'], 'page_size': 2}
+        assert keyset_items == items
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(ClientUser, staff_id))
+            db.session.commit()
+
+
+def test_staff_list_eager_loads(app, client, assert_max_queries):
+    set_auth_token(app, client, {'sub': 102})
+    client.get('/api/staff')  # warm the auth state cache
+    # one page query plus one count, users and roles are joined in
+    with assert_max_queries(2):
+        response = client.get('/api/staff')
+
+    assert response.json['items'] == list_staff_items()
+
+
+def test_eager_load_plan():
+    plan = {
+        '.'.join(attr.key for attr in link.path): dict(link.strategy)['lazy']
+        for opt in eager_load_options(schema.Requisition, Requisition)
+        for link in opt._to_bind
+    }
+    assert {
+        'position': 'joined',
+        'position.departments': 'selectin',
+        'position.worker_environment': 'joined',
+        'position.job_classification': 'joined',
+        'department': 'joined',
+        'location': 'joined',
+        'supervisor': 'joined',
+        'schedule': 'joined',
+        'presented_workers': 'selectin',
+        'presented_workers.user': 'joined',
+        'assignments': 'selectin',
+        'assignments.worker.user': 'joined',
+        'assignments.cost_center': 'joined',
+        'assignments.department': 'joined',
+    }.items() <= plan.items()
+    assert 'approvals' not in plan, "JSON columns are not relationships"
+
+
 @pytest.mark.parametrize(*params({
     'RTI Admin can query contract_terms': ListTC(
         token_payload={'sub': 101},
@@ -1030,6 +1117,81 @@ def test_query_contract_terms(
     assert (response.status_code, response.json) == (exp_status, exp_resp)
 
 
+def test_cache_version_bump(app, assert_max_queries):
+    with app.app_context():
+        assert CacheVersion.current('test_bump') == 0
+        # the first bump inserts the row in the same single upsert
+        with assert_max_queries(1):
+            CacheVersion.bump('test_bump')
+        CacheVersion.bump('test_bump')
+        db.session.commit()
+        assert CacheVersion.current('test_bump') == 2
+
+        db.session.execute(sa.delete(CacheVersion).filter_by(name='test_bump'))
+        db.session.commit()
+
+
+def test_contract_term_index(app, assert_max_queries):
+    with app.app_context():
+        Contract.query_contract_terms(2)
+        with assert_max_queries(0):
+            assert Contract.query_contract_terms(2, term_prefix='markup_jobclass_it_') == {
+                'markup_jobclass_it_pct': Decimal('0.05')}
+            assert Contract.query_contract_terms(2, effective_date=date(2020, 1, 1)) == {}
+
+        version = CacheVersion.current(CONTRACT_TERMS_VERSION)
+        next_month = date.today() + timedelta(days=30)
+        contract = Contract(client_id=2, effective_start_date=next_month)
+        db.session.add(contract)
+        db.session.add(ContractTerm(
+            contract=contract, val_numeric=Decimal('0.10'),
+            contract_term_definition=db.session.execute(
+                select(ContractTermDefinition).filter_by(ref='markup_jobclass_it_pct')).scalar_one()))
+        # uncommitted changes are visible to the session making them
+        assert Contract.query_contract_terms(2, next_month, 'markup_jobclass_it_') == {
+            'markup_jobclass_it_pct': Decimal('0.10')}
+        db.session.commit()
+        assert CacheVersion.current(CONTRACT_TERMS_VERSION) == version + 1
+        assert Contract.query_contract_terms(2, next_month, 'markup_jobclass_it_') == {
+            'markup_jobclass_it_pct': Decimal('0.10')}
+        assert Contract.query_contract_terms(2, term_prefix='markup_jobclass_it_') == {
+            'markup_jobclass_it_pct': Decimal('0.05')}
+
+        db.session.execute(sa.delete(ContractTerm).filter_by(contract_id=contract.id))
+        db.session.delete(contract)
+        db.session.commit()
+        assert Contract.query_contract_terms(2, next_month, 'markup_jobclass_it_') == {
+            'markup_jobclass_it_pct': Decimal('0.05')}
+
+
+def test_bill_rate_sees_other_workers_contract_changes(app):
+    with app.app_context():
+        position = Position(client_id=2, job_classification=JobClassification.query.filter_by(
+            contract_term_prefix='markup_jobclass_it_').one())
+        term_id = db.session.execute(
+            select(ContractTerm.id).join(Contract).join(ContractTermDefinition)
+            .filter(Contract.client_id == 2, ContractTermDefinition.ref == 'markup_jobclass_it_pct')
+        ).scalar_one()
+        assert position.calculate_bill_rate(Decimal('20.00')) == Decimal('21.00')
+
+        def commit_elsewhere(val: Decimal):
+            # bypasses this process' session listeners, as another worker would
+            with db.engine.begin() as connection:
+                connection.execute(sa.update(ContractTerm).filter_by(id=term_id).values(val_numeric=val))
+                connection.execute(sa.update(CacheVersion).filter_by(name=CONTRACT_TERMS_VERSION)
+                                   .values(version=CacheVersion.version + 1))
+
+        commit_elsewhere(Decimal('0.10'))
+        try:
+            # still within the poll interval
+            assert Contract.query_contract_terms(2, term_prefix='markup_jobclass_it_') == {
+                'markup_jobclass_it_pct': Decimal('0.05')}
+            assert position.calculate_bill_rate(Decimal('20.00')) == Decimal('22.00')
+        finally:
+            commit_elsewhere(Decimal('0.05'))
+        assert position.calculate_bill_rate(Decimal('20.00')) == Decimal('21.00')
+
+
 def list_job_class_items():
     return [
         {
@@ -1629,6 +1791,56 @@ def list_pay_scheme_items():
             'items': list_pay_scheme_items(),
         },
     ),
+    'keyset pagination returns a next_cursor': ListTC(
+        token_payload={'sub': 103},
+        query_string={'after_id': 0, 'page_size': 2},
+        exp_resp={
+            'pagination': {'page_size': 2, 'next_cursor': 'Mg'},
+            'items': list_pay_scheme_items()[:2],
+        },
+    ),
+    'keyset pagination resumes from cursor': ListTC(
+        token_payload={'sub': 103},
+        query_string={'cursor': 'Mg', 'page_size': 2},
+        exp_resp={
+            'pagination': {'page_size': 2},
+            'items': list_pay_scheme_items()[2:],
+        },
+    ),
+    'keyset pagination can include the total': ListTC(
+        token_payload={'sub': 103},
+        query_string={'after_id': 0, 'page_size': 2, 'include_total': 'true'},
+        exp_resp={
+            'pagination': {'total_pages': 2, 'page_size': 2, 'next_cursor': 'Mg'},
+            'items': list_pay_scheme_items()[:2],
+        },
+    ),
+    'page size is capped': ListTC(
+        token_payload={'sub': 103},
+        query_string={'page_size': 1000},
+        exp_resp={
+            'pagination': {'page': 1, 'total_pages': 1, 'page_size': 100},
+            'items': list_pay_scheme_items(),
+        },
+    ),
+    'page pagination can skip the total': ListTC(
+        token_payload={'sub': 103},
+        query_string={'include_total': 'false'},
+        exp_resp={
+            'pagination': {'page': 1, 'page_size': 25},
+            'items': list_pay_scheme_items(),
+        },
+    ),
+    'invalid cursor is rejected': ListTC(
+        token_payload={'sub': 103},
+        query_string={'cursor': '!!'},
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'cursor': ['Invalid cursor.']},
+        },
+    ),
     'Default cannot list pay_schemes': ListTC(
         token_payload={'sub': 1},
         exp_status=403,
@@ -1649,6 +1861,63 @@ def test_pay_scheme_list(
     assert (response.status_code, response.json) == (exp_status, exp_resp)
 
 
+def test_reference_data_cache(app, client, monkeypatch, assert_max_queries):
+    cache = get_reference_data_cache(app)
+    monkeypatch.setattr(cache, 'poll_interval', 0)
+    set_auth_token(app, client, {'sub': 101})
+
+    first = client.get('/api/pay_schemes', query_string={'page_size': 2})
+    etag = first.get_etag()[0]
+    # only the version stamp is checked
+    with assert_max_queries(1):
+        response = client.get('/api/pay_schemes', query_string={'page_size': 2})
+    assert (response.status_code, response.data, response.get_etag()) == (200, first.data, (etag, True))
+
+    response = client.get(
+        '/api/pay_schemes', query_string={'page_size': 2}, headers={'If-None-Match': f'W/"{etag}"'})
+    assert (response.status_code, response.data) == (304, b'')
+
+    # other params are cached separately
+    response = client.get('/api/pay_schemes', query_string={'page_size': 3})
+    assert len(response.json['items']) == 3
+
+    with app.app_context():
+        CacheVersion.bump(REFERENCE_DATA_VERSION)
+        db.session.commit()
+    with assert_max_queries() as statements:
+        response = client.get('/api/pay_schemes', query_string={'page_size': 2})
+    assert (response.status_code, response.data) == (200, first.data)
+    assert len(statements) > 1, statements
+
+
+def test_reference_data_cache_client_versions(app, client, monkeypatch):
+    monkeypatch.setattr(get_reference_data_cache(app), 'poll_interval', 0)
+    set_auth_token(app, client, {'sub': 101})
+    query_string = {'client_id': 2}
+    assert len(client.get('/api/job_classifications', query_string=query_string).json['items']) == 2
+
+    def set_end_dates(end_dates: dict):
+        with app.app_context():
+            for contract_id, end_date in end_dates.items():
+                db.session.get(Contract, contract_id).effective_end_date = end_date
+            db.session.commit()
+
+    with app.app_context():
+        reference_data_version = CacheVersion.current(REFERENCE_DATA_VERSION)
+        end_dates = {contract.id: contract.effective_end_date for contract in Contract.query.filter_by(client_id=2)}
+
+    set_end_dates(dict.fromkeys(end_dates, date(2000, 1, 1)))
+    try:
+        response = client.get('/api/job_classifications', query_string=query_string)
+        assert (response.status_code, response.json['items']) == (200, [])
+        with app.app_context():
+            assert CacheVersion.current(REFERENCE_DATA_VERSION) == reference_data_version, \
+                "contract changes only bump the contract terms version"
+    finally:
+        set_end_dates(end_dates)
+    assert len(client.get('/api/job_classifications', query_string=query_string).json['items']) == 2
+
+
 @pytest.mark.parametrize(*params({
     'unauthorized should be rejected': CreateTC(
         exp_status=401,
@@ -3101,6 +3370,32 @@ def test_requisition_create(client, app, token_payload, payload, exp_status, exp
     assert (response.status_code, response.json) == (exp_status, exp_resp)
 
 
+def test_requisition_relationships_validated_in_one_query(app, client, assert_max_queries):
+    set_auth_token(app, client, {'sub': 102})
+    client.get('/api/requisitions')  # warm the auth state cache
+    with assert_max_queries(1):
+        response = client.post('/api/requisitions', json={
+            'purchase_order_id': 2,
+            'position_id': 3,
+            'department_id': 2,
+            'location_id': 3,
+            'requisition_type_id': 4,
+            'pay_scheme_id': 9999,
+            'schedule_id': 1,
+            'num_assignments': 1,
+            'pay_rate': 18.50,
+            'start_date': '2023-12-01',
+            'estimated_end_date': '2023-12-31',
+        })
+
+    assert (response.status_code, response.json['errors']) == (400, {
+        'purchase_order_id': ['Invalid purchase_order_id.'],
+        'position_id': ['Invalid position_id.'],
+        'location_id': ['Invalid location_id.'],
+        'pay_scheme_id': ['Invalid pay_scheme_id.'],
+    })
+
+
 @pytest.mark.parametrize(*params({
     'RTI Admin can list requisitions': ListTC(
         token_payload={'sub': 101},
@@ -3211,6 +3506,53 @@ def test_requisition_detail(client, app, token_payload, id, exp_status, exp_resp
     assert (response.status_code, response.json) == (exp_status, exp_resp)
 
 
+def test_conditional_get(app, client):
+    set_auth_token(app, client, {'sub': 101})
+    with app.app_context():
+        assignment = db.session.execute(
+            select(Assignment).join(Requisition).filter(Requisition.state != States.DELETED)
+            .order_by(Assignment.id).limit(1)
+        ).scalar_one()
+        assignment_id, pay_rate = assignment.id, assignment.pay_rate
+        requisition_id, client_id = assignment.requisition.id, assignment.requisition.client_id
+
+    def set_pay_rate(value):
+        # a nested row, within the same second as the requisition's own writes
+        with app.app_context():
+            db.session.execute(sa.update(Assignment).where(Assignment.id == assignment_id).values(pay_rate=value))
+            db.session.commit()
+
+    requests = {
+        'list': ('/api/requisitions', {'client_id': client_id}),
+        'detail': (f'/api/requisitions/{requisition_id}', {}),
+    }
+    etags = {}
+    for name, (url, query_string) in requests.items():
+        response = client.get(url, query_string=query_string)
+        etag, weak = response.get_etag()
+        etags[name] = etag
+        assert (response.status_code, weak) == (200, True)
+
+        response = client.get(url, query_string=query_string, headers={'If-None-Match': f'W/"{etag}"'})
+        assert (response.status_code, response.data, response.get_etag()) == (304, b'', (etag, True))
+
+    # the list tag is specific to the page requested
+    response = client.get(
+        '/api/requisitions', query_string={'client_id': client_id, 'page_size': 1},
+        headers={'If-None-Match': f'W/"{etags["list"]}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etags['list']
+
+    set_pay_rate(Decimal('99.99'))
+    try:
+        for name, (url, query_string) in requests.items():
+            response = client.get(url, query_string=query_string, headers={'If-None-Match': f'W/"{etags[name]}"'})
+            assert response.status_code == 200, name
+            assert response.get_etag()[0] != etags[name]
+    finally:
+        set_pay_rate(pay_rate)
+
+
 @pytest.mark.parametrize(*params({
     'default role may not update requisitions': UpdateTC(
         token_payload={},  # empty dict means use default
@@ -4768,3 +5110,392 @@ def test_worker_detail(client, app, token_payload, id, exp_status, exp_resp):
     set_auth_token(app, client, token_payload)
     response = client.get(f'/api/workers/{id}')
     assert (response.status_code, response.json) == (exp_status, exp_resp)
+
+
+@pytest.mark.parametrize('schema_cls,model', [
+    (schema.Requisition, Requisition),
+    (schema.Assignment, Assignment),
+    (schema.Position, Position),
+    (schema.PurchaseOrder, PurchaseOrder),
+    (schema.Staff, ClientUser),
+])
+def test_compiled_serializer_matches_marshmallow(app, schema_cls, model):
+    with app.app_context():
+        objs = db.session.scalars(select(model)).all()
+        objs.append(model())  # unset attributes and relationships
+        for obj in objs:
+            assert serializer(schema_cls).dumps(obj) == schema_cls().dumps(obj)
+
+        page = {'pagination': {'page': 1, 'page_size': 25, 'next_cursor': 7}, 'items': objs}
+        list_schema_cls = {
+            schema.Requisition: schema.ListRequisitionResponse,
+            schema.Assignment: schema.ListAssignmentResponse,
+            schema.Position: schema.ListPositionResponse,
+            schema.PurchaseOrder: schema.ListPurchaseOrderResponse,
+            schema.Staff: schema.ListStaffResponse,
+        }[schema_cls]
+        assert serializer(list_schema_cls).dumps(page) == list_schema_cls().dumps(page)
+
+
+def test_compiled_serializer_edge_values():
+    position = Position(
+        id=1, pay_rate_min=Decimal('2.675'), pay_rate_max=Decimal('-0.005'),
+        requirements=['a', None], departments=[])
+    assignment = Assignment(
+        id=1, status=None, bill_rate=Decimal('30.125'), tentative_start_date=date(2023, 1, 1),
+        timesheets_worker_editable=1, end_reason=CategoryItem(id=1, key='quit', label='Quit'))
+    for schema_cls, obj in [
+        (schema.Position, position),
+        (schema.Assignment, assignment),
+        (schema.Assignment, {'id': '3', 'status': AssignmentState.ENDED, 'worker': None}),
+    ]:
+        assert serializer(schema_cls).dumps(obj) == schema_cls().dumps(obj)
+
+
+@dataclass
+class BulkCreateTC:
+    url: str
+    token_payload: dict
+    payload: list
+    exp_status: int = 200
+    exp_resp: dict = None
+
+
+@pytest.mark.parametrize(*params({
+    'Client Admin can bulk create locations': BulkCreateTC(
+        url='/api/locations/bulk',
+        token_payload={'sub': 102},
+        payload=[
+            {'name': f'Bulk Location {n}', 'description': 'Satellite office', 'street': f'{n} Main St',
+             'city': 'Monterey', 'state': 'CA', 'zip': '93940', 'country': 'US'}
+            for n in (2, 1, 3)
+        ],
+        exp_resp={'items': [
+            {'client_id': 2, 'name': f'Bulk Location {n}', 'description': 'Satellite office',
+             'street': f'{n} Main St', 'city': 'Monterey', 'state': 'CA', 'zip': '93940', 'country': 'US'}
+            for n in (2, 1, 3)
+        ]},
+    ),
+    'RTI Admin can bulk create departments for several clients': BulkCreateTC(
+        url='/api/departments/bulk',
+        token_payload={'sub': 101},
+        payload=[
+            {'client_id': 1, 'name': 'Bulk Department', 'number': 'B-1'},
+            {'client_id': 2, 'name': 'Bulk Department'},
+        ],
+        exp_resp={'items': [
+            {'client_id': 1, 'name': 'Bulk Department', 'number': 'B-1'},
+            {'client_id': 2, 'name': 'Bulk Department', 'number': None},
+        ]},
+    ),
+    'errors are reported by index': BulkCreateTC(
+        url='/api/departments/bulk',
+        token_payload={'sub': 101},
+        payload=[
+            {'client_id': 1, 'name': 'Bulk Department'},
+            {'name': 'Bulk Department'},
+            {'client_id': 1, 'name': 'Default'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {
+                '1': {'client_id': ['Missing data for required field.']},
+                '2': {'name': ['Department name must be unique.']},
+            },
+        },
+    ),
+    'client ids must exist': BulkCreateTC(
+        url='/api/departments/bulk',
+        token_payload={'sub': 101},
+        payload=[
+            {'client_id': 1, 'name': 'Bulk Department'},
+            {'client_id': 999, 'name': 'Bulk Department'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'1': {'client_id': ['Invalid client.']}},
+        },
+    ),
+    'client_id errors are reported by index': BulkCreateTC(
+        url='/api/departments/bulk',
+        token_payload={'sub': 101},
+        payload=[
+            {'client_id': 1, 'name': 'Bulk Department'},
+            {'name': 'Bulk Department'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'1': {'client_id': ['Missing data for required field.']}},
+        },
+    ),
+    'names must be unique within the batch': BulkCreateTC(
+        url='/api/cost_centers/bulk',
+        token_payload={'sub': 102},
+        payload=[
+            {'name': 'Bulk Cost Center'},
+            {'name': 'Other Cost Center'},
+            {'name': 'Bulk Cost Center'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'2': {'name': ['CostCenter name must be unique.']}},
+        },
+    ),
+    'names must not exist already': BulkCreateTC(
+        url='/api/worker_environments/bulk',
+        token_payload={'sub': 102},
+        payload=[
+            {'name': 'Bulk Environment', 'description': 'New'},
+            {'name': 'Hazardous Material', 'description': 'Taken'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'1': {'name': ['Worker Environment name must be unique.']}},
+        },
+    ),
+    'batch must not be empty': BulkCreateTC(
+        url='/api/schedules/bulk',
+        token_payload={'sub': 102},
+        payload=[],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {'_schema': ['Expected between 1 and 500 items.']},
+        },
+    ),
+    'default role cannot bulk create schedules': BulkCreateTC(
+        url='/api/schedules/bulk',
+        token_payload={'sub': 1},
+        payload=[{'name': 'Bulk Schedule', 'description': 'Nights'}],
+        exp_status=403,
+        exp_resp={
+            'code': 403,
+            'name': 'Forbidden',
+            'description': 'Permission required.',
+        },
+    ),
+}))
+def test_bulk_create(app, client, url, token_payload, payload, exp_status, exp_resp):
+    model = {
+        '/api/departments/bulk': Department,
+        '/api/cost_centers/bulk': CostCenter,
+        '/api/locations/bulk': Location,
+        '/api/schedules/bulk': Schedule,
+        '/api/worker_environments/bulk': WorkerEnvironment,
+    }[url]
+    with app.app_context():
+        before = db.session.scalar(select(func.count()).select_from(model))
+
+    set_auth_token(app, client, token_payload)
+    response = client.post(url, json=payload)
+    resp = response.json
+    ids = [item.pop('id') for item in resp.get('items', [])]
+    assert (response.status_code, resp) == (exp_status, exp_resp)
+
+    with app.app_context():
+        created = db.session.scalars(select(model).where(model.id.in_(ids)).order_by(model.id)).all()
+        assert db.session.scalar(select(func.count()).select_from(model)) == before + len(ids)
+        # rows are inserted in request order
+        assert [obj.id for obj in created] == ids
+        assert all(obj.created_uid == token_payload['sub'] for obj in created)
+
+        # Clean up
+        for obj in created:
+            db.session.delete(obj)
+        db.session.commit()
+
+
+def test_bulk_create_validates_per_batch(app, client, assert_max_queries):
+    set_auth_token(app, client, {'sub': 101})
+    payload = [{'client_id': 2, 'name': f'Batch Department {n}', 'number': f'BD-{n}'} for n in range(50)]
+    # client ids, two unique constraints, the insert and reading the rows back
+    with assert_max_queries(10):
+        response = client.post('/api/departments/bulk', json=payload)
+    assert response.status_code == 200
+
+    with app.app_context():
+        for department in Department.query.filter(Department.name.startswith('Batch Department ')):
+            db.session.delete(department)
+        db.session.commit()
+
+
+@pytest.mark.parametrize(*params({
+    'client admin can quote bill rates in request order': CreateTC(
+        token_payload={'sub': 102},
+        payload=[
+            {'position_id': 2, 'pay_rate': '18.50'},
+            {'position_id': 1, 'pay_rate': '18.50', 'effective_date': '2020-01-01'},
+            {'position_id': 1, 'pay_rate': '10.10'},
+        ],
+        exp_resp={'items': [
+            # 18.50 * 1.05 = 19.425
+            {'position_id': 2, 'pay_rate': 18.5, 'effective_date': date.today().isoformat(), 'bill_rate': 19.43},
+            {'position_id': 1, 'pay_rate': 18.5, 'effective_date': '2020-01-01', 'bill_rate': 18.5},
+            {'position_id': 1, 'pay_rate': 10.1, 'effective_date': date.today().isoformat(), 'bill_rate': 10.61},
+        ]},
+    ),
+    'positions of other clients cannot be quoted': CreateTC(
+        token_payload={'sub': 107},
+        payload=[
+            {'position_id': 1, 'pay_rate': '18.50'},
+            {'position_id': 999, 'pay_rate': '18.50'},
+        ],
+        exp_status=400,
+        exp_resp={
+            'code': 400,
+            'name': 'Bad Request',
+            'errors': {
+                '0': {'position_id': ['Invalid position.']},
+                '1': {'position_id': ['Invalid position.']},
+            },
+        },
+    ),
+    'default role cannot quote bill rates': CreateTC(
+        token_payload={'sub': 1},
+        payload=[{'position_id': 1, 'pay_rate': '18.50'}],
+        exp_status=403,
+        exp_resp={
+            'code': 403,
+            'name': 'Forbidden',
+            'description': 'Permission required.',
+        },
+    ),
+}))
+def test_quote_bill_rates(app, client, token_payload, payload, exp_status, exp_resp):
+    set_auth_token(app, client, token_payload)
+    response = client.post('/api/bill_rates/quote', json=payload)
+    assert (response.status_code, response.json) == (exp_status, exp_resp)
+
+
+@pytest.mark.parametrize('url, query_string, max_queries', [
+    # reference data and contract terms are served from process caches
+    ('/api/categories', {}, 0),
+    ('/api/category_items', {}, 0),
+    ('/api/contract_terms', {'client_id': 2}, 0),
+    # plus the contract terms version the client's list depends on
+    ('/api/job_classifications', {'client_id': 2}, 1),
+    ('/api/pay_schemes', {}, 0),
+    ('/api/requisition_types', {}, 0),
+    ('/api/available_workers', {'client_id': 2}, 2),
+    ('/api/cost_centers', {'client_id': 2}, 2),
+    ('/api/departments', {'client_id': 2}, 2),
+    ('/api/locations', {'client_id': 2}, 2),
+    ('/api/schedules', {'client_id': 2}, 2),
+    ('/api/staff', {'client_id': 2}, 2),
+    ('/api/worker_environments', {'client_id': 2}, 2),
+    ('/api/positions', {'client_id': 2}, 3),
+    ('/api/purchase_orders', {'client_id': 2}, 3),
+    ('/api/requisitions', {'client_id': 2}, 6),
+    ('/api/assignments', {'client_id': 2}, 2),
+    ('/api/workers/1', {}, 1),
+    ('/api/requisitions/5', {}, 6),
+    ('/api/assignments/4', {}, 2),
+])
+def test_view_query_counts(app, client, assert_max_queries, url, query_string, max_queries):
+    set_auth_token(app, client, {'sub': 101})
+    # Warm up the process caches
+    assert client.get(url, query_string=query_string).status_code == 200
+
+    with assert_max_queries(max_queries) as statements:
+        response = client.get(url, query_string=query_string)
+    assert response.status_code == 200
+    assert f'desc="{len(statements)} queries"' in response.headers['Server-Timing']
+
+
+def test_query_budget_logged(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'QUERY_BUDGET', 1)
+    set_auth_token(app, client, {'sub': 101})
+    with patch.object(instrumentation.logger, 'warning') as warning:
+        client.get('/api/workers/1')
+        warning.assert_not_called()
+        client.get('/api/requisitions/5')
+    warning.assert_called_once()
+    assert warning.call_args.args[0].startswith(
+        'Query budget exceeded: GET core.get_requisition ran 5 queries (budget 1)')
+
+
+def test_request_profiler(app, client, runner, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'PROFILE_KEEP', 2)
+
+    response = client.get('/api/requisitions', headers={'X-Profile': '1'})
+    assert response.status_code == 401
+    assert 'X-Profile' not in response.headers, "anonymous requests are never profiled"
+
+    set_auth_token(app, client, {'sub': 102})
+    response = client.get('/api/requisitions', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert 'X-Profile' not in response.headers, "only admins may profile requests"
+    assert list(tmp_path.iterdir()) == []
+
+    set_auth_token(app, client, {'sub': 101})
+    names = [
+        client.get('/api/requisitions', query_string={'client_id': 2}, headers={'X-Profile': '1'}).headers['X-Profile']
+        for _ in range(3)
+    ]
+    assert re.fullmatch(r'\d+-core\.list_requisition-c1-q\d+\.prof', names[0])
+    # the oldest profile was rotated out
+    assert sorted(path.name for path in tmp_path.iterdir()) == names[1:]
+
+    with app.app_context():
+        result = runner.invoke(args=['core', 'profiles', '--endpoint', 'core.list_requisition', '-n', '5'])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith(f'2 profile(s) in {tmp_path}\n  core.list_requisition: 2 request(s), ')
+    assert 'function calls' in result.output
+
+    with app.app_context():
+        result = runner.invoke(args=['core', 'profiles', '--endpoint', 'core.get_requisition'])
+    assert (result.exit_code, result.output) == (1, f'Error: No profiles found in {tmp_path}\n')
+
+
+def test_metrics(app, client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+    # values left by another worker, the gauge is dropped once it has exited
+    other_worker = metrics.MmapedValues(tmp_path / '999999999.db')
+    other_worker.inc(metrics._key('reachtalent_requests_total', endpoint='core.list_requisition',
+                                  method='GET', status=200), 3)
+    other_worker.set(metrics._key('reachtalent_db_pool_checked_out'), 5)
+    other_worker.close()
+
+    set_auth_token(app, client, {'sub': 102})
+    assert client.get('/api/requisitions').status_code == 200
+    assert client.get('/api/requisitions/99999').status_code == 404
+
+    # disabled without a token
+    assert client.get('/api/metrics').status_code == 404
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    lines = response.text.splitlines()
+    assert '# TYPE reachtalent_request_duration_seconds histogram' in lines
+    assert ('reachtalent_request_duration_seconds_bucket'
+            '{endpoint="core.list_requisition",le="+Inf",method="GET"} 1') in lines
+    assert 'reachtalent_request_duration_seconds_count{endpoint="core.list_requisition",method="GET"} 1' in lines
+    assert 'reachtalent_requests_total{endpoint="core.list_requisition",method="GET",status="200"} 4' in lines
+    assert 'reachtalent_requests_total{endpoint="core.get_requisition",method="GET",status="404"} 1' in lines
+    assert '# TYPE reachtalent_db_pool_checked_out gauge' in lines
+    assert 'reachtalent_db_pool_checked_out 5' not in lines
+    assert any(line.startswith('reachtalent_cache_hits_total{cache="auth_state"} ') for line in lines)
+    assert any(line.startswith('reachtalent_cache_hit_ratio{cache="auth_state"} ') for line in lines)
+
+    # the exited worker's counters were merged and its file removed
+    assert not (tmp_path / '999999999.db').exists()
+    assert (tmp_path / metrics.MERGED_FILE).exists()
+    response = client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert 'reachtalent_requests_total{endpoint="core.list_requisition",method="GET",status="200"} 4' in \
+        response.text.splitlines()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
 import json
 from pathlib import Path
 import typing
@@ -7,15 +7,20 @@ import urllib.parse
 from unittest.mock import MagicMock
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 from googleapiclient.errors import HttpError
 
+from benchmarks.loadtest import gunicorn_server
 from .conftest import params
 from reachtalent import database
 from reachtalent.extensions import db
 from reachtalent.core.commands import (update_data, sync_client, odoo_push)
 from reachtalent.auth import models as auth_models
-from reachtalent.core.models import CategoryItem, ImportLog, ImportSource, Worker
+from reachtalent.core.availability import check_client_workers
+from reachtalent.core.models import (
+    ApprovalState, Assignment, AssignmentState, CategoryItem, ClientWorker, Contract, ImportLog, ImportSource, Position,
+    Requisition, Worker,
+)
 
 
 @dataclass
@@ -686,4 +691,168 @@ def test_odoo_push_cmd_updates(
         result = runner.invoke(args=args)
         assert (result.exit_code,
                 result.stderr_bytes,
-                result.stdout) == (exp_exit_code, exp_stderr, exp_stdout)
\ No newline at end of file
+                result.stdout) == (exp_exit_code, exp_stderr, exp_stdout)
+
+def test_client_workers_cmd(app, runner):
+    with app.app_context():
+        # kept up to date by every flush of the suite so far
+        assert check_client_workers(db.session.connection()) == (set(), set())
+        client_id, worker_id = db.session.execute(
+            select(ClientWorker.client_id, ClientWorker.worker_id).limit(1)).one()
+        db.session.execute(delete(ClientWorker).filter_by(client_id=client_id, worker_id=worker_id))
+        db.session.commit()
+
+        result = runner.invoke(args=['core', 'client-workers', 'check'])
+        assert result.exit_code == 1
+        assert f'missing client_id={client_id} worker_id={worker_id}\n' in result.output
+        assert 'client_worker is inconsistent: 1 missing, 0 extra' in result.output
+
+        result = runner.invoke(args=['core', 'client-workers', 'rebuild', '--dry-run'])
+        assert result.exit_code == 0
+        assert runner.invoke(args=['core', 'client-workers', 'check']).exit_code == 1
+
+        result = runner.invoke(args=['core', 'client-workers', 'rebuild'])
+        assert result.exit_code == 0
+        assert result.stdout.startswith('Rebuilt client_worker: ')
+
+        result = runner.invoke(args=['core', 'client-workers', 'check'])
+        assert (result.exit_code, result.stdout) == (0, 'client_worker is consistent\n')
+
+
+def test_bulk_client_worker_refresh(app):
+    with app.app_context():
+        connection = db.session.connection()
+        assignment = db.session.execute(
+            select(Assignment).join(Requisition).filter(Assignment.worker_id.is_not(None))
+            .order_by(Assignment.id).limit(1)).scalar_one()
+        client_id = assignment.requisition.client_id
+        db.session.execute(delete(ClientWorker).filter_by(client_id=client_id, worker_id=assignment.worker_id))
+        missing = {(client_id, assignment.worker_id)}
+        try:
+            # columns that can't change the pairs leave client_worker alone
+            db.session.execute(update(Assignment).filter_by(id=assignment.id).values(pay_rate=assignment.pay_rate))
+            db.session.query(Worker).filter_by(id=assignment.worker_id).update({'phone_number': '555-0100'})
+            assert check_client_workers(connection) == (missing, set())
+
+            # only the clients the statement matches are refreshed
+            db.session.execute(update(Assignment).filter_by(id=-1).values(worker_id=None))
+            assert check_client_workers(connection) == (missing, set())
+
+            db.session.query(Assignment).filter_by(id=assignment.id).update({'worker_id': assignment.worker_id})
+            assert check_client_workers(connection) == (set(), set())
+        finally:
+            db.session.rollback()
+
+
+def test_assignment_worker_cmd(app, runner):
+    with app.app_context():
+        requisition = db.session.get(Requisition, 5)
+        existing = [assignment.id for assignment in requisition.assignments]
+        approval_state = requisition.approval_state
+        requisition.approval_state = ApprovalState.APPROVED
+        requisition.num_assignments = len(existing) + 3
+        requisition.approve(defer_above=2)
+        db.session.commit()
+        assert requisition.open_assignments() == 3
+        assert db.session.scalars(Requisition.awaiting_assignments_query()).all() == [requisition]
+
+        result = runner.invoke(args=['core', 'assignment-worker', '--once'])
+        assert (result.exit_code, result.output) == (0, 'Created 3 assignment(s) for 1 requisition(s)\n')
+
+        db.session.expire_all()
+        created = [assignment for assignment in requisition.assignments if assignment.id not in existing]
+        assert len(created) == 3
+        assert {(a.status, a.bill_rate, a.department_id) for a in created} == {
+            (AssignmentState.OPEN, requisition.position.calculate_bill_rate(requisition.pay_rate),
+             requisition.department_id)}
+        assert db.session.scalars(Requisition.awaiting_assignments_query()).all() == []
+
+        # Clean up
+        db.session.execute(delete(Assignment).filter(Assignment.id.in_([a.id for a in created])))
+        requisition.num_assignments = len(existing)
+        requisition.approval_state = approval_state
+        db.session.commit()
+
+
+def test_bench_cmd(app, runner, tmp_path):
+    output = tmp_path / 'bench.json'
+    args = ['core', 'bench', '--scale', '3', '--repeat', '1', '--min-time', '0',
+            '-b', 'check_permission', '-b', 'query_contract_terms', '-b', 'dump_list_assignment']
+    with app.app_context():
+        result = runner.invoke(args=[*args, '--output', str(output)])
+    assert result.exit_code == 0, result.output
+    results = json.loads(output.read_text())['results']
+    assert [(row['benchmark'], row['scale'], row['number']) for row in results] == [
+        ('check_permission', 3, 1), ('query_contract_terms', 3, 1), ('dump_list_assignment', 3, 1)]
+
+    # a baseline infinitely faster than anything
+    for row in results:
+        row['median'] = 1e-12
+    output.write_text(json.dumps({'results': results}))
+    with app.app_context():
+        result = runner.invoke(args=[*args, '--compare', str(output)])
+    assert result.exit_code == 1
+    assert result.output.count('REGRESSION') == 3
+    assert result.output.endswith('Error: 3 benchmark(s) regressed by more than 20%\n')
+
+    with app.app_context():
+        result = runner.invoke(args=['core', 'bench', '-b', 'nope'])
+    assert result.exit_code == 2
+    assert 'Unknown benchmark(s): nope' in result.output
+
+
+def test_seed_cmd(reference_app, runner):
+    args = ['core', 'seed', '--clients', '2', '--workers-per-client', '4', '--positions-per-client', '3',
+            '--requisitions-per-client', '5', '--assignments-per-client', '12', '--batch-size', '7']
+    with reference_app.app_context():
+        result = runner.invoke(args=args)
+        assert result.exit_code == 0, result.output
+        assert 'requisition_present_worker: 30 rows\nassignment: 24 rows\n' in result.output
+        assert 'Seeded 2 client(s)' in result.output
+        assert runner.invoke(args=['core', 'client-workers', 'check']).exit_code == 0
+
+        requisitions = db.session.scalars(select(Requisition).order_by(Requisition.id)).all()
+        assert len(requisitions) == 10
+        first_run = [(r.position.title, r.pay_rate, r.num_assignments, sorted(w.id for w in r.presented_workers))
+                     for r in requisitions]
+        for requisition in requisitions:
+            terms = Contract._select_contract_terms(
+                requisition.client_id, date.today(), requisition.position.job_classification.contract_term_prefix)
+            assert {a.bill_rate for a in requisition.assignments} <= {
+                Position.apply_markup(requisition.pay_rate, terms)}
+
+        # The same seed generates the same rows after the existing ones
+        assert runner.invoke(args=args).exit_code == 0
+        requisitions = db.session.scalars(select(Requisition).order_by(Requisition.id).offset(10)).all()
+        offset = 2 * 4  # workers of the first run
+        assert [(r.position.title, r.pay_rate, r.num_assignments, sorted(w.id - offset for w in r.presented_workers))
+                for r in requisitions] == first_run
+
+
+def test_loadtest_cmd(reference_app, runner, tmp_path):
+    output = tmp_path / 'loadtest.json'
+    with reference_app.app_context():
+        result = runner.invoke(args=['core', 'loadtest'])
+        assert (result.exit_code, result.output) == (
+            1, 'Error: No client to load test with, run `flask core seed` first\n')
+
+        assert runner.invoke(args=['core', 'seed', '--workers-per-client', '20', '--positions-per-client', '5',
+                                   '--requisitions-per-client', '20', '--assignments-per-client', '30']).exit_code == 0
+        result = runner.invoke(args=['core', 'loadtest', '-w', '1', '--threads', '2', '-c', '2', '-d', '1',
+                                     '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    assert 'total' in result.output
+
+    results = json.loads(output.read_text())
+    assert results['server'] == {'workers': 1, 'threads': 2}
+    assert results['total']['requests'] > 0
+    assert results['total']['errors'] == 0, results['calls']
+    assert set(results['calls']) <= {
+        'list_requisitions', 'get_requisition', 'list_assignments', 'list_available_workers', 'list_positions',
+        'quote_bill_rates', 'create_requisition', 'approve_requisition'}
+
+
+def test_gunicorn_server_reports_startup_errors(reference_app):
+    with pytest.raises(RuntimeError, match="invalid int value: 'many'"):
+        with gunicorn_server(reference_app, workers='many', threads=1):
+            pass
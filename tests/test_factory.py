@@ -51,13 +51,17 @@ def strict_validate_openapi_spec(spec: dict):
         '/api/auth/session',
         '/api/auth/signup',
         '/api/available_workers',
+        '/api/bill_rates/quote',
         '/api/categories',
         '/api/category_items',
         '/api/contract_terms',
         '/api/cost_centers',
+        '/api/cost_centers/bulk',
         '/api/departments',
+        '/api/departments/bulk',
         '/api/job_classifications',
         '/api/locations',
+        '/api/locations/bulk',
         '/api/pay_schemes',
         '/api/positions',
         '/api/purchase_orders',
@@ -67,8 +71,10 @@ def strict_validate_openapi_spec(spec: dict):
         '/api/requisitions/{id}',
         '/api/requisitions/{id}/approval',
         '/api/schedules',
+        '/api/schedules/bulk',
         '/api/staff',
         '/api/worker_environments',
+        '/api/worker_environments/bulk',
         '/api/workers/{id}',
     ]
     assert spec['tags'] == [
@@ -0,0 +1,70 @@
+"""
+Query plan regressions: every statement run by a client scoped list view
+must be answered through an index. Plans come from `EXPLAIN QUERY PLAN` on
+SQLite and from `EXPLAIN` with sequential scans disabled on Postgres, so a
+full scan only shows up when no index applies.
+"""
+import re
+
+import pytest
+import sqlalchemy as sa
+
+from reachtalent.extensions import db
+from .conftest import set_auth_token
+
+CLIENT_LIST_URLS = [
+    '/api/assignments',
+    '/api/available_workers',
+    '/api/cost_centers',
+    '/api/departments',
+    '/api/locations',
+    '/api/positions',
+    '/api/purchase_orders',
+    '/api/requisitions',
+    '/api/schedules',
+    '/api/staff',
+    '/api/worker_environments',
+]
+
+# Scans of anonymous subqueries read rows already narrowed by an index, a
+# scan only counts as indexed through a named index. Automatic indexes are
+# built from a full scan on every execution.
+SQLITE_FULL_SCAN = re.compile(
+    r'^SCAN (?!anon_\d+\b|\(|CONSTANT ROW)(?!.*\bUSING (?:COVERING )?INDEX \w)'
+    r'|\bUSING AUTOMATIC\b')
+
+
+def full_scans(connection: sa.engine.Connection, statement: str, parameters) -> list[str]:
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).scalars()
+        return [line.strip() for line in plan if 'Seq Scan' in line]
+
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return [row.detail for row in plan if SQLITE_FULL_SCAN.search(row.detail)]
+
+
+@pytest.mark.parametrize('url', CLIENT_LIST_URLS)
+def test_list_views_use_indexes(app, client, assert_max_queries, url):
+    set_auth_token(app, client, {'sub': 102})
+    # Warm up the process caches, loading them reads whole tables on purpose
+    client.get(url)
+    with assert_max_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.json
+    selects = [
+        (statement, parameters)
+        for statement, parameters in statements
+        if statement.lstrip().upper().startswith('SELECT')
+    ]
+    assert selects
+
+    with app.app_context():
+        engine = db.engine
+    with engine.connect() as connection, connection.begin():
+        scans = {
+            statement: scans
+            for statement, parameters in selects
+            if (scans := full_scans(connection, statement, parameters))
+        }
+    assert not scans, scans